@@ -21,6 +21,9 @@ from app.core.errors import register_error_handlers
 # Import CLI commands  
 from app.core.cli import register_cli_commands
 
+# Import model event registration
+from app.core.events import register_model_events
+
 
 def create_app(config_name=None):
     """
@@ -65,6 +68,9 @@ def create_app(config_name=None):
     # Register CLI commands
     register_cli_commands(app)
     
+    # Register model events that maintain derived tables
+    register_model_events(app)
+    
     # Configure logging
     configure_logging(app)
     
@@ -100,6 +106,7 @@ def register_blueprints(app):
     from app.api.loans import loans_bp
     from app.api.soil import soil_bp
     from app.api.iot import iot_bp
+    from app.api.insurance import insurance_bp
     
     # Main routes (dashboard, index pages)
     app.register_blueprint(main_bp)
@@ -111,6 +118,7 @@ def register_blueprints(app):
     app.register_blueprint(loans_bp, url_prefix='/api/loans')
     app.register_blueprint(soil_bp, url_prefix='/api/soil')
     app.register_blueprint(iot_bp, url_prefix='/api/iot')
+    app.register_blueprint(insurance_bp, url_prefix='/api/insurance')
 
 
 def configure_logging(app):
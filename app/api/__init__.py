@@ -10,6 +10,7 @@ from .scoring import scoring_bp
 from .loans import loans_bp
 from .soil import soil_bp
 from .iot import iot_bp
+from .insurance import insurance_bp
 
 __all__ = [
     'main_bp',
@@ -18,5 +19,6 @@ __all__ = [
     'scoring_bp',
     'loans_bp',
     'soil_bp',
-    'iot_bp'
+    'iot_bp',
+    'insurance_bp'
 ]
@@ -9,6 +9,11 @@ from marshmallow import ValidationError
 
 from app.core.extensions import db, create_error_response, create_success_response
 from app.models import Farmer, FarmerSchema, SoilSample
+from app.services.farmer_search import search_index
+from app.services.farmer_statistics import farmer_statistics
+from app.utils.pagination import (
+    keyset_paginate, resolve_total, InvalidCursorError, COUNT_MODES, encode_rank_cursor, decode_rank_cursor
+)
 
 farmers_bp = Blueprint('farmers', __name__)
 
@@ -20,24 +25,30 @@ farmers_schema = FarmerSchema(many=True)
 @farmers_bp.route('/', methods=['GET'])
 def get_farmers():
     """
-    Get list of farmers with optional filtering and pagination.
+    Get list of farmers with optional filtering and keyset pagination.
     
     Query Parameters:
-        page (int): Page number (default: 1)
+        cursor (str): Opaque cursor from the previous page's ``next_cursor``
         per_page (int): Items per page (default: 10, max: 100)
-        district (str): Filter by district
-        province (str): Filter by province
-        crop (str): Filter by primary crop
+        count (str): Total to report - none (default), estimate or exact
+        district (str): Filter by district (case-insensitive exact match)
+        province (str): Filter by province (case-insensitive exact match)
+        crop (str): Filter by primary crop (case-insensitive exact match)
         active_only (bool): Show only active farmers (default: True)
-        search (str): Search in farmer names
+        search (str): Ranked, typo-tolerant search over name, national ID and phone
     
     Returns:
         JSON response with farmers list and pagination info
     """
     try:
         # Parse query parameters
-        page = request.args.get('page', 1, type=int)
+        cursor = request.args.get('cursor')
         per_page = min(request.args.get('per_page', 10, type=int), 100)
+        count_mode = request.args.get('count', 'none').lower()
+        if count_mode not in COUNT_MODES:
+            return create_error_response(
+                f"Invalid count mode: {count_mode} (expected {', '.join(COUNT_MODES)})", 400
+            )
         district = request.args.get('district')
         province = request.args.get('province')
         crop = request.args.get('crop')
@@ -50,34 +61,84 @@ def get_farmers():
         if active_only:
             query = query.filter(Farmer.is_active == True)
         
+        # Case-insensitive equality so the lower() expression indexes apply
         if district:
-            query = query.filter(Farmer.district.ilike(f'%{district}%'))
+            query = query.filter(db.func.lower(Farmer.district) == district.lower())
         
         if province:
-            query = query.filter(Farmer.province.ilike(f'%{province}%'))
+            query = query.filter(db.func.lower(Farmer.province) == province.lower())
         
         if crop:
-            query = query.filter(Farmer.primary_crop.ilike(f'%{crop}%'))
+            query = query.filter(db.func.lower(Farmer.primary_crop) == crop.lower())
         
         if search:
-            query = query.filter(Farmer.full_name.ilike(f'%{search}%'))
-        
-        # Execute paginated query
-        farmers_page = query.paginate(
-            page=page, 
-            per_page=per_page, 
-            error_out=False
-        )
+            # Ranked search: best matches first, paged by (matched grams, id)
+            ranked, gram_count = search_index.ranked_matches(search)
+            # A table-wide estimate says nothing about the match count
+            if count_mode == 'estimate':
+                count_mode = 'exact'
+            farmers, scores, next_cursor = [], {}, None
+            total = 0 if count_mode == 'exact' else None
+            if ranked is not None:
+                query = query.join(ranked, ranked.c.farmer_id == Farmer.id)
+                total = resolve_total(query, db.session, Farmer.__tablename__, count_mode)
+                if cursor:
+                    matched, last_id = decode_rank_cursor(cursor)
+                    query = query.filter(db.or_(
+                        ranked.c.matched < matched,
+                        db.and_(ranked.c.matched == matched, Farmer.id > last_id)
+                    ))
+                rows = query.add_columns(ranked.c.matched).order_by(
+                    ranked.c.matched.desc(), Farmer.id
+                ).limit(per_page + 1).all()
+                if len(rows) > per_page:
+                    rows = rows[:per_page]
+                    next_cursor = encode_rank_cursor(rows[-1][1], rows[-1][0].id)
+                farmers = [farmer for farmer, _ in rows]
+                scores = {farmer.id: round(matched / gram_count, 4) for farmer, matched in rows}
+            
+            farmers_data = farmers_schema.dump(farmers)
+            for farmer_data in farmers_data:
+                farmer_data['match_score'] = scores[farmer_data['id']]
+            
+            return jsonify(create_success_response({
+                'farmers': farmers_data,
+                'pagination': {
+                    'per_page': per_page,
+                    'next_cursor': next_cursor,
+                    'has_next': next_cursor is not None,
+                    'total': total,
+                    'count_mode': count_mode
+                },
+                'filters_applied': {
+                    'district': district,
+                    'province': province,
+                    'crop': crop,
+                    'active_only': active_only,
+                    'search': search
+                }
+            }))
+        
+        # Execute keyset-paginated query
+        farmers_page = keyset_paginate(query, Farmer, cursor=cursor, per_page=per_page)
+        total = None
+        if count_mode == 'estimate' and (district or province or crop):
+            # No maintained counter per filter combination; count the page's filter exactly
+            count_mode = 'exact'
+        elif count_mode == 'estimate' and active_only:
+            # Maintained active-farmer count, exact for the unfiltered listing
+            total = farmer_statistics.get_active_count()
+        if total is None:
+            total = resolve_total(query, db.session, Farmer.__tablename__, count_mode)
         
         return jsonify(create_success_response({
-            'farmers': farmers_schema.dump(farmers_page.items),
+            'farmers': farmers_schema.dump(farmers_page['items']),
             'pagination': {
-                'page': page,
                 'per_page': per_page,
-                'total': farmers_page.total,
-                'pages': farmers_page.pages,
-                'has_next': farmers_page.has_next,
-                'has_prev': farmers_page.has_prev
+                'next_cursor': farmers_page['next_cursor'],
+                'has_next': farmers_page['has_next'],
+                'total': total,
+                'count_mode': count_mode
             },
             'filters_applied': {
                 'district': district,
@@ -88,6 +149,9 @@ def get_farmers():
             }
         }))
         
+    except InvalidCursorError as e:
+        return create_error_response(str(e), 400)
+    
     except Exception as e:
         current_app.logger.error(f"Error fetching farmers: {str(e)}")
         return jsonify(create_error_response("Failed to fetch farmers", 500))
@@ -344,77 +408,14 @@ def get_farmers_statistics():
     """
     Get aggregate statistics about farmers in the system.
     
+    Statistics are maintained incrementally on farmer writes; see
+    ``app.services.farmer_statistics``.
+    
     Returns:
         JSON response with farmer statistics
     """
     try:
-        # Basic counts
-        total_farmers = Farmer.query.filter_by(is_active=True).count()
-        total_verified = Farmer.query.filter_by(is_active=True, verification_status='verified').count()
-        
-        # Geographic distribution
-        province_distribution = db.session.query(
-            Farmer.province, 
-            db.func.count(Farmer.id)
-        ).filter(
-            Farmer.is_active == True,
-            Farmer.province.isnot(None)
-        ).group_by(Farmer.province).all()
-        
-        # Crop distribution
-        crop_distribution = db.session.query(
-            Farmer.primary_crop,
-            db.func.count(Farmer.id)
-        ).filter(
-            Farmer.is_active == True,
-            Farmer.primary_crop.isnot(None)
-        ).group_by(Farmer.primary_crop).all()
-        
-        # Experience distribution
-        experience_stats = db.session.query(
-            db.func.avg(Farmer.farming_experience_years),
-            db.func.min(Farmer.farming_experience_years),
-            db.func.max(Farmer.farming_experience_years)
-        ).filter(
-            Farmer.is_active == True,
-            Farmer.farming_experience_years.isnot(None)
-        ).first()
-        
-        # Land size statistics
-        land_stats = db.session.query(
-            db.func.avg(Farmer.total_land_area),
-            db.func.sum(Farmer.total_land_area),
-            db.func.min(Farmer.total_land_area),
-            db.func.max(Farmer.total_land_area)
-        ).filter(
-            Farmer.is_active == True,
-            Farmer.total_land_area.isnot(None)
-        ).first()
-        
-        return jsonify(create_success_response({
-            'totals': {
-                'total_farmers': total_farmers,
-                'verified_farmers': total_verified,
-                'verification_rate': round((total_verified / total_farmers * 100) if total_farmers > 0 else 0, 2)
-            },
-            'geographic_distribution': {
-                province: count for province, count in province_distribution
-            },
-            'crop_distribution': {
-                crop: count for crop, count in crop_distribution
-            },
-            'experience_statistics': {
-                'average_years': round(experience_stats[0] or 0, 2),
-                'min_years': experience_stats[1] or 0,
-                'max_years': experience_stats[2] or 0
-            },
-            'land_statistics': {
-                'average_hectares': round(land_stats[0] or 0, 2),
-                'total_hectares': round(land_stats[1] or 0, 2),
-                'min_hectares': land_stats[2] or 0,
-                'max_hectares': land_stats[3] or 0
-            }
-        }))
+        return jsonify(create_success_response(farmer_statistics.get_statistics()))
         
     except Exception as e:
         current_app.logger.error(f"Error generating farmer statistics: {str(e)}")
@@ -0,0 +1,185 @@
+# app/api/insurance.py
+"""
+Insurance API endpoints for Talazo AgriFinance Platform.
+"""
+
+from flask import Blueprint, request, jsonify, current_app
+
+from app.core.extensions import db, create_error_response, create_success_response
+from app.models import InsurancePolicy
+from app.models.insurance_policy import PolicyStatus, InsuranceType
+from app.services.premium_quoting import premium_quoting
+from app.utils.pagination import COUNT_MODES, keyset_paginate, resolve_total, InvalidCursorError
+
+insurance_bp = Blueprint('insurance', __name__)
+
+MAX_QUOTES_PER_REQUEST = 10000
+
+
+@insurance_bp.route('/policies', methods=['GET'])
+def get_policies():
+    """
+    Get list of insurance policies with optional filtering.
+    
+    Query Parameters:
+        farmer_id (int): Filter by farmer ID
+        status (str): Filter by policy status (e.g. active)
+        insurance_type (str): Filter by insurance type (e.g. weather_index)
+        cursor (str): Opaque cursor from the previous page's ``next_cursor``
+        limit (int): Items per page (default: 50, max: 100)
+        count (str): Total to report - none (default), estimate or exact
+        include (str): Comma-separated JSON fields to return decoded
+            (covered_perils, trigger_conditions, payout_schedule, exclusions);
+            skipped by default
+    """
+    try:
+        include = [f for f in request.args.get('include', '').split(',') if f in InsurancePolicy.JSON_FIELDS]
+        farmer_id = request.args.get('farmer_id', type=int)
+        status = request.args.get('status')
+        insurance_type = request.args.get('insurance_type')
+        cursor = request.args.get('cursor')
+        limit = min(request.args.get('limit', 50, type=int), 100)
+        count_mode = request.args.get('count', 'none').lower()
+        if count_mode not in COUNT_MODES:
+            return create_error_response(
+                f"Invalid count mode: {count_mode} (expected {', '.join(COUNT_MODES)})", 400
+            )
+        
+        query = InsurancePolicy.query
+        
+        if farmer_id:
+            query = query.filter_by(farmer_id=farmer_id)
+        try:
+            if status:
+                query = query.filter_by(status=PolicyStatus(status.lower()))
+            if insurance_type:
+                query = query.filter_by(insurance_type=InsuranceType(insurance_type.lower()))
+        except ValueError:
+            return create_error_response("Invalid status or insurance_type filter", 400)
+        
+        policies_page = keyset_paginate(query, InsurancePolicy, cursor=cursor, per_page=limit)
+        total_count = resolve_total(query, db.session, InsurancePolicy.__tablename__, count_mode)
+        
+        return jsonify(create_success_response({
+            'policies': [policy.to_dict(json_fields=include) for policy in policies_page['items']],
+            'pagination': {
+                'total': total_count,
+                'count_mode': count_mode,
+                'limit': limit,
+                'count': len(policies_page['items']),
+                'next_cursor': policies_page['next_cursor'],
+                'has_next': policies_page['has_next']
+            },
+            'filters_applied': {
+                'farmer_id': farmer_id,
+                'status': status,
+                'insurance_type': insurance_type
+            }
+        }, "Insurance policies retrieved successfully"))
+    
+    except InvalidCursorError as e:
+        return create_error_response(str(e), 400)
+    except Exception as e:
+        current_app.logger.error(f"Error retrieving insurance policies: {str(e)}")
+        return create_error_response("Failed to retrieve insurance policies", 500)
+
+
+@insurance_bp.route('/quotes/bulk', methods=['POST'])
+def bulk_quote_premiums():
+    """
+    Quote insurance premiums for many farmers in one vectorized call.
+    
+    Request Body:
+        {
+            "quotes": [
+                {
+                    "coverage_amount": float,
+                    "farmer_id": int,        # optional, fills missing scores
+                    "soil_score": float,     # optional
+                    "credit_score": float,   # optional
+                    "weather_risk": float,   # optional, default 1.0
+                    "base_rate": float       # optional, default 0.05
+                },
+                ...
+            ],
+            "weather_risk": float  # optional default for all quotes
+        }
+    
+    Returns:
+        JSON response with one quote per request item and the totals
+    """
+    try:
+        data = request.get_json()
+        
+        if not data or not data.get('quotes'):
+            return create_error_response("quotes list is required", 400)
+        
+        quotes = data['quotes']
+        if len(quotes) > MAX_QUOTES_PER_REQUEST:
+            return create_error_response(
+                f"Maximum {MAX_QUOTES_PER_REQUEST} quotes per request", 400
+            )
+        if any(item.get('coverage_amount') is None for item in quotes):
+            return create_error_response("coverage_amount is required for every quote", 400)
+        
+        results = premium_quoting.quote_requests(
+            quotes, default_weather_risk=data.get('weather_risk', 1.0)
+        )
+        
+        return jsonify(create_success_response({
+            'total_quotes': len(results),
+            'total_coverage': round(sum(item['coverage_amount'] for item in results), 2),
+            'total_premium': round(sum(item['premium'] for item in results), 2),
+            'quotes': results
+        }, "Premiums quoted successfully"))
+        
+    except (TypeError, ValueError) as e:
+        return create_error_response(f"Invalid quote input: {str(e)}", 400)
+    except Exception as e:
+        current_app.logger.error(f"Error in bulk premium quoting: {str(e)}")
+        return create_error_response("Failed to quote premiums", 500)
+
+
+@insurance_bp.route('/triggers/evaluate', methods=['POST'])
+def evaluate_weather_triggers():
+    """
+    Evaluate weather station observations against weather-index policies.
+    
+    Only policies indexed under the reporting stations are evaluated.
+    
+    Request Body:
+        {
+            "observations": [
+                {
+                    "station_id": str,
+                    "metrics": {"rainfall_mm": float, ...},
+                    "observed_on": "YYYY-MM-DD"  # optional, default today
+                },
+                ...
+            ]
+        }
+    
+    Returns:
+        JSON response with the triggered payouts
+    """
+    try:
+        from app.services.parametric_triggers import trigger_engine
+        
+        data = request.get_json()
+        
+        if not data or not data.get('observations'):
+            return create_error_response("observations list is required", 400)
+        observations = data['observations']
+        if not isinstance(observations, list) or not all(isinstance(item, dict) for item in observations):
+            return create_error_response("observations must be a list of objects", 400)
+        if any('station_id' not in item for item in observations):
+            return create_error_response("station_id is required for every observation", 400)
+        
+        result = trigger_engine.evaluate_event(observations)
+        return jsonify(create_success_response(result, "Weather triggers evaluated successfully"))
+        
+    except (TypeError, ValueError) as e:
+        return create_error_response(f"Invalid observation input: {str(e)}", 400)
+    except Exception as e:
+        current_app.logger.error(f"Error evaluating weather triggers: {str(e)}")
+        return create_error_response("Failed to evaluate weather triggers", 500)
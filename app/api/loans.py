@@ -3,10 +3,12 @@
 Loan management API endpoints for Talazo AgriFinance Platform.
 """
 
+from datetime import datetime
 from flask import Blueprint, request, jsonify, current_app
 from marshmallow import ValidationError
 from app.core.extensions import db, create_error_response, create_success_response
 from app.models import LoanApplication, LoanApplicationSchema
+from app.utils.pagination import keyset_paginate, resolve_total, InvalidCursorError, COUNT_MODES
 
 loans_bp = Blueprint('loans', __name__)
 
@@ -69,13 +71,30 @@ def get_loan_application(application_id):
 
 @loans_bp.route('/applications', methods=['GET'])
 def get_loan_applications():
-    """Get list of loan applications with optional filtering."""
+    """
+    Get list of loan applications with optional filtering.
+    
+    Query Parameters:
+        farmer_id (int): Filter by farmer ID
+        status (str): Filter by application status
+        cursor (str): Opaque cursor from the previous page's ``next_cursor``
+        limit (int): Items per page (default: 50, max: 100)
+        count (str): Total to report - none (default), estimate or exact
+        include (str): Comma-separated JSON fields to return decoded
+            (documents_submitted); skipped by default
+    """
     try:
         # Get query parameters for filtering
+        include = [f for f in request.args.get('include', '').split(',') if f in LoanApplication.JSON_FIELDS]
         farmer_id = request.args.get('farmer_id', type=int)
         status = request.args.get('status')
-        limit = request.args.get('limit', 50, type=int)
-        offset = request.args.get('offset', 0, type=int)
+        cursor = request.args.get('cursor')
+        limit = min(request.args.get('limit', 50, type=int), 100)
+        count_mode = request.args.get('count', 'none').lower()
+        if count_mode not in COUNT_MODES:
+            return create_error_response(
+                f"Invalid count mode: {count_mode} (expected {', '.join(COUNT_MODES)})", 400
+            )
 
         # Build query
         query = LoanApplication.query
@@ -85,20 +104,26 @@ def get_loan_applications():
         if status:
             query = query.filter_by(status=status)
 
-        # Apply pagination
-        applications = query.offset(offset).limit(limit).all()
-        total_count = query.count()
+        # Apply keyset pagination
+        applications_page = keyset_paginate(query, LoanApplication, cursor=cursor, per_page=limit)
+        applications = applications_page['items']
+        total_count = resolve_total(query, db.session, LoanApplication.__tablename__, count_mode)
 
         # Serialize data
         result = loan_applications_schema.dump(applications)
+        if include:
+            for item, application in zip(result, applications):
+                item['documents_submitted'] = application.get_documents_submitted()
 
         return jsonify(create_success_response({
             'applications': result,
             'pagination': {
                 'total': total_count,
+                'count_mode': count_mode,
                 'limit': limit,
-                'offset': offset,
-                'count': len(applications)
+                'count': len(applications),
+                'next_cursor': applications_page['next_cursor'],
+                'has_next': applications_page['has_next']
             },
             'filters_applied': {
                 'farmer_id': farmer_id,
@@ -106,6 +131,9 @@ def get_loan_applications():
             }
         }, "Loan applications retrieved successfully"))
 
+    except InvalidCursorError as e:
+        return create_error_response(str(e), 400)
+
     except Exception as e:
         current_app.logger.error(f"Error retrieving loan applications: {str(e)}")
         return jsonify(create_error_response("Failed to retrieve loan applications", 500))
@@ -140,3 +168,85 @@ def update_loan_status(application_id):
         db.session.rollback()
         current_app.logger.error(f"Error updating loan application: {str(e)}")
         return jsonify(create_error_response("Failed to update loan application", 500))
+
+
+@loans_bp.route('/applications/decisioning/run', methods=['POST'])
+def run_loan_decisioning():
+    """Decide all SUBMITTED loan applications in bulk."""
+    try:
+        from app.services.loan_decisioning import LoanDecisioningPipeline
+
+        json_data = request.get_json(silent=True) or {}
+        batch_size = json_data.get('batch_size', 500)
+        if isinstance(batch_size, bool) or not isinstance(batch_size, int) or batch_size < 1:
+            return create_error_response("batch_size must be a positive integer", 400)
+        batch_size = min(batch_size, 5000)
+        dry_run = bool(json_data.get('dry_run', False))
+
+        summary = LoanDecisioningPipeline(batch_size=batch_size).run(dry_run=dry_run)
+        return jsonify(create_success_response(summary, "Loan decisioning completed"))
+
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error running loan decisioning: {str(e)}")
+        return create_error_response("Failed to run loan decisioning", 500)
+
+
+@loans_bp.route('/portfolio/cashflows', methods=['GET'])
+def get_portfolio_cashflows():
+    """Project expected book-wide repayments from the schedule book."""
+    try:
+        from app.services.repayment_schedule import get_schedule_book, rebuild_schedule_book
+
+        months = min(request.args.get('months', 12, type=int), 120)
+        source = request.args.get('source')  # loan_application, credit_history
+        start = request.args.get('start')
+        if start:
+            try:
+                start = datetime.strptime(start, '%Y-%m').date()
+            except ValueError:
+                return create_error_response("Invalid start month, expected YYYY-MM", 400)
+
+        if request.args.get('refresh', 'false').lower() == 'true':
+            book = rebuild_schedule_book()
+        else:
+            book = get_schedule_book()
+
+        return jsonify(create_success_response(
+            book.project_cashflows(start=start, months=months, source=source),
+            "Portfolio cashflows projected successfully"
+        ))
+
+    except Exception as e:
+        current_app.logger.error(f"Error projecting portfolio cashflows: {str(e)}")
+        return create_error_response("Failed to project portfolio cashflows", 500)
+
+
+@loans_bp.route('/portfolio/exposure', methods=['GET'])
+def get_portfolio_exposure():
+    """
+    Slice portfolio exposure from the materialized exposure cube.
+
+    Query Parameters:
+        group_by (str): Comma-separated dimensions (source, district, province,
+            primary_crop, risk_level, status)
+        <dimension> (str): Exact-match filter on any dimension
+    """
+    try:
+        from app.services.portfolio_exposure import portfolio_exposure
+        from app.models.portfolio_exposure import DIMENSIONS
+
+        group_by = [name for name in request.args.get('group_by', '').split(',') if name]
+        filters = {name: request.args[name] for name in DIMENSIONS if name in request.args}
+
+        return jsonify(create_success_response(
+            {'group_by': group_by, 'filters': filters,
+             'cells': portfolio_exposure.slice(group_by=group_by, filters=filters)},
+            "Portfolio exposure retrieved successfully"
+        ))
+
+    except ValueError as e:
+        return create_error_response(str(e), 400)
+    except Exception as e:
+        current_app.logger.error(f"Error retrieving portfolio exposure: {str(e)}")
+        return create_error_response("Failed to retrieve portfolio exposure", 500)
@@ -5,9 +5,11 @@ Main routes for Talazo AgriFinance Platform.
 This module handles dashboard, home page, and general application routes.
 """
 
-from flask import Blueprint, render_template, jsonify, current_app
+from flask import Blueprint, render_template, jsonify, current_app, request
 from app.core.extensions import db
 from app.models import Farmer, SoilSample
+from app.models.soil_sample import RiskLevel
+from app.utils.cache import TTLCache
 from datetime import datetime, timedelta
 
 main_bp = Blueprint('main', __name__)
@@ -137,78 +139,25 @@ def dashboard_summary():
     """
     Get dashboard summary statistics.
     
+    The summary is served from an in-process TTL cache; concurrent requests
+    share one computation and slightly stale data is served while it is
+    refreshed in the background.
+    
     Returns:
         JSON response with dashboard data
     """
     try:
-        # Get basic counts
-        total_farmers = Farmer.query.filter_by(is_active=True).count()
-        total_soil_samples = SoilSample.query.count()
-        
-        # Get recent activity (last 30 days)
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        new_farmers = Farmer.query.filter(
-            Farmer.registration_date >= thirty_days_ago
-        ).count()
-        recent_samples = SoilSample.query.filter(
-            SoilSample.collection_date >= thirty_days_ago
-        ).count()
+        app = current_app._get_current_object()
         
-        # Get average soil health score
-        avg_soil_health = db.session.query(
-            db.func.avg(SoilSample.financial_index_score)
-        ).filter(
-            SoilSample.financial_index_score.isnot(None)
-        ).scalar()
+        def compute():
+            with app.app_context():
+                return _build_dashboard_summary()
         
-        # Get risk distribution
-        risk_distribution = {}
-        for risk_level in ['LOW', 'MEDIUM_LOW', 'MEDIUM', 'MEDIUM_HIGH', 'HIGH']:
-            count = SoilSample.query.filter_by(risk_level=risk_level).count()
-            risk_distribution[risk_level] = count
-        
-        # Get recent high-scoring farmers
-        recent_high_scores = db.session.query(
-            Farmer.full_name, 
-            Farmer.district,
-            SoilSample.financial_index_score,
-            SoilSample.collection_date
-        ).join(SoilSample).filter(
-            SoilSample.financial_index_score >= 70,
-            SoilSample.collection_date >= thirty_days_ago
-        ).order_by(
-            SoilSample.financial_index_score.desc()
-        ).limit(5).all()
+        summary = _get_dashboard_cache(app).get_or_compute('dashboard_summary', compute)
         
         return jsonify({
             'success': True,
-            'data': {
-                'totals': {
-                    'farmers': total_farmers,
-                    'soil_samples': total_soil_samples
-                },
-                'recent_activity': {
-                    'new_farmers': new_farmers,
-                    'recent_samples': recent_samples,
-                    'period_days': 30
-                },
-                'performance_metrics': {
-                    'average_soil_health': round(avg_soil_health or 0, 2),
-                    'risk_distribution': risk_distribution
-                },
-                'highlights': {
-                    'top_performers': [
-                        {
-                            'farmer_name': row[0],
-                            'district': row[1] or 'Unknown',
-                            'score': round(row[2], 2),
-                            'date': row[3].isoformat() if row[3] else None
-                        }
-                        for row in recent_high_scores
-                    ]
-                },
-                'generated_at': datetime.utcnow().isoformat()
-            }
+            'data': summary
         })
         
     except Exception as e:
@@ -219,6 +168,88 @@ def dashboard_summary():
         }), 500
 
 
+def _get_dashboard_cache(app):
+    """Return the app's dashboard cache, creating it on first use."""
+    cache = app.extensions.get('dashboard_cache')
+    if cache is None:
+        cache = app.extensions['dashboard_cache'] = TTLCache(
+            ttl=app.config.get('DASHBOARD_CACHE_TTL', 30),
+            stale_ttl=app.config.get('DASHBOARD_CACHE_STALE_TTL', 300)
+        )
+    return cache
+
+
+def _build_dashboard_summary():
+    """Compute the dashboard summary in three queries."""
+    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
+    
+    # All scalar counts and averages in a single round trip
+    counts = db.session.query(
+        db.session.query(db.func.count(Farmer.id))
+            .filter(Farmer.is_active == True).scalar_subquery(),
+        db.session.query(db.func.count(SoilSample.id)).scalar_subquery(),
+        db.session.query(db.func.count(Farmer.id))
+            .filter(Farmer.registration_date >= thirty_days_ago).scalar_subquery(),
+        db.session.query(db.func.count(SoilSample.id))
+            .filter(SoilSample.collection_date >= thirty_days_ago).scalar_subquery(),
+        db.session.query(db.func.avg(SoilSample.financial_index_score))
+            .filter(SoilSample.financial_index_score.isnot(None)).scalar_subquery()
+    ).one()
+    total_farmers, total_soil_samples, new_farmers, recent_samples, avg_soil_health = counts
+    
+    # Risk distribution in one GROUP BY
+    risk_distribution = {level.name: 0 for level in RiskLevel}
+    risk_rows = db.session.query(
+        SoilSample.risk_level,
+        db.func.count(SoilSample.id)
+    ).filter(
+        SoilSample.risk_level.isnot(None)
+    ).group_by(SoilSample.risk_level).all()
+    for risk_level, count in risk_rows:
+        risk_distribution[risk_level.name] = count
+    
+    # Get recent high-scoring farmers
+    recent_high_scores = db.session.query(
+        Farmer.full_name, 
+        Farmer.district,
+        SoilSample.financial_index_score,
+        SoilSample.collection_date
+    ).join(SoilSample).filter(
+        SoilSample.financial_index_score >= 70,
+        SoilSample.collection_date >= thirty_days_ago
+    ).order_by(
+        SoilSample.financial_index_score.desc()
+    ).limit(5).all()
+    
+    return {
+        'totals': {
+            'farmers': total_farmers,
+            'soil_samples': total_soil_samples
+        },
+        'recent_activity': {
+            'new_farmers': new_farmers,
+            'recent_samples': recent_samples,
+            'period_days': 30
+        },
+        'performance_metrics': {
+            'average_soil_health': round(avg_soil_health or 0, 2),
+            'risk_distribution': risk_distribution
+        },
+        'highlights': {
+            'top_performers': [
+                {
+                    'farmer_name': row[0],
+                    'district': row[1] or 'Unknown',
+                    'score': round(row[2], 2),
+                    'date': row[3].isoformat() if row[3] else None
+                }
+                for row in recent_high_scores
+            ]
+        },
+        'generated_at': datetime.utcnow().isoformat()
+    }
+
+
 @main_bp.route('/api/system/status')
 def system_status():
     """
@@ -283,22 +314,24 @@ def get_alerts():
     """
     Get system alerts and notifications.
     
+    Alerts are maintained in the alerts table by model events and a daily
+    sweep, so this reads active alert counts with one indexed query.
+    
+    Query Parameters:
+        include_items (bool): Also return individual active alerts
+        farmer_id (int): Restrict individual alerts to one farmer
+        limit (int): Maximum individual alerts (default: 50, max: 200)
+    
     Returns:
         JSON response with current alerts
     """
     try:
-        alerts = []
+        from app.services.alerts import alert_service
         
-        # Check for farmers without recent soil samples
-        farmers_without_recent_samples = db.session.query(Farmer).filter(
-            ~Farmer.id.in_(
-                db.session.query(SoilSample.farmer_id).filter(
-                    SoilSample.collection_date >= datetime.utcnow() - timedelta(days=90)
-                )
-            ),
-            Farmer.is_active == True
-        ).count()
+        counts = alert_service.count_active()
+        alerts = []
         
+        farmers_without_recent_samples = counts['stale_soil_data']
         if farmers_without_recent_samples > 0:
             alerts.append({
                 'type': 'warning',
@@ -308,8 +341,7 @@ def get_alerts():
                 'priority': 'medium'
             })
         
-        # Check for high-risk farmers
-        high_risk_samples = SoilSample.query.filter_by(risk_level='HIGH').count()
+        high_risk_samples = counts['high_risk']
         if high_risk_samples > 0:
             alerts.append({
                 'type': 'error',
@@ -319,11 +351,17 @@ def get_alerts():
                 'priority': 'high'
             })
         
-        # Check for system performance
-        low_performing_farmers = SoilSample.query.filter(
-            SoilSample.financial_index_score < 40
-        ).count()
+        defaulted_loans = counts['credit_default']
+        if defaulted_loans > 0:
+            alerts.append({
+                'type': 'error',
+                'title': 'Defaulted Loans',
+                'message': f'{defaulted_loans} credit history entries are in default',
+                'action': 'Contact affected farmers about restructuring options',
+                'priority': 'high'
+            })
         
+        low_performing_farmers = counts['low_score']
         if low_performing_farmers > 10:
             alerts.append({
                 'type': 'info',
@@ -333,12 +371,21 @@ def get_alerts():
                 'priority': 'low'
             })
         
-        return jsonify({
+        response = {
             'success': True,
             'alerts': alerts,
             'alert_count': len(alerts),
             'generated_at': datetime.utcnow().isoformat()
-        })
+        }
+        
+        if request.args.get('include_items', 'false').lower() == 'true':
+            items = alert_service.list_active(
+                farmer_id=request.args.get('farmer_id', type=int),
+                limit=min(request.args.get('limit', 50, type=int), 200)
+            )
+            response['items'] = [item.to_dict() for item in items]
+        
+        return jsonify(response)
         
     except Exception as e:
         current_app.logger.error(f"Alerts generation error: {str(e)}")
@@ -354,6 +354,97 @@ def get_scoring_weights():
     }))
 
 
+@scoring_bp.route('/climate/point', methods=['GET'])
+def get_climate_point():
+    """
+    Climate summary for the grid cell containing a coordinate.
+    
+    Query Parameters:
+        lat, lng (float): Coordinate
+    
+    Returns:
+        JSON response with rainfall mean/CV, drought frequency and weather risk
+    """
+    try:
+        from app.services.climate_data import get_climate_dataset
+        
+        dataset = get_climate_dataset()
+        if dataset is None:
+            return create_error_response("Climate dataset not available", 404)
+        
+        lat = request.args.get('lat', type=float)
+        lng = request.args.get('lng', type=float)
+        if lat is None or lng is None:
+            return create_error_response("lat and lng are required", 400)
+        
+        cell = dataset.point(lat, lng)
+        if cell is None:
+            return create_error_response("Coordinate outside the climate grid", 404)
+        
+        return jsonify(create_success_response(dict(cell, lat=lat, lng=lng)))
+        
+    except Exception as e:
+        current_app.logger.error(f"Error in climate point query: {str(e)}")
+        return create_error_response("Failed to query climate data", 500)
+
+
+@scoring_bp.route('/climate/region', methods=['GET'])
+def get_climate_region():
+    """
+    Climate summary for a bounding box.
+    
+    Query Parameters:
+        lat_min, lat_max, lng_min, lng_max (float): Bounding box
+    
+    Returns:
+        JSON response with the region's rainfall CV, drought frequency and mean risk
+    """
+    try:
+        from app.services.climate_data import get_climate_dataset
+        
+        dataset = get_climate_dataset()
+        if dataset is None:
+            return create_error_response("Climate dataset not available", 404)
+        
+        bounds = [request.args.get(name, type=float) for name in ('lat_min', 'lat_max', 'lng_min', 'lng_max')]
+        if any(bound is None for bound in bounds):
+            return create_error_response("lat_min, lat_max, lng_min and lng_max are required", 400)
+        
+        summary = dataset.region(*bounds)
+        if summary is None:
+            return create_error_response("No climate data in region", 404)
+        
+        return jsonify(create_success_response(summary))
+        
+    except Exception as e:
+        current_app.logger.error(f"Error in climate region query: {str(e)}")
+        return create_error_response("Failed to query climate data", 500)
+
+
+@scoring_bp.route('/models/drift', methods=['GET'])
+def get_model_drift():
+    """
+    Drift status of the yield model's inputs and predictions.
+    
+    Query Parameters:
+        check (bool): Run a drift check on the current window now
+    
+    Returns:
+        JSON response with the serving window size and the last drift report
+    """
+    try:
+        from app.services.yield_inference import yield_inference
+        
+        if request.args.get('check', 'false').lower() == 'true':
+            yield_inference.drift.check(yield_inference._registry())
+        
+        return jsonify(create_success_response(yield_inference.drift.status()))
+        
+    except Exception as e:
+        current_app.logger.error(f"Error reading model drift: {str(e)}")
+        return jsonify(create_error_response("Failed to read model drift", 500))
+
+
 def _calculate_ph_improvement_impact(current_ph, target_ph):
     """Calculate score impact of pH improvement."""
     current_score = scorer._normalize_ph_score(current_ph) if hasattr(scorer, '_normalize_ph_score') else 50
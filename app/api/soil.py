@@ -145,6 +145,18 @@ def analyze_soil_sample(sample_id):
         health_score = sample.calculate_soil_health_score()
         sample.financial_index_score = health_score
         
+        # Predict yield with the active model, if one has been trained
+        from app.services.model_registry import ModelRegistryError
+        from app.services.yield_inference import yield_inference, KG_PER_TON
+        try:
+            sample.yield_prediction = round(yield_inference.predict(sample) * KG_PER_TON, 1)
+        except ModelRegistryError:
+            current_app.logger.warning("No yield model registered; skipping yield prediction")
+        except Exception as e:
+            # A failing model must not block the soil analysis itself
+            current_app.logger.error(f"Yield prediction failed for sample {sample_id}: {str(e)}",
+                                     exc_info=True)
+        
         # Update status to analyzed
         from app.models.soil_sample import SoilSampleStatus
         sample.status = SoilSampleStatus.ANALYZED
@@ -155,6 +167,7 @@ def analyze_soil_sample(sample_id):
             'sample_id': sample_id,
             'soil_health_score': health_score,
             'parameter_scores': sample.get_parameter_scores(),
+            'yield_prediction': sample.yield_prediction,
             'status': sample.status.value
         }, "Soil sample analyzed successfully"))
         
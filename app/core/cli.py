@@ -4,6 +4,7 @@ CLI commands for the Talazo AgriFinance Platform.
 """
 
 import click
+import json
 import os
 from flask import current_app
 from flask.cli import with_appcontext
@@ -75,29 +76,247 @@ def register_cli_commands(app):
         click.echo('Health check complete.')
     
     @app.cli.command()
+    @click.option('--gzip', 'compress', is_flag=True, help='Write gzip-compressed CSV files')
+    @click.option('--chunk-size', default=5000, help='Rows fetched per database round trip')
+    @click.option('--delta', is_flag=True, help='Only rows changed since the last delta export')
     @with_appcontext
-    def export_data():
+    def export_data(compress, chunk_size, delta):
         """Export data to CSV files."""
         try:
             from app.services.data_exporter import DataExporter
             
             click.echo('Exporting data...')
-            exporter = DataExporter()
-            exporter.export_all_data()
+            exporter = DataExporter(chunk_size=chunk_size, compress=compress)
+            if delta:
+                manifest = exporter.export_delta()
+                click.echo(f"Delta {manifest['sequence']}: {manifest['total_records']} changed rows.")
+            else:
+                exporter.export_all_data()
             click.echo('Data export complete.')
         except ImportError:
             click.echo('Data exporter not available yet.')
     
     @app.cli.command()
+    @click.option('--source', type=click.Choice(['auto', 'db', 'synthetic']), default='auto',
+                  help='Training data: database snapshot, synthetic, or database when large enough')
+    @click.option('--tune', 'tune_budget', type=float, default=None,
+                  help='Run a cross-validated hyperparameter search with this time budget (seconds)')
+    @click.option('--incremental', is_flag=True,
+                  help='Only add trees for soil samples created since the active model was trained')
+    @click.option('--trees', type=int, default=None,
+                  help='Trees added per incremental update (default: proportional to the new rows)')
     @with_appcontext
-    def train_models():
+    def train_models(source, tune_budget, incremental, trees):
         """Train/retrain machine learning models."""
         try:
-            from app.services.ml_trainer import MLModelTrainer
+            from app.services.ml_trainer import MLModelTrainer, YIELD_MODEL_NAME
             
-            click.echo('Training ML models...')
             trainer = MLModelTrainer()
-            trainer.train_all_models()
+            if incremental:
+                click.echo('Updating yield model with new samples...')
+                if trainer.train_yield_prediction_incremental(trees_per_increment=trees) is None:
+                    click.echo('No new training rows.')
+                    return
+                registry = trainer.registry
+                latest = registry.metadata(YIELD_MODEL_NAME, registry.versions(YIELD_MODEL_NAME)[-1])
+                if not latest.get('accepted', True):
+                    click.echo('Update was worse on held-out rows; registered but not activated.')
+                    return
+                click.echo('Incremental training complete.')
+                return
+            
+            click.echo('Training ML models...')
+            trainer.train_all_models(source=source, tune_budget=tune_budget)
             click.echo('Model training complete.')
         except ImportError:
             click.echo('ML trainer not available yet.')
+    
+    @app.cli.command()
+    @click.option('--batch-size', default=5000, help='Samples predicted per batch')
+    @click.option('--all', 'all_samples', is_flag=True, help='Recompute existing predictions too')
+    @with_appcontext
+    def backfill_yield_predictions(batch_size, all_samples):
+        """Fill soil sample yield predictions from the active yield model."""
+        from app.services.model_registry import ModelRegistryError
+        from app.services.yield_inference import yield_inference
+        
+        try:
+            updated = yield_inference.backfill(batch_size=batch_size, only_missing=not all_samples)
+            click.echo(f'Updated {updated} soil samples.')
+        except ModelRegistryError as e:
+            click.echo(f'Error: {e}')
+    
+    @app.cli.command()
+    @click.option('--date', 'as_of', help='Materialize as of this date (YYYY-MM-DD, default today)')
+    @click.option('--batch-size', default=1000, help='Farmers computed per batch')
+    @with_appcontext
+    def materialize_features(as_of, batch_size):
+        """Materialize farmer features into the feature store."""
+        from datetime import datetime
+        from app.services.feature_store import feature_store
+        
+        as_of = datetime.strptime(as_of, '%Y-%m-%d').date() if as_of else None
+        click.echo('Materializing farmer features...')
+        materialized = feature_store.materialize(as_of=as_of, batch_size=batch_size)
+        click.echo(f'Materialized features for {materialized} farmers.')
+    
+    @app.cli.command()
+    @click.argument('name', default='yield_prediction')
+    @with_appcontext
+    def model_versions(name):
+        """List registered versions of a model."""
+        from app.services.model_registry import get_model_registry
+        
+        registry = get_model_registry()
+        active = registry.active_version(name)
+        for version in registry.versions(name):
+            metadata = registry.metadata(name, version)
+            marker = '*' if version == active else ' '
+            click.echo(f"{marker} {version}  {metadata.get('registered_at', '')}  "
+                       f"{json.dumps(metadata.get('performance', {}))}")
+    
+    @app.cli.command()
+    @click.argument('name')
+    @click.argument('version')
+    @with_appcontext
+    def activate_model(name, version):
+        """Make a registered model version active."""
+        from app.services.model_registry import get_model_registry, ModelRegistryError
+        
+        try:
+            get_model_registry().activate(name, version)
+            click.echo(f'Activated {name} {version}.')
+        except ModelRegistryError as e:
+            click.echo(f'Error: {e}')
+    
+    @app.cli.command()
+    @click.argument('name', default='yield_prediction')
+    @with_appcontext
+    def rollback_model(name):
+        """Re-activate the previously active version of a model."""
+        from app.services.model_registry import get_model_registry, ModelRegistryError
+        
+        try:
+            version = get_model_registry().rollback(name)
+            click.echo(f'Rolled back {name} to {version}.')
+        except ModelRegistryError as e:
+            click.echo(f'Error: {e}')
+    
+    @app.cli.command()
+    @click.option('--batch-size', default=1000, help='Farmers indexed per batch')
+    @with_appcontext
+    def rebuild_search_index(batch_size):
+        """Rebuild the farmer search index from the farmers table."""
+        from app.services.farmer_search import search_index
+        
+        click.echo('Rebuilding farmer search index...')
+        indexed = search_index.rebuild(batch_size=batch_size)
+        click.echo(f'Indexed {indexed} farmers.')
+    
+    @app.cli.command()
+    @with_appcontext
+    def rebuild_farmer_statistics():
+        """Recompute materialized farmer statistics from the farmers table."""
+        from app.services.farmer_statistics import farmer_statistics
+        
+        click.echo('Rebuilding farmer statistics...')
+        rows = farmer_statistics.rebuild()
+        click.echo(f'Wrote {rows} statistic rows.')
+    
+    @app.cli.command()
+    @click.option('--rebuild', is_flag=True, help='Re-derive all alerts from source tables first')
+    @with_appcontext
+    def sweep_alerts(rebuild):
+        """Apply time-based alert conditions (run daily)."""
+        from app.services.alerts import alert_service
+        
+        if rebuild:
+            click.echo('Rebuilding alerts...')
+            counts = alert_service.rebuild()
+            click.echo(f'Active alerts: {counts}')
+        else:
+            click.echo('Sweeping alerts...')
+            result = alert_service.sweep()
+            click.echo(f"Raised {result['raised']}, resolved {result['resolved']} alerts.")
+    
+    @app.cli.command()
+    @click.option('--batch-size', default=500, help='Applications decided per batch')
+    @click.option('--dry-run', is_flag=True, help='Compute decisions without writing them')
+    @with_appcontext
+    def decide_loans(batch_size, dry_run):
+        """Run automated decisioning over SUBMITTED loan applications."""
+        from app.services.loan_decisioning import LoanDecisioningPipeline
+        
+        click.echo('Deciding submitted loan applications...')
+        summary = LoanDecisioningPipeline(batch_size=batch_size).run(dry_run=dry_run)
+        click.echo(
+            f"Processed {summary['processed']}: {summary['approved']} approved, "
+            f"{summary['rejected']} rejected, {summary['under_review']} referred for review."
+        )
+    
+    @app.cli.command()
+    @with_appcontext
+    def build_repayment_schedules():
+        """Recompute the portfolio repayment schedule book."""
+        from app.services.repayment_schedule import rebuild_schedule_book
+        
+        click.echo('Building repayment schedules...')
+        book = rebuild_schedule_book()
+        click.echo(f'Scheduled {len(book)} loans over {book.horizon} months.')
+    
+    @app.cli.command()
+    @click.option('--batch-size', default=1000, help='Rows streamed per batch')
+    @with_appcontext
+    def rebuild_exposure_cube(batch_size):
+        """Recompute the portfolio exposure cube from loans and credit history."""
+        from app.services.portfolio_exposure import portfolio_exposure
+        
+        click.echo('Rebuilding portfolio exposure cube...')
+        cells = portfolio_exposure.rebuild(batch_size=batch_size)
+        click.echo(f'Wrote {cells} exposure cells.')
+    
+    @app.cli.command()
+    @click.option('--once', is_flag=True, help='Fire due events and exit instead of running continuously')
+    @click.option('--rebuild', is_flag=True, help='Schedule events for all policies first')
+    @click.option('--max-sleep', default=60.0, help='Longest wait between checks, in seconds')
+    @with_appcontext
+    def run_policy_scheduler(once, rebuild, max_sleep):
+        """Fire policy expiry and premium-due events as they come due."""
+        from app.services.policy_scheduler import policy_scheduler
+        
+        if rebuild:
+            click.echo('Scheduling events for all policies...')
+            scheduled = policy_scheduler.rebuild()
+            click.echo(f'Scheduled {scheduled} policies.')
+        
+        if once:
+            outcomes = policy_scheduler.run_due()
+            click.echo(f'Fired events: {outcomes}')
+        else:
+            click.echo('Policy scheduler running (Ctrl+C to stop)...')
+            policy_scheduler.run_forever(max_sleep=max_sleep)
+    
+    @app.cli.command()
+    @click.argument('rainfall', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--temperature', type=click.Path(exists=True, dir_okay=False), help='Monthly mean temperature .npy')
+    @click.option('--lat0', type=float, required=True, help='Latitude of the north-west cell centre')
+    @click.option('--lon0', type=float, required=True, help='Longitude of the north-west cell centre')
+    @click.option('--resolution', type=float, default=0.05, help='Cell size in degrees')
+    @click.option('--start', required=True, help='First month of the stack (YYYY-MM)')
+    @with_appcontext
+    def build_climate_dataset(rainfall, temperature, lat0, lon0, resolution, start):
+        """Build the gridded climate dataset from monthly (months, rows, cols) .npy stacks."""
+        from datetime import datetime
+        import numpy as np
+        from app.services import climate_data
+        
+        directory = climate_data.climate_data_path()
+        click.echo(f'Building climate dataset in {directory}...')
+        dataset = climate_data.build_climate_dataset(
+            directory,
+            np.load(rainfall, mmap_mode='r'),
+            lat0, lon0, resolution,
+            datetime.strptime(start, '%Y-%m').date(),
+            temperature=np.load(temperature, mmap_mode='r') if temperature else None
+        )
+        click.echo(f'Built {dataset.shape[0]}x{dataset.shape[1]} cells.')
@@ -31,9 +31,16 @@ class BaseConfig:
     RATELIMIT_STORAGE_URL = 'memory://'
     RATELIMIT_DEFAULT = "1000 per hour"
     
+    # Dashboard summary cache (seconds)
+    DASHBOARD_CACHE_TTL = int(os.environ.get('DASHBOARD_CACHE_TTL', 30))
+    DASHBOARD_CACHE_STALE_TTL = int(os.environ.get('DASHBOARD_CACHE_STALE_TTL', 300))
+    
     # ML Model settings
     ML_MODEL_PATH = os.path.join(os.path.dirname(__file__), '../../models')
     
+    # Gridded climate dataset directory (default: <instance>/climate)
+    CLIMATE_DATA_PATH = os.environ.get('CLIMATE_DATA_PATH')
+    
     # External API settings
     GROQ_API_KEY = os.environ.get('GROQ_API_KEY')
     SATELLITE_API_KEY = os.environ.get('SATELLITE_API_KEY')
@@ -0,0 +1,31 @@
+"""
+Model event registration for the Talazo AgriFinance Platform.
+
+Derived data (search postings, statistics, alerts, exposure cube, cached
+weather-index triggers, scheduled policy events, the repayment schedule
+book) and generated application/policy numbers are maintained by
+SQLAlchemy mapper events.
+Listeners are registered once per process, so creating several app
+instances (e.g. in tests) does not double-apply them.
+"""
+
+
+def register_model_events(app):
+    """Register mapper event listeners that maintain derived tables."""
+    from app.services.farmer_search import register_search_listeners
+    from app.services.farmer_statistics import register_statistics_listeners
+    from app.services.alerts import register_alert_listeners
+    from app.services.portfolio_exposure import register_exposure_listeners
+    from app.services.numbering import register_numbering_listeners
+    from app.services.parametric_triggers import register_trigger_listeners
+    from app.services.policy_scheduler import register_scheduler_listeners
+    from app.services.repayment_schedule import register_schedule_listeners
+
+    register_search_listeners()
+    register_statistics_listeners()
+    register_alert_listeners()
+    register_exposure_listeners()
+    register_numbering_listeners()
+    register_trigger_listeners()
+    register_scheduler_listeners()
+    register_schedule_listeners()
@@ -11,6 +11,13 @@ from .soil_sample import SoilSample, SoilSampleSchema
 from .credit_history import CreditHistory, CreditHistorySchema
 from .loan_application import LoanApplication, LoanApplicationSchema
 from .insurance_policy import InsurancePolicy, InsurancePolicySchema
+from .farmer_search import FarmerSearchTerm
+from .farmer_statistic import FarmerStatistic
+from .alert import Alert, AlertBuild, AlertSchema
+from .portfolio_exposure import PortfolioExposure
+from .number_sequence import NumberSequence
+from .policy_schedule import PolicyScheduleEvent
+from .farmer_feature import FarmerFeature
 
 # Export all models and schemas
 __all__ = [
@@ -19,5 +26,12 @@ __all__ = [
     'SoilSample', 'SoilSampleSchema', 
     'CreditHistory', 'CreditHistorySchema',
     'LoanApplication', 'LoanApplicationSchema',
-    'InsurancePolicy', 'InsurancePolicySchema'
+    'InsurancePolicy', 'InsurancePolicySchema',
+    'FarmerSearchTerm',
+    'FarmerStatistic',
+    'Alert', 'AlertBuild', 'AlertSchema',
+    'PortfolioExposure',
+    'NumberSequence',
+    'PolicyScheduleEvent',
+    'FarmerFeature'
 ]
@@ -0,0 +1,112 @@
+"""
+Alert model and schema for Talazo AgriFinance Platform.
+"""
+
+from datetime import datetime
+from enum import Enum
+from app.core.extensions import db
+from marshmallow import fields
+
+
+class AlertType(Enum):
+    """Enumeration for alert types."""
+    STALE_SOIL_DATA = 'stale_soil_data'
+    HIGH_RISK = 'high_risk'
+    LOW_SCORE = 'low_score'
+    CREDIT_DEFAULT = 'credit_default'
+    POLICY_EXPIRING = 'policy_expiring'
+    PREMIUM_DUE = 'premium_due'
+    PREMIUM_OVERDUE = 'premium_overdue'
+
+
+class AlertStatus(Enum):
+    """Enumeration for alert status."""
+    ACTIVE = 'active'
+    RESOLVED = 'resolved'
+
+
+# Predicate of the open-alert unique index (the enum is stored by name)
+OPEN_ALERT_WHERE = db.text("status = 'ACTIVE'")
+
+
+class Alert(db.Model):
+    """Materialized alert raised for one farmer, soil sample, credit entry or policy."""
+
+    __tablename__ = 'alerts'
+    __table_args__ = (
+        # Summary reads group active alerts by type
+        db.Index('ix_alerts_status_type', 'status', 'alert_type'),
+        # Raise/resolve look up the active alert for an entity
+        db.Index('ix_alerts_entity', 'entity_type', 'entity_id', 'alert_type', 'status'),
+        # At most one open alert per entity and type; raise_alert upserts against it
+        db.Index('uq_alerts_open_entity', 'alert_type', 'entity_type', 'entity_id', unique=True,
+                 postgresql_where=OPEN_ALERT_WHERE, sqlite_where=OPEN_ALERT_WHERE),
+        db.Index('ix_alerts_farmer_status', 'farmer_id', 'status'),
+    )
+
+    # Primary key
+    id = db.Column(db.Integer, primary_key=True)
+
+    # Foreign keys
+    farmer_id = db.Column(db.Integer, db.ForeignKey('farmers.id'), nullable=False)
+
+    # Alert details
+    alert_type = db.Column(db.Enum(AlertType), nullable=False)
+    status = db.Column(db.Enum(AlertStatus), nullable=False, default=AlertStatus.ACTIVE)
+    severity = db.Column(db.String(10), nullable=False)  # high, medium, low
+
+    # Entity that triggered the alert
+    entity_type = db.Column(db.String(20), nullable=False)  # farmer, soil_sample, credit_history, insurance_policy
+    entity_id = db.Column(db.Integer, nullable=False)
+
+    # Lifecycle
+    raised_at = db.Column(db.DateTime, default=datetime.utcnow)
+    resolved_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<Alert {self.alert_type.value} {self.entity_type}:{self.entity_id}>'
+
+    def to_dict(self):
+        """Convert alert to dictionary."""
+        return {
+            'id': self.id,
+            'farmer_id': self.farmer_id,
+            'alert_type': self.alert_type.value if self.alert_type else None,
+            'status': self.status.value if self.status else None,
+            'severity': self.severity,
+            'entity_type': self.entity_type,
+            'entity_id': self.entity_id,
+            'raised_at': self.raised_at.isoformat() if self.raised_at else None,
+            'resolved_at': self.resolved_at.isoformat() if self.resolved_at else None
+        }
+
+
+class AlertBuild(db.Model):
+    """
+    Marks the derived alerts as built.
+
+    ``rebuild`` writes the single row; an empty alerts table cannot tell a
+    never-built database from one with nothing to alert on.
+    """
+
+    __tablename__ = 'alert_builds'
+
+    id = db.Column(db.Integer, primary_key=True)
+    built_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<AlertBuild {self.built_at}>'
+
+
+from marshmallow_sqlalchemy import SQLAlchemyAutoSchema
+
+class AlertSchema(SQLAlchemyAutoSchema):
+    """Marshmallow schema for Alert model."""
+
+    class Meta:
+        model = Alert
+        load_instance = True
+        include_fk = True
+
+    alert_type = fields.Enum(AlertType, by_value=True)
+    status = fields.Enum(AlertStatus, by_value=True)
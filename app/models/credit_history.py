@@ -93,29 +93,34 @@ class CreditHistory(db.Model):
     
     def calculate_risk_score(self):
         """Calculate individual risk score for this credit entry (0-100, higher is better)."""
+        return self.risk_score(self.payment_status, self.days_late, self.loan_amount, self.amount_paid)
+    
+    @staticmethod
+    def risk_score(payment_status, days_late, loan_amount, amount_paid):
+        """Risk score (0-100, higher is better) from an entry's column values."""
         score = 100
         
         # Payment status impact
-        if self.payment_status == PaymentStatus.ON_TIME:
+        if payment_status == PaymentStatus.ON_TIME:
             score += 0  # No penalty
-        elif self.payment_status == PaymentStatus.LATE:
+        elif payment_status == PaymentStatus.LATE:
             score -= 20
-        elif self.payment_status == PaymentStatus.DEFAULTED:
+        elif payment_status == PaymentStatus.DEFAULTED:
             score -= 50
-        elif self.payment_status == PaymentStatus.RESTRUCTURED:
+        elif payment_status == PaymentStatus.RESTRUCTURED:
             score -= 30
         
         # Days late impact
-        if self.days_late:
-            if self.days_late <= 30:
+        if days_late:
+            if days_late <= 30:
                 score -= 10
-            elif self.days_late <= 90:
+            elif days_late <= 90:
                 score -= 25
             else:
                 score -= 40
         
         # Payment ratio impact
-        payment_ratio = self.calculate_payment_ratio()
+        payment_ratio = round((amount_paid or 0) / loan_amount, 4) if loan_amount and loan_amount > 0 else 0.0
         if payment_ratio >= 1.0:
             score += 10  # Bonus for full payment
         elif payment_ratio >= 0.8:
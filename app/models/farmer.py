@@ -13,7 +13,17 @@ class Farmer(db.Model):
     """Farmer model representing farm operators in the system."""
     
     __tablename__ = 'farmers'
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        # Supports keyset pagination over (created_at, id)
+        db.Index('ix_farmers_created_at_id', 'created_at', 'id'),
+        # Delta exports read rows changed since an (updated_at, id) watermark
+        db.Index('ix_farmers_updated_at_id', 'updated_at', 'id'),
+        # Case-insensitive equality filters on the listing endpoint
+        db.Index('ix_farmers_district_lower', db.text('lower(district)')),
+        db.Index('ix_farmers_province_lower', db.text('lower(province)')),
+        db.Index('ix_farmers_primary_crop_lower', db.text('lower(primary_crop)')),
+        {'extend_existing': True}
+    )
     
     # Primary key
     id = db.Column(db.Integer, primary_key=True)
@@ -0,0 +1,40 @@
+"""
+Feature store model for Talazo AgriFinance Platform.
+"""
+
+from datetime import datetime
+from app.core.extensions import db
+
+
+class FarmerFeature(db.Model):
+    """
+    One materialized feature value for a farmer as of a date.
+
+    Rows are written by feature store materialization jobs; the feature
+    names and how they are computed live in the feature definition registry
+    (``app.services.feature_store``). Values are stored as of the end of
+    ``as_of_date`` so training can join features point-in-time.
+    """
+
+    __tablename__ = 'farmer_features'
+    __table_args__ = (
+        db.UniqueConstraint('farmer_id', 'as_of_date', 'name', name='uq_farmer_features_farmer_date_name'),
+        db.Index('ix_farmer_features_farmer_date', 'farmer_id', 'as_of_date'),
+    )
+
+    # Primary key
+    id = db.Column(db.Integer, primary_key=True)
+
+    # Feature identity
+    farmer_id = db.Column(db.Integer, db.ForeignKey('farmers.id', ondelete='CASCADE'), nullable=False)
+    as_of_date = db.Column(db.Date, nullable=False)
+    name = db.Column(db.String(64), nullable=False)
+
+    # Value (None when the source had no data)
+    value = db.Column(db.Float)
+
+    # Timestamps
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<FarmerFeature {self.farmer_id}@{self.as_of_date} {self.name}={self.value}>'
@@ -0,0 +1,30 @@
+"""
+Farmer search index model for Talazo AgriFinance Platform.
+"""
+
+from app.core.extensions import db
+
+
+class FarmerSearchTerm(db.Model):
+    """Trigram posting linking a search gram to the farmer it was taken from."""
+
+    __tablename__ = 'farmer_search_terms'
+    __table_args__ = (
+        # Gram lookups drive every search; farmer_id is included so the
+        # GROUP BY can be answered from the index alone.
+        db.Index('ix_farmer_search_terms_gram_farmer', 'gram', 'farmer_id'),
+        db.Index('ix_farmer_search_terms_farmer', 'farmer_id'),
+    )
+
+    # Primary key
+    id = db.Column(db.Integer, primary_key=True)
+
+    # Foreign keys
+    farmer_id = db.Column(db.Integer, db.ForeignKey('farmers.id'), nullable=False)
+
+    # Posting data
+    field = db.Column(db.String(20), nullable=False)  # full_name, national_id, phone_number
+    gram = db.Column(db.String(3), nullable=False)
+
+    def __repr__(self):
+        return f'<FarmerSearchTerm {self.gram!r} - Farmer {self.farmer_id}>'
@@ -0,0 +1,44 @@
+"""
+Materialized farmer statistics model for Talazo AgriFinance Platform.
+"""
+
+from datetime import datetime
+from app.core.extensions import db
+
+
+class FarmerStatistic(db.Model):
+    """
+    Running counter for one slice of the active farmer population.
+
+    Each row is keyed by a dimension (``total``, ``verified``, ``province``,
+    ``crop``, ``experience``, ``land``) and a key within it (e.g. the province
+    name; empty for scalar dimensions). Numeric dimensions also carry a
+    running sum, minimum and maximum. Removing a farmer that held the minimum
+    or maximum flags the row ``extremes_stale``; the extremes are recomputed
+    on the next read rather than inside the write.
+    """
+
+    __tablename__ = 'farmer_statistics'
+    __table_args__ = (
+        db.UniqueConstraint('dimension', 'key', name='uq_farmer_statistics_dimension_key'),
+    )
+
+    # Primary key
+    id = db.Column(db.Integer, primary_key=True)
+
+    # Slice identity
+    dimension = db.Column(db.String(20), nullable=False)
+    key = db.Column(db.String(100), nullable=False, default='')
+
+    # Aggregates
+    count = db.Column(db.Integer, nullable=False, default=0)
+    value_sum = db.Column(db.Float, nullable=False, default=0.0)
+    value_min = db.Column(db.Float)
+    value_max = db.Column(db.Float)
+    extremes_stale = db.Column(db.Boolean, nullable=False, default=False)
+
+    # Timestamps
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<FarmerStatistic {self.dimension}:{self.key} = {self.count}>'
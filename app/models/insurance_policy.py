@@ -6,6 +6,7 @@ Insurance policy model and schema for Talazo AgriFinance Platform.
 from datetime import datetime, date
 from enum import Enum
 from app.core.extensions import db, ma
+from app.utils.json_cache import json_cache
 from marshmallow import fields, validate
 
 
@@ -40,6 +41,15 @@ class InsurancePolicy(db.Model):
     """Insurance policy model for tracking farmer insurance coverage."""
     
     __tablename__ = 'insurance_policies'
+    JSON_FIELDS = ('covered_perils', 'trigger_conditions', 'payout_schedule', 'exclusions')
+    __table_args__ = (
+        # Supports keyset pagination over (created_at, id)
+        db.Index('ix_insurance_policies_created_at_id', 'created_at', 'id'),
+        # Delta exports read rows changed since an (updated_at, id) watermark
+        db.Index('ix_insurance_policies_updated_at_id', 'updated_at', 'id'),
+        # Parametric trigger evaluation loads active index policies per station
+        db.Index('ix_insurance_policies_station', 'weather_station_id', 'insurance_type', 'status'),
+    )
     
     # Primary key
     id = db.Column(db.Integer, primary_key=True)
@@ -107,13 +117,10 @@ class InsurancePolicy(db.Model):
         return f'<InsurancePolicy {self.policy_number}>'
     
     def generate_policy_number(self):
-        """Generate unique policy number."""
-        import random
-        import string
+        """Generate unique policy number (IP{YYYYMM}{counter})."""
+        from app.services.numbering import number_allocator
         
-        timestamp = datetime.now().strftime('%Y%m')
-        random_part = ''.join(random.choices(string.digits, k=6))
-        return f"IP{timestamp}{random_part}"
+        return number_allocator.next_number('insurance_policy')
     
     def is_active(self):
         """Check if policy is currently active."""
@@ -139,6 +146,25 @@ class InsurancePolicy(db.Model):
             return round((self.total_claims_amount or 0) / self.coverage_amount, 4)
         return 0.0
     
+    def get_covered_perils(self):
+        """Covered perils as a list (parsed once per row version)."""
+        return json_cache.get(self, 'covered_perils', [])
+    
+    def get_trigger_conditions(self):
+        """Parsed trigger conditions (parsed once per row version)."""
+        return json_cache.get(self, 'trigger_conditions', [])
+    
+    def get_payout_schedule(self):
+        """Parsed payout schedule (parsed once per row version)."""
+        return json_cache.get(self, 'payout_schedule', [])
+    
+    def get_exclusions(self):
+        """Exclusions as a list; plain-text exclusions become a single entry."""
+        exclusions = json_cache.get(self, 'exclusions')
+        if exclusions is None:
+            return [self.exclusions] if self.exclusions else []
+        return exclusions
+    
     def calculate_premium_based_on_risk(self, soil_score, credit_score, weather_risk=1.0):
         """Calculate premium based on risk factors."""
         # Base premium rate (percentage of coverage amount)
@@ -178,20 +204,42 @@ class InsurancePolicy(db.Model):
         return self.coverage_amount * final_rate
     
     def get_payout_eligibility(self, event_data):
-        """Check if conditions are met for insurance payout."""
-        # This would be implemented based on specific insurance type
-        # For now, return basic structure
+        """
+        Check if conditions are met for insurance payout.
+        
+        Weather-index policies are evaluated against the observed metrics in
+        ``event_data`` (e.g. {"rainfall_mm": 12.5}); see
+        ``app.services.parametric_triggers`` for the trigger format.
+        """
+        from app.services.parametric_triggers import parse_triggers, evaluate_conditions
+        
+        conditions_met, conditions_failed = [], []
+        payout_amount = 0.0
+        if self.insurance_type == InsuranceType.WEATHER_INDEX and self.is_active():
+            conditions = parse_triggers(self.get_trigger_conditions(), self.get_payout_schedule())
+            conditions_met, conditions_failed = evaluate_conditions(conditions, event_data or {})
+            if conditions_met:
+                payout_percent = max(c['payout_percent'] for c in conditions_met)
+                remaining_cover = max(self.coverage_amount - (self.total_claims_amount or 0), 0.0)
+                payout_amount = round(min(self.coverage_amount * payout_percent / 100, remaining_cover), 2)
+        
         return {
-            'eligible': False,
-            'payout_amount': 0.0,
-            'conditions_met': [],
-            'conditions_failed': [],
+            'eligible': payout_amount > 0,
+            'payout_amount': payout_amount,
+            'conditions_met': conditions_met,
+            'conditions_failed': conditions_failed,
             'assessment_date': datetime.utcnow().isoformat()
         }
     
-    def to_dict(self):
-        """Convert insurance policy to dictionary."""
-        return {
+    def to_dict(self, json_fields=()):
+        """
+        Convert insurance policy to dictionary.
+        
+        Args:
+            json_fields: JSON columns to include decoded (any of JSON_FIELDS);
+                omitted by default so listings skip decoding entirely
+        """
+        data = {
             'id': self.id,
             'policy_number': self.policy_number,
             'farmer_id': self.farmer_id,
@@ -218,6 +266,16 @@ class InsurancePolicy(db.Model):
             'premium_balance': self.premium_balance(),
             'coverage_utilization': self.coverage_utilization()
         }
+        accessors = {
+            'covered_perils': self.get_covered_perils,
+            'trigger_conditions': self.get_trigger_conditions,
+            'payout_schedule': self.get_payout_schedule,
+            'exclusions': self.get_exclusions
+        }
+        for field in json_fields:
+            if field in accessors:
+                data[field] = accessors[field]()
+        return data
 
 
 from marshmallow_sqlalchemy import SQLAlchemyAutoSchema
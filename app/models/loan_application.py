@@ -6,6 +6,7 @@ Loan application model and schema for Talazo AgriFinance Platform.
 from datetime import datetime
 from enum import Enum
 from app.core.extensions import db, ma
+from app.utils.json_cache import json_cache
 from marshmallow import fields, validate
 
 
@@ -36,6 +37,13 @@ class LoanApplication(db.Model):
     """Loan application model for tracking farmer loan requests."""
     
     __tablename__ = 'loan_applications'
+    JSON_FIELDS = ('documents_submitted',)
+    __table_args__ = (
+        # Supports keyset pagination over (created_at, id)
+        db.Index('ix_loan_applications_created_at_id', 'created_at', 'id'),
+        # Delta exports read rows changed since an (updated_at, id) watermark
+        db.Index('ix_loan_applications_updated_at_id', 'updated_at', 'id'),
+    )
     
     # Primary key
     id = db.Column(db.Integer, primary_key=True)
@@ -107,13 +115,10 @@ class LoanApplication(db.Model):
         return f'<LoanApplication {self.application_number}>'
     
     def generate_application_number(self):
-        """Generate unique application number."""
-        import random
-        import string
+        """Generate unique application number (LA{YYYYMMDD}{counter})."""
+        from app.services.numbering import number_allocator
         
-        timestamp = datetime.now().strftime('%Y%m%d')
-        random_part = ''.join(random.choices(string.digits, k=4))
-        return f"LA{timestamp}{random_part}"
+        return number_allocator.next_number('loan_application')
     
     def calculate_debt_to_income_ratio(self):
         """Calculate debt-to-income ratio."""
@@ -217,9 +222,18 @@ class LoanApplication(db.Model):
         
         return assessment
     
-    def to_dict(self):
-        """Convert loan application to dictionary."""
-        return {
+    def get_documents_submitted(self):
+        """Submitted documents as a list (parsed once per row version)."""
+        return json_cache.get(self, 'documents_submitted', [])
+    
+    def to_dict(self, json_fields=()):
+        """
+        Convert loan application to dictionary.
+        
+        Args:
+            json_fields: JSON columns to include decoded (any of JSON_FIELDS)
+        """
+        data = {
             'id': self.id,
             'application_number': self.application_number,
             'farmer_id': self.farmer_id,
@@ -242,6 +256,9 @@ class LoanApplication(db.Model):
             'affordability_ratio': self.calculate_affordability_ratio(),
             'eligibility_assessment': self.get_eligibility_assessment()
         }
+        if 'documents_submitted' in json_fields:
+            data['documents_submitted'] = self.get_documents_submitted()
+        return data
 
 
 from marshmallow_sqlalchemy import SQLAlchemyAutoSchema
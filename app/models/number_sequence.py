@@ -0,0 +1,42 @@
+"""
+Number sequence models for Talazo AgriFinance Platform.
+"""
+
+from app.core.extensions import db
+
+# Numbers handed out per sequence fetch; each worker caches one block
+NUMBER_BLOCK_SIZE = 50
+
+# Digits of the counter in a formatted number. The counter is global, so the
+# width is sized for its lifetime: the widest number (LA + YYYYMMDD + counter)
+# fills the 20-character number columns.
+COUNTER_WIDTH = 10
+COUNTER_MAX = 10 ** COUNTER_WIDTH - 1
+
+# Database sequences for dialects that support them (PostgreSQL). Each
+# nextval returns the start of a fresh block of NUMBER_BLOCK_SIZE numbers.
+application_number_seq = db.Sequence(
+    'loan_application_number_seq', increment=NUMBER_BLOCK_SIZE, maxvalue=COUNTER_MAX,
+    metadata=db.metadata
+)
+policy_number_seq = db.Sequence(
+    'insurance_policy_number_seq', increment=NUMBER_BLOCK_SIZE, maxvalue=COUNTER_MAX,
+    metadata=db.metadata
+)
+
+
+class NumberSequence(db.Model):
+    """
+    Counter backing number generation on databases without sequences.
+
+    Incremented inside the inserting transaction, so a rollback also
+    returns its numbers.
+    """
+
+    __tablename__ = 'number_sequences'
+
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<NumberSequence {self.name} = {self.value}>'
@@ -0,0 +1,47 @@
+"""
+Insurance policy schedule model for Talazo AgriFinance Platform.
+"""
+
+from enum import Enum
+from app.core.extensions import db
+
+
+class PolicyEventType(Enum):
+    """Enumeration for scheduled policy events."""
+    EXPIRY_REMINDER = 'expiry_reminder'
+    EXPIRY = 'expiry'
+    PREMIUM_REMINDER = 'premium_reminder'
+    PREMIUM_OVERDUE = 'premium_overdue'
+
+
+class PolicyScheduleEvent(db.Model):
+    """
+    One upcoming (or fired) time-based event for an insurance policy.
+
+    Pending events ordered by ``fire_at`` form a persistent priority queue:
+    the (fired_at, fire_at) index makes peeking at and popping the earliest
+    due event, and scheduling a new one, O(log n).
+    """
+
+    __tablename__ = 'policy_schedule_events'
+    __table_args__ = (
+        db.Index('ix_policy_schedule_events_queue', 'fired_at', 'fire_at'),
+        db.UniqueConstraint('policy_id', 'event_type', 'fire_at', name='uq_policy_schedule_events_event'),
+    )
+
+    # Primary key
+    id = db.Column(db.Integer, primary_key=True)
+
+    # Foreign keys
+    policy_id = db.Column(db.Integer, db.ForeignKey('insurance_policies.id'), nullable=False, index=True)
+
+    # Event details
+    event_type = db.Column(db.Enum(PolicyEventType), nullable=False)
+    fire_at = db.Column(db.DateTime, nullable=False)
+
+    # Outcome (NULL fired_at means pending)
+    fired_at = db.Column(db.DateTime)
+    outcome = db.Column(db.String(50))
+
+    def __repr__(self):
+        return f'<PolicyScheduleEvent {self.event_type.value} policy:{self.policy_id} at {self.fire_at}>'
@@ -0,0 +1,54 @@
+"""
+Portfolio exposure cube model for Talazo AgriFinance Platform.
+"""
+
+from datetime import datetime
+from app.core.extensions import db
+
+DIMENSIONS = ('source', 'district', 'province', 'primary_crop', 'risk_level', 'status')
+MEASURES = ('count', 'requested_amount', 'approved_amount', 'disbursed_amount', 'outstanding_amount')
+
+
+class PortfolioExposure(db.Model):
+    """
+    Exposure totals for one cell of the portfolio cube.
+
+    Cells are keyed by source (``loan_application`` or ``credit_history``),
+    the borrower's district, province and primary crop, a risk band and the
+    loan status; missing dimension values are stored as ''. The row with an
+    empty source marks the cube as built.
+
+    ``outstanding_amount`` is the recorded remaining balance of credit
+    history entries. Loan application balances amortize with time, which no
+    write signals, so the cube carries their ``disbursed_amount`` and
+    scheduled balances come from the repayment schedule book.
+    """
+
+    __tablename__ = 'portfolio_exposures'
+    __table_args__ = (
+        db.UniqueConstraint(*DIMENSIONS, name='uq_portfolio_exposures_cell'),
+    )
+
+    # Primary key
+    id = db.Column(db.Integer, primary_key=True)
+
+    # Cell identity
+    source = db.Column(db.String(20), nullable=False)
+    district = db.Column(db.String(50), nullable=False, default='')
+    province = db.Column(db.String(50), nullable=False, default='')
+    primary_crop = db.Column(db.String(50), nullable=False, default='')
+    risk_level = db.Column(db.String(20), nullable=False, default='')
+    status = db.Column(db.String(20), nullable=False, default='')
+
+    # Measures
+    count = db.Column(db.Integer, nullable=False, default=0)
+    requested_amount = db.Column(db.Float, nullable=False, default=0.0)
+    approved_amount = db.Column(db.Float, nullable=False, default=0.0)
+    disbursed_amount = db.Column(db.Float, nullable=False, default=0.0)
+    outstanding_amount = db.Column(db.Float, nullable=False, default=0.0)
+
+    # Timestamps
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<PortfolioExposure {self.source}:{self.district}/{self.primary_crop}/{self.status} = {self.count}>'
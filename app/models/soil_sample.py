@@ -30,7 +30,11 @@ class SoilSample(db.Model):
     """Soil sample model representing soil analysis data."""
     
     __tablename__ = 'soil_samples'
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        # Delta exports read rows changed since an (updated_at, id) watermark
+        db.Index('ix_soil_samples_updated_at_id', 'updated_at', 'id'),
+        {'extend_existing': True}
+    )
     
     # Primary key
     id = db.Column(db.Integer, primary_key=True)
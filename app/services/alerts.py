@@ -0,0 +1,313 @@
+"""
+Alert maintenance service for Talazo AgriFinance Platform.
+
+Alerts are stored in the ``alerts`` table instead of being recomputed on
+every ``/api/alerts`` call:
+
+- Soil sample and credit history mapper events raise and resolve the alerts
+  their own rows trigger (high risk, low score, defaulted credit) and resolve
+  a farmer's stale-data alert when a recent sample arrives.
+- ``sweep`` handles the time-based condition (no sample in the last 90
+  days), which no write can signal. It is meant to run daily.
+- ``rebuild`` re-derives the soil, score and credit alerts from source tables
+  and records the build in ``alert_builds``. Reads run it on first use; until
+  then the mapper events leave the table alone, as farmer statistics do.
+- Insurance policy reminders are raised by the policy scheduler.
+"""
+
+import logging
+import weakref
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from sqlalchemy import event
+
+from app.core.extensions import db
+from app.models import Farmer, SoilSample, CreditHistory
+from app.models.alert import Alert, AlertBuild, AlertType, AlertStatus, OPEN_ALERT_WHERE
+from app.models.credit_history import PaymentStatus
+from app.models.soil_sample import RiskLevel
+from app.utils.upsert import upsert
+
+logger = logging.getLogger(__name__)
+
+STALE_SOIL_DATA_DAYS = 90
+LOW_SCORE_THRESHOLD = 40
+
+ALERT_SEVERITY = {
+    AlertType.STALE_SOIL_DATA: 'medium',
+    AlertType.HIGH_RISK: 'high',
+    AlertType.LOW_SCORE: 'low',
+    AlertType.CREDIT_DEFAULT: 'high',
+    AlertType.POLICY_EXPIRING: 'low',
+    AlertType.PREMIUM_DUE: 'medium',
+    AlertType.PREMIUM_OVERDUE: 'high'
+}
+
+# Alert types derived from source tables (policy alerts come from the
+# policy scheduler and are left alone by rebuild)
+DERIVED_ALERT_TYPES = (
+    AlertType.STALE_SOIL_DATA, AlertType.HIGH_RISK, AlertType.LOW_SCORE, AlertType.CREDIT_DEFAULT
+)
+
+
+def _enum_matches(value, member) -> bool:
+    """Compare an Enum column value that may be a member or its name."""
+    return value == member or value == member.name
+
+
+class AlertService:
+    """Raise, resolve and summarize materialized alerts."""
+
+    def __init__(self):
+        self.table = Alert.__table__
+        # Engines whose derived alerts are known to be built
+        self._initialized = weakref.WeakSet()
+
+    def raise_alert(self, connection, alert_type: AlertType, entity_type: str,
+                    entity_id: int, farmer_id: int):
+        """
+        Insert an active alert unless one already exists for the entity.
+
+        A single upsert against the open-alert unique index, so concurrent
+        writers cannot raise the same alert twice.
+        """
+        t = self.table
+        upsert(connection, t, {
+            'farmer_id': farmer_id,
+            'alert_type': alert_type,
+            'status': AlertStatus.ACTIVE,
+            'severity': ALERT_SEVERITY[alert_type],
+            'entity_type': entity_type,
+            'entity_id': entity_id,
+            'raised_at': datetime.utcnow()
+        }, index_elements=[t.c.alert_type, t.c.entity_type, t.c.entity_id],
+            index_where=OPEN_ALERT_WHERE)
+
+    def resolve_alert(self, connection, alert_type: AlertType, entity_type: str, entity_id: int):
+        """Resolve the active alert for an entity, if any."""
+        t = self.table
+        connection.execute(t.update().where(
+            t.c.entity_type == entity_type,
+            t.c.entity_id == entity_id,
+            t.c.alert_type == alert_type,
+            t.c.status == AlertStatus.ACTIVE
+        ).values(status=AlertStatus.RESOLVED, resolved_at=datetime.utcnow()))
+
+    def set_alert(self, connection, condition: bool, alert_type: AlertType,
+                  entity_type: str, entity_id: int, farmer_id: int):
+        """Raise the alert when ``condition`` holds, resolve it otherwise."""
+        if condition:
+            self.raise_alert(connection, alert_type, entity_type, entity_id, farmer_id)
+        else:
+            self.resolve_alert(connection, alert_type, entity_type, entity_id)
+
+    def is_initialized(self, connection) -> bool:
+        """Whether derived alerts were built; only the positive answer is cached."""
+        if connection.engine in self._initialized:
+            return True
+        initialized = connection.execute(
+            db.select(AlertBuild.id).limit(1)
+        ).first() is not None
+        if initialized:
+            self._initialized.add(connection.engine)
+        return initialized
+
+    def ensure_built(self):
+        """Build the derived alerts on first use."""
+        if not self.is_initialized(db.session.connection()):
+            self.rebuild()
+
+    def evaluate_soil_sample(self, connection, sample: SoilSample):
+        """Apply the alert conditions a soil sample write can change."""
+        self.set_alert(
+            connection, _enum_matches(sample.risk_level, RiskLevel.HIGH),
+            AlertType.HIGH_RISK, 'soil_sample', sample.id, sample.farmer_id
+        )
+        self.set_alert(
+            connection,
+            sample.financial_index_score is not None and
+            sample.financial_index_score < LOW_SCORE_THRESHOLD,
+            AlertType.LOW_SCORE, 'soil_sample', sample.id, sample.farmer_id
+        )
+
+        cutoff = datetime.utcnow() - timedelta(days=STALE_SOIL_DATA_DAYS)
+        if sample.collection_date and sample.collection_date >= cutoff:
+            self.resolve_alert(connection, AlertType.STALE_SOIL_DATA, 'farmer', sample.farmer_id)
+
+    def evaluate_credit_entry(self, connection, entry: CreditHistory):
+        """Apply the alert conditions a credit history write can change."""
+        self.set_alert(
+            connection, _enum_matches(entry.payment_status, PaymentStatus.DEFAULTED),
+            AlertType.CREDIT_DEFAULT, 'credit_history', entry.id, entry.farmer_id
+        )
+
+    def sweep(self, now: datetime = None) -> Dict[str, int]:
+        """
+        Apply time-based alert conditions.
+
+        Raises stale-data alerts for active farmers with no soil sample in
+        the last 90 days and resolves those no longer applicable, each as a
+        single set-based statement.
+
+        Returns:
+            dict: Number of alerts raised and resolved
+        """
+        now = now or datetime.utcnow()
+        cutoff = now - timedelta(days=STALE_SOIL_DATA_DAYS)
+        t = self.table
+
+        recent_sample = db.select(SoilSample.id).where(
+            SoilSample.farmer_id == Farmer.id,
+            SoilSample.collection_date >= cutoff
+        ).exists()
+        open_alert = db.select(t.c.id).where(
+            t.c.entity_type == 'farmer',
+            t.c.entity_id == Farmer.id,
+            t.c.alert_type == AlertType.STALE_SOIL_DATA,
+            t.c.status == AlertStatus.ACTIVE
+        ).exists()
+
+        stale_farmers = db.select(
+            Farmer.id,
+            db.literal(AlertType.STALE_SOIL_DATA, t.c.alert_type.type),
+            db.literal(AlertStatus.ACTIVE, t.c.status.type),
+            db.literal(ALERT_SEVERITY[AlertType.STALE_SOIL_DATA]),
+            db.literal('farmer'),
+            Farmer.id,
+            db.literal(now)
+        ).where(
+            Farmer.is_active == True,
+            ~recent_sample,
+            ~open_alert
+        )
+        raised = db.session.execute(t.insert().from_select(
+            ['farmer_id', 'alert_type', 'status', 'severity', 'entity_type', 'entity_id', 'raised_at'],
+            stale_farmers
+        )).rowcount
+
+        farmer_active = db.select(Farmer.id).where(
+            Farmer.id == t.c.entity_id,
+            Farmer.is_active == True
+        ).exists()
+        has_recent_sample = db.select(SoilSample.id).where(
+            SoilSample.farmer_id == t.c.entity_id,
+            SoilSample.collection_date >= cutoff
+        ).exists()
+        resolved = db.session.execute(t.update().where(
+            t.c.alert_type == AlertType.STALE_SOIL_DATA,
+            t.c.status == AlertStatus.ACTIVE,
+            db.or_(~farmer_active, has_recent_sample)
+        ).values(status=AlertStatus.RESOLVED, resolved_at=now)).rowcount
+
+        db.session.commit()
+        logger.info(f"Alert sweep raised {raised} and resolved {resolved} stale soil data alerts")
+        return {'raised': raised, 'resolved': resolved}
+
+    def rebuild(self) -> Dict[str, int]:
+        """
+        Re-derive active soil, score and credit alerts from source tables, then sweep.
+
+        Returns:
+            dict: Number of active alerts per type
+        """
+        t = self.table
+        now = datetime.utcnow()
+        db.session.execute(t.update().where(
+            t.c.status == AlertStatus.ACTIVE,
+            t.c.alert_type.in_(DERIVED_ALERT_TYPES)
+        ).values(status=AlertStatus.RESOLVED, resolved_at=now))
+
+        columns = ['farmer_id', 'alert_type', 'status', 'severity', 'entity_type', 'entity_id', 'raised_at']
+
+        def insert_from(alert_type, entity_type, model, condition):
+            db.session.execute(t.insert().from_select(columns, db.select(
+                model.farmer_id,
+                db.literal(alert_type, t.c.alert_type.type),
+                db.literal(AlertStatus.ACTIVE, t.c.status.type),
+                db.literal(ALERT_SEVERITY[alert_type]),
+                db.literal(entity_type),
+                model.id,
+                db.literal(now)
+            ).where(condition)))
+
+        insert_from(AlertType.HIGH_RISK, 'soil_sample', SoilSample,
+                    SoilSample.risk_level == RiskLevel.HIGH)
+        insert_from(AlertType.LOW_SCORE, 'soil_sample', SoilSample,
+                    SoilSample.financial_index_score < LOW_SCORE_THRESHOLD)
+        insert_from(AlertType.CREDIT_DEFAULT, 'credit_history', CreditHistory,
+                    CreditHistory.payment_status == PaymentStatus.DEFAULTED)
+        upsert(db.session.connection(), AlertBuild.__table__, {'id': 1, 'built_at': now},
+               index_elements=[AlertBuild.__table__.c.id], set_={'built_at': now})
+        db.session.commit()
+
+        self.sweep(now)
+        return self._count_active()
+
+    def count_active(self) -> Dict[str, int]:
+        """Count active alerts per type with one indexed GROUP BY."""
+        self.ensure_built()
+        return self._count_active()
+
+    def _count_active(self) -> Dict[str, int]:
+        counts = {alert_type.value: 0 for alert_type in AlertType}
+        rows = db.session.query(
+            Alert.alert_type, db.func.count(Alert.id)
+        ).filter(
+            Alert.status == AlertStatus.ACTIVE
+        ).group_by(Alert.alert_type).all()
+        for alert_type, count in rows:
+            counts[alert_type.value] = count
+        return counts
+
+    def list_active(self, farmer_id: int = None, limit: int = 50) -> List[Alert]:
+        """List the most recent active alerts, optionally for one farmer."""
+        self.ensure_built()
+        query = Alert.query.filter(Alert.status == AlertStatus.ACTIVE)
+        if farmer_id:
+            query = query.filter(Alert.farmer_id == farmer_id)
+        return query.order_by(Alert.raised_at.desc(), Alert.id.desc()).limit(limit).all()
+
+
+alert_service = AlertService()
+
+
+# Until the first build the events skip derived alerts; the build derives them
+
+def _after_soil_sample_write(mapper, connection, target):
+    if alert_service.is_initialized(connection):
+        alert_service.evaluate_soil_sample(connection, target)
+
+
+def _after_soil_sample_delete(mapper, connection, target):
+    if not alert_service.is_initialized(connection):
+        return
+    for alert_type in (AlertType.HIGH_RISK, AlertType.LOW_SCORE):
+        alert_service.resolve_alert(connection, alert_type, 'soil_sample', target.id)
+
+
+def _after_credit_entry_write(mapper, connection, target):
+    if alert_service.is_initialized(connection):
+        alert_service.evaluate_credit_entry(connection, target)
+
+
+def _after_credit_entry_delete(mapper, connection, target):
+    if alert_service.is_initialized(connection):
+        alert_service.resolve_alert(connection, AlertType.CREDIT_DEFAULT, 'credit_history', target.id)
+
+
+_LISTENERS = (
+    (SoilSample, 'after_insert', _after_soil_sample_write),
+    (SoilSample, 'after_update', _after_soil_sample_write),
+    (SoilSample, 'after_delete', _after_soil_sample_delete),
+    (CreditHistory, 'after_insert', _after_credit_entry_write),
+    (CreditHistory, 'after_update', _after_credit_entry_write),
+    (CreditHistory, 'after_delete', _after_credit_entry_delete),
+)
+
+
+def register_alert_listeners():
+    """Raise and resolve alerts on soil sample and credit history writes."""
+    for model, identifier, listener in _LISTENERS:
+        if not event.contains(model, identifier, listener):
+            event.listen(model, identifier, listener)
@@ -0,0 +1,382 @@
+"""
+Gridded climate dataset for Talazo AgriFinance Platform.
+
+Historical monthly rainfall (and optionally mean temperature) on a regular
+latitude/longitude grid, e.g. CHIRPS monthly totals converted to NumPy
+stacks of shape (months, rows, cols). A dataset directory holds::
+
+    grid.json         grid origin, resolution, shape and first month
+    rainfall.npy      float32 monthly rainfall (mm)
+    temperature.npy   float32 monthly mean temperature (C), optional
+    layers.npy        float32 per-cell layers, one plane per LAYERS entry
+
+Arrays are opened with ``mmap_mode='r'``: every worker process maps the
+same files, so the operating system page cache holds a single copy.
+
+The dataset path is a symlink to a versioned sibling directory
+(``climate -> climate.v<version>``). A rebuild writes a new version and
+publishes it by renaming a fresh symlink over the old one, which is atomic:
+readers see either the old or the new version, never a missing dataset.
+Files a worker has mapped are never rewritten in place, and each worker
+re-reads the link on access, so all of them move to the new version. The
+previous version is kept for workers still opening it; older ones are
+removed.
+
+Coordinates map to cells by index arithmetic on the regular grid, so point
+queries read a handful of values and region queries read one window.
+
+Years are counted in 12-month blocks from the first month; start the stack
+in October to follow the Southern African rainfall season.
+"""
+
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import warnings
+from datetime import date
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from flask import current_app, has_app_context
+
+logger = logging.getLogger(__name__)
+
+LAYERS = (
+    'annual_rainfall_mean',
+    'rainfall_cv',
+    'drought_frequency',
+    'temperature_mean',
+    'weather_risk'
+)
+
+# A year is a drought year when its rainfall falls below this share of the cell's mean
+DROUGHT_THRESHOLD = 0.7
+
+# Weather risk layer (0-100): rainfall deficit, variability, drought frequency and heat
+ADEQUATE_RAINFALL_MM = 800
+RISK_BASE = 15
+DEFICIT_WEIGHT = 35
+CV_WEIGHT = 60
+DROUGHT_WEIGHT = 30
+HEAT_THRESHOLD_C = 24
+HEAT_WEIGHT = 2
+
+GRID_FILE = 'grid.json'
+ROW_CHUNK = 64
+
+# Seconds before a directory without a dataset is checked again
+MISSING_RECHECK_SECONDS = 60.0
+
+# Versioned dataset directories are siblings named <directory><VERSION_SEPARATOR><version>
+VERSION_SEPARATOR = '.v'
+
+
+def _cell_layers(rainfall: np.ndarray, temperature: Optional[np.ndarray]) -> np.ndarray:
+    """Compute LAYERS for a block of grid rows; returns (len(LAYERS), rows, cols)."""
+    years = rainfall.shape[0] // 12
+    if years < 1:
+        raise ValueError('At least 12 months of rainfall are required')
+
+    annual = rainfall[:years * 12].astype(np.float64).reshape(years, 12, *rainfall.shape[1:]).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = annual.mean(axis=0)
+        cv = np.where(mean > 0, annual.std(axis=0) / mean, np.nan)
+        drought = (annual < DROUGHT_THRESHOLD * mean).mean(axis=0)
+    drought = np.where(np.isnan(mean), np.nan, drought)
+
+    if temperature is not None:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            temperature_mean = np.nanmean(temperature.astype(np.float64), axis=0)
+        heat = np.nan_to_num(np.clip(temperature_mean - HEAT_THRESHOLD_C, 0, None) * HEAT_WEIGHT)
+    else:
+        temperature_mean = np.full(mean.shape, np.nan)
+        heat = 0.0
+
+    deficit = np.clip((ADEQUATE_RAINFALL_MM - mean) / ADEQUATE_RAINFALL_MM, 0, 1)
+    risk = np.clip(
+        RISK_BASE + DEFICIT_WEIGHT * deficit + CV_WEIGHT * np.minimum(cv, 1) +
+        DROUGHT_WEIGHT * drought + heat,
+        0, 100
+    )
+
+    return np.stack([mean, cv, drought, temperature_mean, risk]).astype(np.float32)
+
+
+def build_climate_dataset(directory: str, rainfall: np.ndarray, lat0: float, lon0: float,
+                          resolution: float, start_month: date,
+                          temperature: Optional[np.ndarray] = None) -> 'ClimateDataset':
+    """
+    Write a climate dataset and its precomputed per-cell layers.
+
+    Args:
+        directory (str): Output directory
+        rainfall (ndarray): Monthly rainfall, shape (months, rows, cols); NaN for no data
+        lat0, lon0 (float): Centre of the first (north-west) cell
+        resolution (float): Cell size in degrees (rows run south, columns east)
+        start_month (date): Month of the first plane
+        temperature (ndarray, optional): Monthly mean temperature, same shape
+
+    Inputs may themselves be memory-mapped; they are converted and layers
+    are computed in row chunks, so the whole stack never has to be in
+    memory. The dataset is written to a new version directory and then
+    published by swapping the ``directory`` symlink; workers that mapped
+    the previous files keep reading them until they next access the dataset.
+    """
+    if rainfall.ndim != 3:
+        raise ValueError('rainfall must have shape (months, rows, cols)')
+    if temperature is not None and temperature.shape != rainfall.shape:
+        raise ValueError('temperature must have the same shape as rainfall')
+
+    directory = os.path.normpath(directory)
+    staging = f'{directory}.building-{os.getpid()}'
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    months, rows, cols = rainfall.shape
+
+    def create(name, shape):
+        return np.lib.format.open_memmap(os.path.join(staging, name), mode='w+',
+                                         dtype=np.float32, shape=shape)
+
+    try:
+        rainfall_out = create('rainfall.npy', rainfall.shape)
+        temperature_out = create('temperature.npy', temperature.shape) if temperature is not None else None
+        layers = create('layers.npy', (len(LAYERS), rows, cols))
+        for row in range(0, rows, ROW_CHUNK):
+            block = slice(row, row + ROW_CHUNK)
+            rainfall_block = np.asarray(rainfall[:, block], dtype=np.float32)
+            temperature_block = np.asarray(temperature[:, block], dtype=np.float32) \
+                if temperature is not None else None
+            rainfall_out[:, block] = rainfall_block
+            if temperature_out is not None:
+                temperature_out[:, block] = temperature_block
+            layers[:, block] = _cell_layers(rainfall_block, temperature_block)
+        for array in (rainfall_out, temperature_out, layers):
+            if array is not None:
+                array.flush()
+        del rainfall_out, temperature_out, layers
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    grid = {
+        'lat0': float(lat0), 'lon0': float(lon0), 'resolution': float(resolution),
+        'rows': rows, 'cols': cols, 'months': months,
+        'start_month': start_month.strftime('%Y-%m'),
+        'layers': list(LAYERS),
+        'has_temperature': temperature is not None
+    }
+    with open(os.path.join(staging, GRID_FILE), 'w') as f:
+        json.dump(grid, f, indent=2)
+
+    version = f'{directory}{VERSION_SEPARATOR}{time.time_ns()}-{os.getpid()}'
+    os.replace(staging, version)
+    _publish_version(directory, version)
+    reset_climate_dataset(directory)
+
+    logger.info(f"Built climate dataset {rows}x{cols} cells, {months} months in {version}")
+    return ClimateDataset(version)
+
+
+def _version_path(directory: str) -> str:
+    """Version directory the ``directory`` symlink points to (itself if not a link)."""
+    try:
+        target = os.readlink(directory)
+    except OSError:
+        return directory
+    return os.path.normpath(os.path.join(os.path.dirname(directory), target))
+
+
+def _publish_version(directory: str, version: str):
+    """Point ``directory`` at ``version`` and remove all but the previous version."""
+    previous = _version_path(directory) if os.path.lexists(directory) else None
+    if previous == directory:
+        # A dataset built before versioning: the symlink cannot be renamed
+        # over a directory, so move it aside as the previous version
+        previous = f'{directory}{VERSION_SEPARATOR}0-{os.getpid()}'
+        os.replace(directory, previous)
+
+    link = f'{directory}.link-{os.getpid()}'
+    if os.path.lexists(link):
+        os.remove(link)
+    os.symlink(os.path.basename(version), link)
+    os.replace(link, directory)
+
+    parent, name = os.path.split(directory)
+    for entry in os.listdir(parent or '.'):
+        path = os.path.join(parent, entry)
+        if entry.startswith(name + VERSION_SEPARATOR) and path not in (version, previous):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+class ClimateDataset:
+    """Read-only, memory-mapped view of a gridded climate dataset."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, GRID_FILE)) as f:
+            self.grid = json.load(f)
+        self.lat0 = self.grid['lat0']
+        self.lon0 = self.grid['lon0']
+        self.resolution = self.grid['resolution']
+        self.shape = (self.grid['rows'], self.grid['cols'])
+        self.layers = np.load(os.path.join(directory, 'layers.npy'), mmap_mode='r')
+        self.rainfall = np.load(os.path.join(directory, 'rainfall.npy'), mmap_mode='r')
+        self.temperature = np.load(os.path.join(directory, 'temperature.npy'), mmap_mode='r') \
+            if self.grid.get('has_temperature') else None
+        self._layer_index = {name: i for i, name in enumerate(self.grid['layers'])}
+
+    def layer(self, name: str) -> np.ndarray:
+        """One per-cell layer as a (rows, cols) memory-mapped array."""
+        if name not in self._layer_index:
+            raise ValueError(f"Unknown climate layer: {name}")
+        return self.layers[self._layer_index[name]]
+
+    def cells(self, lats, lons) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Vectorized coordinate index: (rows, cols, inside) for arrays of coordinates."""
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        rows = np.floor((self.lat0 - lats) / self.resolution + 0.5)
+        cols = np.floor((lons - self.lon0) / self.resolution + 0.5)
+        inside = (rows >= 0) & (rows < self.shape[0]) & (cols >= 0) & (cols < self.shape[1])
+        rows = np.where(inside, rows, 0).astype(np.int64)
+        cols = np.where(inside, cols, 0).astype(np.int64)
+        return rows, cols, inside
+
+    def cell(self, lat: float, lon: float) -> Optional[Tuple[int, int]]:
+        """Grid cell containing a coordinate, or None outside the grid."""
+        row, col = self._index(lat, lon)
+        if 0 <= row < self.shape[0] and 0 <= col < self.shape[1]:
+            return row, col
+        return None
+
+    def sample(self, name: str, lats, lons) -> np.ndarray:
+        """Layer values at arrays of coordinates (NaN outside the grid)."""
+        rows, cols, inside = self.cells(lats, lons)
+        values = self.layer(name)[rows, cols].astype(np.float64)
+        return np.where(inside, values, np.nan)
+
+    def point(self, lat: float, lon: float) -> Optional[Dict[str, float]]:
+        """All layers for the cell containing a coordinate."""
+        cell = self.cell(lat, lon)
+        if cell is None:
+            return None
+        values = self.layers[:, cell[0], cell[1]]
+        return {name: self._value(values[i]) for name, i in self._layer_index.items()}
+
+    def region(self, lat_min: float, lat_max: float, lon_min: float, lon_max: float) -> Optional[Dict]:
+        """
+        Climate summary for a bounding box.
+
+        Rainfall CV and drought frequency are computed from the area-mean
+        annual rainfall series, so they describe the region as a whole;
+        the other layers are averaged over the region's cells.
+        """
+        north, west = self._index(lat_max, lon_min)
+        south, east = self._index(lat_min, lon_max)
+        row_slice = slice(max(north, 0), min(south, self.shape[0] - 1) + 1)
+        col_slice = slice(max(west, 0), min(east, self.shape[1] - 1) + 1)
+        if row_slice.start >= row_slice.stop or col_slice.start >= col_slice.stop:
+            return None
+
+        window = self.layers[:, row_slice, col_slice]
+        with np.errstate(invalid='ignore'):
+            valid = ~np.isnan(window[self._layer_index['annual_rainfall_mean']])
+            if not valid.any():
+                return None
+            years = self.grid['months'] // 12
+            monthly = self.rainfall[:years * 12, row_slice, col_slice][:, valid].astype(np.float64)
+            annual = monthly.reshape(years, 12, -1).sum(axis=1).mean(axis=1)
+            mean = annual.mean()
+
+        summary = {
+            'cells': int(valid.sum()),
+            'annual_rainfall_mean': round(float(mean), 2),
+            'rainfall_cv': round(float(annual.std() / mean), 4) if mean > 0 else None,
+            'drought_frequency': round(float((annual < DROUGHT_THRESHOLD * mean).mean()), 4),
+        }
+        for name in ('temperature_mean', 'weather_risk'):
+            values = window[self._layer_index[name]][valid]
+            summary[name] = None if np.isnan(values).all() else self._value(np.nanmean(values))
+        return summary
+
+    def rainfall_series(self, lat: float, lon: float) -> Optional[np.ndarray]:
+        """Monthly rainfall history for the cell containing a coordinate."""
+        cell = self.cell(lat, lon)
+        if cell is None:
+            return None
+        return np.asarray(self.rainfall[:, cell[0], cell[1]], dtype=np.float64)
+
+    def _index(self, lat: float, lon: float) -> Tuple[int, int]:
+        row = int(np.floor((self.lat0 - lat) / self.resolution + 0.5))
+        col = int(np.floor((lon - self.lon0) / self.resolution + 0.5))
+        return row, col
+
+    @staticmethod
+    def _value(value) -> Optional[float]:
+        value = float(value)
+        return None if np.isnan(value) else round(value, 4)
+
+
+_datasets: Dict[str, ClimateDataset] = {}
+# Directories found without a dataset, with the time they were checked
+_missing: Dict[str, float] = {}
+_lock = threading.Lock()
+
+
+def climate_data_path() -> str:
+    """Configured dataset directory (default ``<instance>/climate``)."""
+    return current_app.config.get('CLIMATE_DATA_PATH') or os.path.join(current_app.instance_path, 'climate')
+
+
+def get_climate_dataset(directory: Optional[str] = None) -> Optional[ClimateDataset]:
+    """
+    Return the process-wide dataset for ``directory`` (default: configured path).
+
+    Returns None when no dataset has been built there, or when called
+    outside an application context without a directory. Each call reads the
+    ``directory`` symlink (one ``readlink``), so a version published by
+    another process replaces the opened one. A missing dataset is
+    remembered for ``MISSING_RECHECK_SECONDS`` (or until a build in this
+    process), so callers on the request path do not hit the filesystem.
+    """
+    if directory is None:
+        if not has_app_context():
+            return None
+        directory = climate_data_path()
+    directory = os.path.normpath(directory)
+
+    dataset = _datasets.get(directory)
+    if dataset is None:
+        checked_at = _missing.get(directory)
+        if checked_at is not None and time.monotonic() - checked_at < MISSING_RECHECK_SECONDS:
+            return None
+    version = _version_path(directory)
+    if dataset is not None and dataset.directory == version:
+        return dataset
+
+    with _lock:
+        dataset = _datasets.get(directory)
+        if dataset is None or dataset.directory != version:
+            if not os.path.exists(os.path.join(version, GRID_FILE)):
+                _datasets.pop(directory, None)
+                _missing[directory] = time.monotonic()
+                return None
+            dataset = _datasets[directory] = ClimateDataset(version)
+            _missing.pop(directory, None)
+    return dataset
+
+
+def reset_climate_dataset(directory: Optional[str] = None):
+    """Forget opened (or missing) datasets so a rebuilt one is picked up."""
+    with _lock:
+        if directory is None:
+            _datasets.clear()
+            _missing.clear()
+        else:
+            directory = os.path.normpath(directory)
+            _datasets.pop(directory, None)
+            _missing.pop(directory, None)
@@ -0,0 +1,147 @@
+"""
+Array-compiled tree ensembles for Talazo AgriFinance Platform.
+
+``compile_forest`` flattens a fitted scikit-learn regression tree or forest
+into a few packed NumPy arrays (all trees' nodes concatenated):
+
+    feature       int32    split feature per node (0 for leaves)
+    threshold     float64  split threshold (+inf for leaves)
+    left/right    int32    child node indices (a leaf points to itself)
+    missing_left  bool     whether a NaN input goes to the left child
+    value         float64  node prediction
+    roots         int32    root node of each tree
+
+Prediction walks every tree at once, one level per step, for ``max_depth``
+steps. Leaves point to themselves, so rows that reach a leaf early just
+stay there. A single row costs a few dozen small array operations instead
+of scikit-learn's per-call validation and per-tree dispatch, which is what
+dominates interactive one-sample predictions.
+
+As in scikit-learn, inputs are compared at float32 precision and a row
+goes left when ``x[feature] <= threshold``. A NaN input follows the tree's
+recorded missing-value direction (``tree_.missing_go_to_left``): the side
+missing values went during training or, for splits that saw none, the
+child with more training samples.
+"""
+
+from typing import Any
+
+import numpy as np
+
+LEAF = -1
+
+
+class CompiledForest:
+    """Packed node arrays for a tree ensemble, with a vectorized evaluator."""
+
+    # Instances pickled before missing-value directions were recorded
+    missing_left = None
+
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth: int, n_features: int,
+                 missing_left=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.missing_left = missing_left
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.n_features_in_ = n_features
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    def apply(self, X) -> np.ndarray:
+        """Leaf node index reached in each tree, shape (rows, trees)."""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected {self.n_features_in_} features, got {X.shape[1]}")
+        X = X.astype(np.float64)
+        has_missing = bool(np.isnan(X).any())
+        if has_missing and self.missing_left is None:
+            # Compiled before missing-value directions were recorded
+            raise ValueError("Input contains NaN")
+
+        nodes = np.broadcast_to(self.roots, (X.shape[0], self.n_trees))
+        if X.shape[0] == 1:
+            # Single row: index the row directly instead of fancy 2-D indexing
+            row = X[0]
+            nodes = nodes[0]
+            for _ in range(self.max_depth):
+                go_left = self._go_left(row[self.feature[nodes]], nodes, has_missing)
+                nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+            return nodes.reshape(1, -1)
+
+        row_index = np.arange(X.shape[0])[:, None]
+        for _ in range(self.max_depth):
+            go_left = self._go_left(X[row_index, self.feature[nodes]], nodes, has_missing)
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def _go_left(self, values, nodes, has_missing: bool) -> np.ndarray:
+        go_left = values <= self.threshold[nodes]
+        if has_missing:
+            go_left = np.where(np.isnan(values), self.missing_left[nodes], go_left)
+        return go_left
+
+    def predict(self, X) -> np.ndarray:
+        """Mean prediction over trees for each row."""
+        return self.value[self.apply(X)].mean(axis=1)
+
+
+def compile_forest(model: Any) -> CompiledForest:
+    """
+    Flatten a fitted single-output regression tree or forest.
+
+    Supports DecisionTreeRegressor and ensembles of them exposing
+    ``estimators_`` (RandomForestRegressor, ExtraTreesRegressor).
+
+    Raises:
+        ValueError: Unsupported or multi-output model
+    """
+    estimators = getattr(model, 'estimators_', None)
+    if estimators is None:
+        estimators = [model]
+    if not len(estimators) or any(not hasattr(estimator, 'tree_') for estimator in estimators):
+        raise ValueError(f"Cannot compile {type(model).__name__}: not a tree ensemble")
+
+    features, thresholds, lefts, rights, missing_lefts, values, roots = [], [], [], [], [], [], []
+    max_depth = 0
+    offset = 0
+    for estimator in estimators:
+        tree = estimator.tree_
+        if tree.n_outputs != 1 or tree.value.shape[2] != 1:
+            raise ValueError("Only single-output regression trees can be compiled")
+
+        nodes = np.arange(tree.node_count, dtype=np.int32)
+        is_leaf = tree.children_left == LEAF
+        features.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+        thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+        lefts.append(np.where(is_leaf, nodes, tree.children_left).astype(np.int32) + offset)
+        rights.append(np.where(is_leaf, nodes, tree.children_right).astype(np.int32) + offset)
+        # scikit-learn < 1.3 has no missing-value routing (and rejects NaN)
+        missing_lefts.append(getattr(tree, 'missing_go_to_left', None))
+        values.append(tree.value[:, 0, 0].astype(np.float64))
+        roots.append(offset)
+        max_depth = max(max_depth, tree.max_depth)
+        offset += tree.node_count
+
+    return CompiledForest(
+        feature=np.concatenate(features),
+        threshold=np.concatenate(thresholds),
+        left=np.concatenate(lefts),
+        right=np.concatenate(rights),
+        missing_left=None if any(m is None for m in missing_lefts) else np.concatenate(missing_lefts).astype(bool),
+        value=np.concatenate(values),
+        roots=np.array(roots, dtype=np.int32),
+        max_depth=int(max_depth),
+        n_features=int(getattr(model, 'n_features_in_', estimators[0].n_features_in_))
+    )
@@ -1,36 +1,148 @@
 # app/services/data_exporter.py
 """
 Data Export Service for Talazo AgriFinance Platform.
+
+Exports are streamed: each table is read with ``yield_per`` and
+``stream_results`` (a server-side cursor on PostgreSQL) as plain column
+tuples, never as ORM objects, and written chunk by chunk through a
+buffered, optionally gzip-compressed CSV writer. Memory use depends on
+the chunk size, not on the table size.
+
+Delta exports (``export_delta``) write only the rows changed since the
+previous delta run. Each table keeps an ``(updated_at, id)`` watermark in
+``delta_state.json``; a run exports the rows after it, up to the newest
+row at the start of the run, into ``delta_<sequence>_<timestamp>/`` with
+a ``manifest.json`` telling consumers what to apply. The first run
+exports every row and serves as the baseline.
+
+``updated_at`` is stamped when a row is flushed, not when its transaction
+commits, so a row can become visible after a run has already moved the
+watermark past its timestamp. Rows updated within ``DELTA_SETTLE`` of the
+start of a run are therefore left for a later run; only transactions open
+longer than that can still be missed.
 """
 
 import os
+import io
 import csv
+import gzip
 import json
-from datetime import datetime
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from enum import Enum
 from flask import current_app
 from app.models import db, Farmer, SoilSample, LoanApplication, InsurancePolicy
 import logging
 
 logger = logging.getLogger(__name__)
 
+WRITE_BUFFER_SIZE = 1 << 20
+DELTA_STATE_FILE = 'delta_state.json'
+
+# Delta exports stop this far behind the clock, for transactions still in flight
+DELTA_SETTLE = timedelta(minutes=5)
+
+# Exported tables: CSV field name -> column
+EXPORT_TABLES = OrderedDict([
+    ('farmers', (Farmer, [
+        ('id', Farmer.id),
+        ('name', Farmer.full_name),
+        ('email', Farmer.email),
+        ('phone_number', Farmer.phone_number),
+        ('national_id', Farmer.national_id),
+        ('farm_size_hectares', Farmer.total_land_area),
+        # "district, province", or whichever of the two is recorded
+        ('location', db.func.coalesce(
+            Farmer.district + ', ' + Farmer.province, Farmer.district, Farmer.province
+        )),
+        ('province', Farmer.province),
+        ('district', Farmer.district),
+        ('crop_type', Farmer.primary_crop),
+        ('farming_experience_years', Farmer.farming_experience_years),
+        ('created_at', Farmer.created_at),
+    ])),
+    ('soil_samples', (SoilSample, [
+        ('id', SoilSample.id),
+        ('farmer_id', SoilSample.farmer_id),
+        ('collection_date', SoilSample.collection_date),
+        ('ph_level', SoilSample.ph_level),
+        ('nitrogen_level', SoilSample.nitrogen_level),
+        ('phosphorus_level', SoilSample.phosphorus_level),
+        ('potassium_level', SoilSample.potassium_level),
+        ('organic_matter', SoilSample.organic_matter),
+        ('moisture_content', SoilSample.moisture_content),
+        ('financial_index_score', SoilSample.financial_index_score),
+        ('risk_level', SoilSample.risk_level),
+        ('yield_prediction', SoilSample.yield_prediction),
+        ('created_at', SoilSample.created_at),
+    ])),
+    ('loan_applications', (LoanApplication, [
+        ('id', LoanApplication.id),
+        ('farmer_id', LoanApplication.farmer_id),
+        ('application_number', LoanApplication.application_number),
+        ('amount_requested', LoanApplication.requested_amount),
+        ('purpose', LoanApplication.purpose),
+        ('status', LoanApplication.status),
+        ('application_date', LoanApplication.submission_date),
+        ('decision_date', LoanApplication.decision_date),
+        ('approved_amount', LoanApplication.approved_amount),
+        ('interest_rate', LoanApplication.approved_interest_rate),
+        ('created_at', LoanApplication.created_at),
+    ])),
+    ('insurance_policies', (InsurancePolicy, [
+        ('id', InsurancePolicy.id),
+        ('farmer_id', InsurancePolicy.farmer_id),
+        ('policy_number', InsurancePolicy.policy_number),
+        ('policy_type', InsurancePolicy.insurance_type),
+        ('coverage_amount', InsurancePolicy.coverage_amount),
+        ('premium_amount', InsurancePolicy.premium_amount),
+        ('start_date', InsurancePolicy.start_date),
+        ('end_date', InsurancePolicy.end_date),
+        ('status', InsurancePolicy.status),
+        ('created_at', InsurancePolicy.created_at),
+    ])),
+])
+
+
+def _csv_value(value):
+    """CSV cell for a column value (enums by value, dates in ISO format)."""
+    if isinstance(value, Enum):
+        return value.value
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def _write_json_atomic(path, data):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def open_export_file(path: str, compress: bool = False):
+    """Text stream for CSV output with a large write buffer, gzip-compressed if requested."""
+    if compress:
+        raw = gzip.GzipFile(path, 'wb', compresslevel=6)
+        return io.TextIOWrapper(io.BufferedWriter(raw, buffer_size=WRITE_BUFFER_SIZE),
+                                encoding='utf-8', newline='')
+    return open(path, 'w', newline='', encoding='utf-8', buffering=WRITE_BUFFER_SIZE)
+
 
 class DataExporter:
     """Export platform data to various formats."""
     
-    def __init__(self):
-        self.export_dir = os.path.join(current_app.root_path, '..', 'exports')
+    def __init__(self, export_dir=None, chunk_size=5000, compress=False):
+        self.export_dir = export_dir or os.path.join(current_app.root_path, '..', 'exports')
+        self.chunk_size = chunk_size
+        self.compress = compress
         os.makedirs(self.export_dir, exist_ok=True)
     
     def export_all_data(self):
         """Export all data to CSV files."""
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         
-        exports = {
-            'farmers': self.export_farmers(timestamp),
-            'soil_samples': self.export_soil_samples(timestamp),
-            'loan_applications': self.export_loan_applications(timestamp),
-            'insurance_policies': self.export_insurance_policies(timestamp)
-        }
+        exports = {table: self.export_table(table, timestamp) for table in EXPORT_TABLES}
         
         # Create summary file
         summary_path = os.path.join(self.export_dir, f'export_summary_{timestamp}.json')
@@ -44,159 +156,167 @@ class DataExporter:
         logger.info(f"Data export completed. Summary: {summary_path}")
         return exports
     
-    def export_farmers(self, timestamp=None):
-        """Export farmers data to CSV."""
+    def _export_path(self, table, timestamp):
+        filename = f'{table}_{timestamp}.csv' + ('.gz' if self.compress else '')
+        return os.path.join(self.export_dir, filename)
+    
+    def stream_rows(self, query):
+        """Yield chunks of CSV-ready tuples from a select, read through a server-side cursor."""
+        result = db.session.execute(
+            query.execution_options(yield_per=self.chunk_size, stream_results=True)
+        )
+        try:
+            for chunk in result.partitions():
+                yield [tuple(_csv_value(value) for value in row) for row in chunk]
+        finally:
+            result.close()
+    
+    def write_csv(self, filepath, fieldnames, query):
+        """Stream the rows of ``query`` into a CSV file; returns the row count."""
+        count = 0
+        try:
+            with open_export_file(filepath, self.compress) as f:
+                writer = csv.writer(f)
+                writer.writerow(fieldnames)
+                for rows in self.stream_rows(query):
+                    writer.writerows(rows)
+                    count += len(rows)
+        except Exception:
+            # Don't leave a truncated export behind
+            if os.path.exists(filepath):
+                os.remove(filepath)
+            raise
+        return count
+    
+    def export_table(self, table, timestamp=None):
+        """
+        Export one table of EXPORT_TABLES to CSV.
+        
+        Returns:
+            int: Number of rows exported
+        """
         if timestamp is None:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         
-        filename = f'farmers_{timestamp}.csv'
-        filepath = os.path.join(self.export_dir, filename)
-        
-        farmers = Farmer.query.all()
+        model, fields = EXPORT_TABLES[table]
+        filepath = self._export_path(table, timestamp)
+        query = db.select(*[column for _, column in fields]).order_by(model.id)
         
-        with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
-            fieldnames = [
-                'id', 'name', 'email', 'phone_number', 'national_id',
-                'farm_size_hectares', 'location', 'crop_type',
-                'farming_experience_years', 'created_at'
-            ]
-            
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-            
-            for farmer in farmers:
-                writer.writerow({
-                    'id': farmer.id,
-                    'name': farmer.name,
-                    'email': farmer.email,
-                    'phone_number': farmer.phone_number,
-                    'national_id': farmer.national_id,
-                    'farm_size_hectares': farmer.farm_size_hectares,
-                    'location': farmer.location,
-                    'crop_type': farmer.crop_type.value if farmer.crop_type else '',
-                    'farming_experience_years': farmer.farming_experience_years,
-                    'created_at': farmer.created_at.isoformat() if farmer.created_at else ''
-                })
+        count = self.write_csv(filepath, [name for name, _ in fields], query)
         
-        logger.info(f"Exported {len(farmers)} farmers to {filepath}")
-        return len(farmers)
+        logger.info(f"Exported {count} {table.replace('_', ' ')} to {filepath}")
+        return count
+    
+    def export_farmers(self, timestamp=None):
+        """Export farmers data to CSV."""
+        return self.export_table('farmers', timestamp)
     
     def export_soil_samples(self, timestamp=None):
         """Export soil samples data to CSV."""
-        if timestamp is None:
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        
-        filename = f'soil_samples_{timestamp}.csv'
-        filepath = os.path.join(self.export_dir, filename)
-        
-        samples = SoilSample.query.all()
-        
-        with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
-            fieldnames = [
-                'id', 'farmer_id', 'collection_date', 'ph_level',
-                'nitrogen_level', 'phosphorus_level', 'potassium_level',
-                'organic_matter', 'moisture_content', 'financial_index_score',
-                'risk_level', 'created_at'
-            ]
-            
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-            
-            for sample in samples:
-                writer.writerow({
-                    'id': sample.id,
-                    'farmer_id': sample.farmer_id,
-                    'collection_date': sample.collection_date.isoformat() if sample.collection_date else '',
-                    'ph_level': sample.ph_level,
-                    'nitrogen_level': sample.nitrogen_level,
-                    'phosphorus_level': sample.phosphorus_level,
-                    'potassium_level': sample.potassium_level,
-                    'organic_matter': sample.organic_matter,
-                    'moisture_content': sample.moisture_content,
-                    'financial_index_score': sample.financial_index_score,
-                    'risk_level': sample.risk_level.value if sample.risk_level else '',
-                    'created_at': sample.created_at.isoformat() if sample.created_at else ''
-                })
-        
-        logger.info(f"Exported {len(samples)} soil samples to {filepath}")
-        return len(samples)
+        return self.export_table('soil_samples', timestamp)
     
     def export_loan_applications(self, timestamp=None):
         """Export loan applications data to CSV."""
-        if timestamp is None:
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        
-        filename = f'loan_applications_{timestamp}.csv'
-        filepath = os.path.join(self.export_dir, filename)
-        
-        try:
-            applications = LoanApplication.query.all()
-            
-            with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
-                fieldnames = [
-                    'id', 'farmer_id', 'amount_requested', 'purpose',
-                    'status', 'application_date', 'decision_date',
-                    'approved_amount', 'interest_rate'
-                ]
-                
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                writer.writeheader()
-                
-                for app in applications:
-                    writer.writerow({
-                        'id': app.id,
-                        'farmer_id': app.farmer_id,
-                        'amount_requested': app.amount_requested,
-                        'purpose': app.purpose,
-                        'status': app.status.value if app.status else '',
-                        'application_date': app.application_date.isoformat() if app.application_date else '',
-                        'decision_date': app.decision_date.isoformat() if app.decision_date else '',
-                        'approved_amount': app.approved_amount,
-                        'interest_rate': app.interest_rate
-                    })
-            
-            logger.info(f"Exported {len(applications)} loan applications to {filepath}")
-            return len(applications)
-        except Exception as e:
-            logger.warning(f"Could not export loan applications: {e}")
-            return 0
+        return self.export_table('loan_applications', timestamp)
     
     def export_insurance_policies(self, timestamp=None):
         """Export insurance policies data to CSV."""
-        if timestamp is None:
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        return self.export_table('insurance_policies', timestamp)
+    
+    def _delta_state(self):
+        path = os.path.join(self.export_dir, DELTA_STATE_FILE)
+        if not os.path.exists(path):
+            return {'sequence': 0, 'tables': {}}
+        with open(path) as f:
+            return json.load(f)
+    
+    def export_delta(self, settle=DELTA_SETTLE):
+        """
+        Export rows changed since the previous delta run, with a manifest.
         
-        filename = f'insurance_policies_{timestamp}.csv'
-        filepath = os.path.join(self.export_dir, filename)
+        Changes are detected by ``updated_at`` (ties broken by id), so
+        consumers apply each file as an upsert keyed by id, in sequence
+        order. Hard deletes are not captured.
         
-        try:
-            policies = InsurancePolicy.query.all()
+        Args:
+            settle (timedelta): Rows updated more recently than this are
+                left for the next run
+        
+        Returns:
+            dict: The manifest of this run
+        """
+        cutoff = datetime.utcnow() - settle
+        state = self._delta_state()
+        sequence = state['sequence'] + 1
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        directory = os.path.join(self.export_dir, f'delta_{sequence:06d}_{timestamp}')
+        os.makedirs(directory, exist_ok=True)
+        
+        tables = {}
+        watermarks = {}
+        for table, (model, fields) in EXPORT_TABLES.items():
+            since = state['tables'].get(table)
             
-            with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
-                fieldnames = [
-                    'id', 'farmer_id', 'policy_type', 'coverage_amount',
-                    'premium_amount', 'start_date', 'end_date',
-                    'status', 'created_at'
-                ]
-                
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                writer.writeheader()
+            # Upper bound fixed at the start so rows changed during the run go to the next one
+            newest = db.session.query(model.updated_at, model.id).filter(
+                model.updated_at.isnot(None), model.updated_at <= cutoff
+            ).order_by(model.updated_at.desc(), model.id.desc()).first()
+            until = {'updated_at': newest[0].isoformat(), 'id': newest[1]} if newest else None
+            
+            rows = 0
+            filename = None
+            if until is not None and (since is None or
+                                      (until['updated_at'], until['id']) > (since['updated_at'], since['id'])):
+                query = db.select(*[column for _, column in fields], model.updated_at).where(
+                    db.or_(
+                        model.updated_at < newest[0],
+                        db.and_(model.updated_at == newest[0], model.id <= newest[1])
+                    )
+                ).order_by(model.updated_at, model.id)
+                if since is not None:
+                    since_at = datetime.fromisoformat(since['updated_at'])
+                    query = query.where(db.or_(
+                        model.updated_at > since_at,
+                        db.and_(model.updated_at == since_at, model.id > since['id'])
+                    ))
                 
-                for policy in policies:
-                    writer.writerow({
-                        'id': policy.id,
-                        'farmer_id': policy.farmer_id,
-                        'policy_type': policy.policy_type,
-                        'coverage_amount': policy.coverage_amount,
-                        'premium_amount': policy.premium_amount,
-                        'start_date': policy.start_date.isoformat() if policy.start_date else '',
-                        'end_date': policy.end_date.isoformat() if policy.end_date else '',
-                        'status': policy.status.value if policy.status else '',
-                        'created_at': policy.created_at.isoformat() if policy.created_at else ''
-                    })
+                filename = f'{table}.csv' + ('.gz' if self.compress else '')
+                filepath = os.path.join(directory, filename)
+                rows = self.write_csv(filepath, [name for name, _ in fields] + ['updated_at'], query)
+                if not rows:
+                    os.remove(filepath)
+                    filename = None
             
-            logger.info(f"Exported {len(policies)} insurance policies to {filepath}")
-            return len(policies)
-        except Exception as e:
-            logger.warning(f"Could not export insurance policies: {e}")
-            return 0
+            watermarks[table] = until if rows else since
+            tables[table] = {
+                'file': filename,
+                'rows': rows,
+                'key': 'id',
+                'operation': 'upsert',
+                'columns': [name for name, _ in fields] + ['updated_at'],
+                'watermark_from': since,
+                'watermark_to': watermarks[table]
+            }
+        
+        manifest = {
+            'mode': 'delta',
+            'sequence': sequence,
+            'previous_sequence': state['sequence'] or None,
+            'baseline': not state['tables'],
+            'export_timestamp': timestamp,
+            'settled_until': cutoff.isoformat(),
+            'compression': 'gzip' if self.compress else None,
+            'tables': tables,
+            'total_records': sum(entry['rows'] for entry in tables.values())
+        }
+        _write_json_atomic(os.path.join(directory, 'manifest.json'), manifest)
+        
+        # Advance the watermarks only once every file and the manifest are written
+        _write_json_atomic(os.path.join(self.export_dir, DELTA_STATE_FILE), {
+            'sequence': sequence,
+            'last_export': directory,
+            'tables': {table: mark for table, mark in watermarks.items() if mark is not None}
+        })
+        
+        logger.info(f"Delta export {sequence} completed: {manifest['total_records']} changed rows in {directory}")
+        return manifest
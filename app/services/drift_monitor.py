@@ -0,0 +1,202 @@
+"""
+Input and prediction drift monitoring for Talazo AgriFinance Platform models.
+
+Each yield model input and the predicted yield are counted into
+fixed-bin histograms (``MONITORED_BINS``, plus an underflow and an
+overflow bin). Counting a batch is one ``searchsorted`` + ``bincount`` per
+column, and memory is a few hundred integers however much traffic is
+served.
+
+The trainer stores the same histograms of its training snapshot (and of
+held-out predictions) as ``reference_histograms`` in the model version's
+registry metadata. Every ``check_interval`` seconds, once ``min_count``
+rows have been served, the serving window is compared with that
+reference:
+
+- PSI (population stability index) over the bins; above
+  ``psi_threshold`` (0.2 by convention) the column has drifted.
+- KS: the largest gap between the two binned CDFs, with its asymptotic
+  p-value; below ``ks_alpha`` the column has drifted.
+
+The report is logged, kept for the API and recorded on the model version
+(``last_drift_check``); the window then starts over. A drifted report is
+the signal to retrain.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+import numpy as np
+from scipy.special import kolmogorov
+
+from app.services.ml_trainer import YIELD_FEATURES, YIELD_MODEL_NAME
+
+logger = logging.getLogger(__name__)
+
+PREDICTION = 'predicted_yield'
+
+# Bin edges per monitored column; values outside fall in under/overflow bins
+MONITORED_BINS = {
+    'ph_level': np.arange(3.0, 10.01, 0.25),
+    'nitrogen_level': np.arange(0.0, 150.01, 5.0),
+    'phosphorus_level': np.arange(0.0, 100.01, 5.0),
+    'potassium_level': np.arange(0.0, 500.01, 20.0),
+    'organic_matter': np.arange(0.0, 10.01, 0.5),
+    'moisture_content': np.arange(0.0, 60.01, 2.5),
+    PREDICTION: np.arange(0.0, 12.01, 0.5),  # tons/ha
+}
+
+# Smoothing for empty bins in PSI
+PSI_EPSILON = 1e-4
+
+
+def histogram_counts(values, edges: np.ndarray) -> np.ndarray:
+    """Counts of ``values`` in the bins of ``edges`` (len(edges) + 1 bins); NaN is ignored."""
+    values = np.asarray(values, dtype=np.float64).ravel()
+    values = values[~np.isnan(values)]
+    return np.bincount(np.searchsorted(edges, values, side='right'), minlength=len(edges) + 1)
+
+
+def reference_histograms(X, predictions, chunk_size: int = 100000) -> Dict[str, list]:
+    """
+    Reference histograms of training inputs ``X`` (columns in YIELD_FEATURES
+    order) and of ``predictions``, counted in chunks so memory-mapped
+    snapshots are not loaded whole.
+    """
+    counts = {name: np.zeros(len(edges) + 1, dtype=np.int64) for name, edges in MONITORED_BINS.items()}
+    for start in range(0, len(X), chunk_size):
+        block = np.asarray(X[start:start + chunk_size])
+        for j, feature in enumerate(YIELD_FEATURES):
+            counts[feature] += histogram_counts(block[:, j], MONITORED_BINS[feature])
+    counts[PREDICTION] += histogram_counts(predictions, MONITORED_BINS[PREDICTION])
+    return {name: values.tolist() for name, values in counts.items()}
+
+
+def merge_histograms(*histograms: Optional[Dict[str, list]]) -> Dict[str, list]:
+    """Add histograms bin by bin (fixed bins make them additive)."""
+    merged = {}
+    for histogram in histograms:
+        for name, counts in (histogram or {}).items():
+            merged[name] = (np.asarray(merged[name]) + counts).tolist() if name in merged else list(counts)
+    return merged
+
+
+def population_stability_index(reference, current) -> float:
+    expected = np.asarray(reference, dtype=np.float64)
+    actual = np.asarray(current, dtype=np.float64)
+    expected = np.clip(expected / expected.sum(), PSI_EPSILON, None)
+    actual = np.clip(actual / actual.sum(), PSI_EPSILON, None)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def ks_test(reference, current):
+    """Two-sample KS statistic over binned CDFs and its asymptotic p-value."""
+    reference = np.asarray(reference, dtype=np.float64)
+    current = np.asarray(current, dtype=np.float64)
+    n, m = reference.sum(), current.sum()
+    statistic = float(np.max(np.abs(np.cumsum(reference) / n - np.cumsum(current) / m)))
+    effective = np.sqrt(n * m / (n + m))
+    return statistic, float(kolmogorov(effective * statistic))
+
+
+class DriftMonitor:
+    """Constant-memory drift monitor for the yield model's inputs and predictions."""
+
+    def __init__(self, check_interval: float = 3600.0, min_count: int = 200,
+                 psi_threshold: float = 0.2, ks_alpha: float = 0.01):
+        self.check_interval = check_interval
+        self.min_count = min_count
+        self.psi_threshold = psi_threshold
+        self.ks_alpha = ks_alpha
+        self._lock = threading.Lock()
+        self._reset_window()
+        self.last_report: Optional[Dict] = None
+        self._last_check = time.monotonic()
+
+    def _reset_window(self):
+        self.window = {name: np.zeros(len(edges) + 1, dtype=np.int64) for name, edges in MONITORED_BINS.items()}
+        self.window_rows = 0
+        self.window_started = datetime.utcnow()
+
+    def observe(self, X: np.ndarray, predictions: np.ndarray):
+        """Count one served batch (feature matrix and predicted tons/ha)."""
+        counts = {feature: histogram_counts(X[:, j], MONITORED_BINS[feature])
+                  for j, feature in enumerate(YIELD_FEATURES)}
+        counts[PREDICTION] = histogram_counts(predictions, MONITORED_BINS[PREDICTION])
+        with self._lock:
+            for name, values in counts.items():
+                self.window[name] += values
+            self.window_rows += len(X)
+
+    def due(self) -> bool:
+        return self.window_rows >= self.min_count and \
+            time.monotonic() - self._last_check >= self.check_interval
+
+    def check(self, registry) -> Optional[Dict]:
+        """
+        Compare the serving window with the active model's reference histograms.
+
+        Returns:
+            dict: Per-column PSI/KS results and whether drift was detected,
+            or None if there is nothing to compare
+        """
+        with self._lock:
+            window, rows, started = self.window, self.window_rows, self.window_started
+            self._reset_window()
+            self._last_check = time.monotonic()
+        if not rows:
+            return None
+
+        version = registry.active_version(YIELD_MODEL_NAME)
+        reference = registry.metadata(YIELD_MODEL_NAME, version).get('reference_histograms') if version else None
+        if not reference:
+            logger.warning(f"No reference histograms for {YIELD_MODEL_NAME} {version}; drift not checked")
+            return None
+
+        columns = {}
+        for name, counts in window.items():
+            if name not in reference or not counts.sum():
+                continue
+            psi = population_stability_index(reference[name], counts)
+            statistic, p_value = ks_test(reference[name], counts)
+            columns[name] = {
+                'psi': round(psi, 4),
+                'ks_statistic': round(statistic, 4),
+                'ks_p_value': p_value,
+                'rows': int(counts.sum()),
+                'drifted': psi > self.psi_threshold or p_value < self.ks_alpha
+            }
+
+        drifted = [name for name, result in columns.items() if result['drifted']]
+        report = {
+            'model': YIELD_MODEL_NAME,
+            'version': version,
+            'window_start': started.isoformat(),
+            'window_end': datetime.utcnow().isoformat(),
+            'rows': rows,
+            'drift_detected': bool(drifted),
+            'drifted_columns': drifted,
+            'columns': columns
+        }
+        self.last_report = report
+        registry.update_metadata(YIELD_MODEL_NAME, version, last_drift_check={
+            key: report[key] for key in ('window_end', 'rows', 'drift_detected', 'drifted_columns')
+        })
+
+        if drifted:
+            logger.warning(f"Drift in {YIELD_MODEL_NAME} {version} inputs: {', '.join(drifted)}; retraining advised")
+        else:
+            logger.info(f"No drift in {YIELD_MODEL_NAME} {version} over {rows} rows")
+        return report
+
+    def status(self) -> Dict:
+        """Current window size and the last drift report."""
+        return {
+            'window_start': self.window_started.isoformat(),
+            'window_rows': self.window_rows,
+            'check_interval_seconds': self.check_interval,
+            'last_report': self.last_report
+        }
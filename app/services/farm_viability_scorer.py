@@ -9,7 +9,7 @@ including soil health, climate data, historical performance, and market conditio
 import numpy as np
 import logging
 from typing import Dict, List, Tuple, Optional
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 
 from app.models import SoilSample, Farmer, CreditHistory
 from app.core.extensions import db
@@ -169,6 +169,32 @@ class FarmViabilityScorer:
             self.logger.error(f"Viability score calculation failed: {e}")
             return 50.0  # Default middle score
     
+    def _stored_features(self, farmer_id: int) -> Optional[Dict]:
+        """Latest feature store values for a farmer, or None if unavailable."""
+        from app.services.feature_store import feature_store
+        try:
+            return feature_store.online(farmer_id)
+        except Exception as e:
+            self.logger.warning(f"Feature store lookup failed for farmer {farmer_id}: {e}")
+            return None
+
+    def _stored_credit_is_current(self, farmer_id: int, features: Dict) -> bool:
+        """
+        Whether materialized credit features still reflect the farmer's credit history.
+
+        They must be materialized as of today (the recent-year weighting
+        depends on the date), after the latest credit entry change, and over
+        the same number of entries (catching deletions).
+        """
+        if features.get('as_of_date') != date.today().isoformat() or not features.get('computed_at'):
+            return False
+        count, last_change = db.session.query(
+            db.func.count(CreditHistory.id), db.func.max(CreditHistory.updated_at)
+        ).filter(CreditHistory.farmer_id == farmer_id).one()
+        if count != features.get('credit_records'):
+            return False
+        return last_change is None or last_change <= datetime.fromisoformat(features['computed_at'])
+
     def calculate_comprehensive_score(self, farmer_id: int, 
                                     additional_data: Optional[Dict] = None) -> Dict:
         """
@@ -353,6 +379,13 @@ class FarmViabilityScorer:
     
     def _calculate_historical_performance_score(self, farmer: Farmer) -> float:
         """Calculate historical performance score based on credit history."""
+        # Materialized by the feature store with the same formula; usable
+        # only if no credit entry changed since it was computed
+        features = self._stored_features(farmer.id)
+        if features and features.get('credit_performance_score') is not None \
+                and self._stored_credit_is_current(farmer.id, features):
+            return features['credit_performance_score']
+
         credit_histories = CreditHistory.query.filter_by(farmer_id=farmer.id).all()
         
         if not credit_histories:
@@ -0,0 +1,258 @@
+"""
+Farmer search service for Talazo AgriFinance Platform.
+
+Farmers are indexed as trigram postings in the ``farmer_search_terms`` table,
+one row per distinct (field, gram). A search breaks the query into the same
+grams and ranks farmers by the share of query grams they contain, which keeps
+lookups on an index range scan and tolerates typos ("Tendia" still shares
+most of its grams with "Tendai").
+
+Postings live in the database rather than in process memory so that every
+worker sees the same index; mapper events keep them in step with writes.
+"""
+
+import logging
+import math
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect
+
+from app.core.extensions import db
+from app.models import Farmer, FarmerSearchTerm
+
+logger = logging.getLogger(__name__)
+
+INDEXED_FIELDS = ('full_name', 'national_id', 'phone_number')
+
+_WORD_SPLIT = re.compile(r'[^0-9a-z]+')
+_NON_ALNUM = re.compile(r'[^0-9a-z]')
+_NON_DIGIT = re.compile(r'[^0-9]')
+
+
+def _name_grams(value: str) -> Set[str]:
+    """Word trigrams padded like pg_trgm, so word starts weigh more."""
+    grams = set()
+    for word in _WORD_SPLIT.split(value.lower()):
+        if not word:
+            continue
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _compact_grams(value: str) -> Set[str]:
+    """Unpadded trigrams, so identifier fragments match anywhere."""
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+
+def _normalize_national_id(value: str) -> str:
+    return _NON_ALNUM.sub('', value.lower())
+
+
+def _normalize_phone(value: str) -> str:
+    """Reduce +263 77..., 077... and 77... to the same subscriber digits."""
+    digits = _NON_DIGIT.sub('', value)
+    if digits.startswith('263'):
+        digits = digits[3:]
+    return digits.lstrip('0')
+
+
+def extract_grams(field: str, value: Optional[str]) -> Set[str]:
+    """
+    Extract the search grams stored for one farmer field.
+
+    Args:
+        field (str): One of ``INDEXED_FIELDS``
+        value (str): Field value
+
+    Returns:
+        set: Trigrams for the value
+    """
+    if not value:
+        return set()
+    if field == 'full_name':
+        return _name_grams(value)
+    if field == 'national_id':
+        return _compact_grams(_normalize_national_id(value))
+    if field == 'phone_number':
+        return _compact_grams(_normalize_phone(value))
+    raise ValueError(f"Field {field} is not indexed for search")
+
+
+def query_grams(text: str) -> Set[str]:
+    """
+    Extract grams from free-text search input.
+
+    Input containing digits is treated as an ID or phone fragment, anything
+    else as a name.
+
+    Args:
+        text (str): Search input
+
+    Returns:
+        set: Trigrams to look up
+    """
+    if any(ch.isdigit() for ch in text):
+        grams = _compact_grams(_normalize_national_id(text))
+        grams |= _compact_grams(_normalize_phone(text))
+        return grams
+    return _name_grams(text)
+
+
+def build_postings(farmer_id: int, values: Dict[str, Optional[str]]) -> List[Dict]:
+    """Build posting rows for a farmer from its indexed field values."""
+    return [
+        {'farmer_id': farmer_id, 'field': field, 'gram': gram}
+        for field in INDEXED_FIELDS
+        for gram in sorted(extract_grams(field, values.get(field)))
+    ]
+
+
+class FarmerSearchIndex:
+    """Ranked, typo-tolerant search over farmer names, national IDs and phones."""
+
+    def __init__(self, min_similarity: float = 0.4):
+        self.min_similarity = min_similarity
+        self.table = FarmerSearchTerm.__table__
+
+    def index_farmer(self, connection, farmer: Farmer):
+        """Replace a farmer's postings using the flush connection."""
+        self.remove_farmer(connection, farmer.id)
+        postings = build_postings(farmer.id, {
+            field: getattr(farmer, field) for field in INDEXED_FIELDS
+        })
+        if postings:
+            connection.execute(self.table.insert(), postings)
+
+    def remove_farmer(self, connection, farmer_id: int):
+        """Delete all postings for a farmer."""
+        connection.execute(
+            self.table.delete().where(self.table.c.farmer_id == farmer_id)
+        )
+
+    def ranked_matches(self, text: str):
+        """
+        Subquery of farmers matching ``text`` with their matched gram count.
+
+        Callers join it to their own (filtered) farmer query, so filters
+        and paging apply to the full match set.
+
+        Args:
+            text (str): Name, national ID or phone fragment
+
+        Returns:
+            tuple: (subquery with ``farmer_id`` and ``matched`` columns, number of
+            query grams), or (None, 0) when the input has no grams
+        """
+        grams = query_grams(text or '')
+        if not grams:
+            return None, 0
+
+        min_matches = max(1, math.ceil(len(grams) * self.min_similarity))
+        matched = db.func.count(db.distinct(FarmerSearchTerm.gram))
+
+        ranked = db.session.query(
+            FarmerSearchTerm.farmer_id.label('farmer_id'),
+            matched.label('matched')
+        ).filter(
+            FarmerSearchTerm.gram.in_(grams)
+        ).group_by(
+            FarmerSearchTerm.farmer_id
+        ).having(
+            matched >= min_matches
+        ).subquery()
+        return ranked, len(grams)
+
+    def search(self, text: str, limit: int = 50) -> List[Tuple[int, float]]:
+        """
+        Find farmers matching ``text``, best matches first.
+
+        Args:
+            text (str): Name, national ID or phone fragment
+            limit (int): Maximum number of matches
+
+        Returns:
+            list: (farmer_id, similarity) pairs, similarity in 0-1
+        """
+        ranked, gram_count = self.ranked_matches(text)
+        if ranked is None:
+            return []
+
+        rows = db.session.query(ranked.c.farmer_id, ranked.c.matched).order_by(
+            ranked.c.matched.desc(),
+            ranked.c.farmer_id
+        ).limit(limit).all()
+
+        return [(farmer_id, round(count / gram_count, 4)) for farmer_id, count in rows]
+
+    def rebuild(self, batch_size: int = 1000) -> int:
+        """
+        Rebuild the whole index from the farmers table.
+
+        Args:
+            batch_size (int): Farmers read and indexed per batch
+
+        Returns:
+            int: Number of farmers indexed
+        """
+        db.session.execute(self.table.delete())
+
+        rows = db.session.query(
+            Farmer.id, Farmer.full_name, Farmer.national_id, Farmer.phone_number
+        ).yield_per(batch_size)
+
+        indexed = 0
+        postings = []
+        for farmer_id, full_name, national_id, phone_number in rows:
+            postings.extend(build_postings(farmer_id, {
+                'full_name': full_name,
+                'national_id': national_id,
+                'phone_number': phone_number
+            }))
+            indexed += 1
+            if indexed % batch_size == 0:
+                db.session.execute(self.table.insert(), postings)
+                postings = []
+
+        if postings:
+            db.session.execute(self.table.insert(), postings)
+
+        db.session.commit()
+        logger.info(f"Rebuilt farmer search index for {indexed} farmers")
+        return indexed
+
+
+search_index = FarmerSearchIndex()
+
+
+def _indexed_fields_changed(target: Farmer) -> bool:
+    state = inspect(target)
+    return any(state.attrs[field].history.has_changes() for field in INDEXED_FIELDS)
+
+
+def _after_farmer_insert(mapper, connection, target):
+    search_index.index_farmer(connection, target)
+
+
+def _after_farmer_update(mapper, connection, target):
+    if _indexed_fields_changed(target):
+        search_index.index_farmer(connection, target)
+
+
+def _after_farmer_delete(mapper, connection, target):
+    search_index.remove_farmer(connection, target.id)
+
+
+_LISTENERS = (
+    ('after_insert', _after_farmer_insert),
+    ('after_update', _after_farmer_update),
+    ('after_delete', _after_farmer_delete),
+)
+
+
+def register_search_listeners():
+    """Keep the search index in sync with Farmer writes."""
+    for identifier, listener in _LISTENERS:
+        if not event.contains(Farmer, identifier, listener):
+            event.listen(Farmer, identifier, listener)
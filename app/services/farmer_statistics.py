@@ -0,0 +1,353 @@
+"""
+Materialized farmer statistics for Talazo AgriFinance Platform.
+
+``/api/farmers/statistics`` used to aggregate the whole farmers table on
+every call. The aggregates now live in ``farmer_statistics`` as counters and
+running sums that Farmer mapper events adjust by each write's delta, so the
+endpoint reads a handful of rows. A write that removes the current minimum
+or maximum of a numeric dimension only flags it; the table scan that finds
+the new extreme runs on the next read, outside the write transaction.
+``rebuild`` recomputes everything from scratch for reconciliation (e.g. after
+bulk updates that bypass the ORM).
+"""
+
+import logging
+import weakref
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import case, event, inspect
+
+from app.core.extensions import db
+from app.models import Farmer, FarmerStatistic
+from app.utils.upsert import upsert
+
+logger = logging.getLogger(__name__)
+
+TRACKED_FIELDS = (
+    'is_active', 'verification_status', 'province', 'primary_crop',
+    'farming_experience_years', 'total_land_area'
+)
+
+# Numeric dimensions and the farmer column they summarize
+NUMERIC_DIMENSIONS = {
+    'experience': Farmer.farming_experience_years,
+    'land': Farmer.total_land_area
+}
+
+Contribution = Tuple[str, str, Optional[float]]
+
+
+def farmer_contributions(values: Dict) -> List[Contribution]:
+    """
+    List the statistic slices a farmer in the given state counts towards.
+
+    Args:
+        values (dict): Farmer field values keyed by ``TRACKED_FIELDS``
+
+    Returns:
+        list: (dimension, key, value) tuples; value is None for pure counts
+    """
+    # is_active defaults to True when not yet populated
+    if values.get('is_active') is False:
+        return []
+
+    contributions = [('total', '', None)]
+    if values.get('verification_status') == 'verified':
+        contributions.append(('verified', '', None))
+    if values.get('province') is not None:
+        contributions.append(('province', values['province'], None))
+    if values.get('primary_crop') is not None:
+        contributions.append(('crop', values['primary_crop'], None))
+    if values.get('farming_experience_years') is not None:
+        contributions.append(('experience', '', float(values['farming_experience_years'])))
+    if values.get('total_land_area') is not None:
+        contributions.append(('land', '', float(values['total_land_area'])))
+    return contributions
+
+
+class FarmerStatisticsService:
+    """Maintain and read the materialized farmer statistics."""
+
+    def __init__(self):
+        self.table = FarmerStatistic.__table__
+        # Engines whose statistics are known to be built
+        self._initialized = weakref.WeakSet()
+
+    def apply(self, connection, contributions: List[Contribution], sign: int):
+        """
+        Add (sign=1) or remove (sign=-1) contributions from the counters.
+
+        Counters are adjusted with relative UPDATEs so concurrent writers do
+        not overwrite each other; a slice seen for the first time (a new
+        province or crop) is created by the same upsert.
+        """
+        t = self.table
+        now = datetime.utcnow()
+
+        # Until the first rebuild there is no baseline to adjust
+        if not self._is_initialized(connection):
+            return
+
+        for dimension, key, value in contributions:
+            if sign > 0:
+                updates = {
+                    'count': t.c.count + 1,
+                    'value_sum': t.c.value_sum + (value or 0.0),
+                    'updated_at': now
+                }
+                if value is not None:
+                    updates['value_min'] = case(
+                        ((t.c.value_min.is_(None)) | (t.c.value_min > value), value),
+                        else_=t.c.value_min
+                    )
+                    updates['value_max'] = case(
+                        ((t.c.value_max.is_(None)) | (t.c.value_max < value), value),
+                        else_=t.c.value_max
+                    )
+                upsert(connection, t, {
+                    'dimension': dimension, 'key': key, 'count': 1,
+                    'value_sum': value or 0.0, 'value_min': value, 'value_max': value,
+                    'updated_at': now
+                }, index_elements=['dimension', 'key'], set_=updates)
+            else:
+                connection.execute(t.update().where(
+                    (t.c.dimension == dimension) & (t.c.key == key)
+                ).values(
+                    count=t.c.count - 1,
+                    value_sum=t.c.value_sum - (value or 0.0),
+                    updated_at=now
+                ))
+                if value is not None:
+                    self._flag_extremes_if_needed(connection, dimension, value)
+
+    def _is_initialized(self, connection) -> bool:
+        """Whether statistics were built; only the positive answer is cached."""
+        if connection.engine in self._initialized:
+            return True
+        t = self.table
+        initialized = connection.execute(
+            db.select(t.c.id).where((t.c.dimension == 'total') & (t.c.key == ''))
+        ).first() is not None
+        if initialized:
+            self._initialized.add(connection.engine)
+        return initialized
+
+    def _flag_extremes_if_needed(self, connection, dimension: str, removed: float):
+        """Flag min/max for recomputation when the removed value was one of them."""
+        t = self.table
+        where = (t.c.dimension == dimension) & (t.c.key == '')
+        row = connection.execute(
+            db.select(t.c.value_min, t.c.value_max).where(where)
+        ).first()
+        if row is None:
+            return
+        if row.value_min is not None and row.value_max is not None \
+                and row.value_min < removed < row.value_max:
+            return
+        connection.execute(t.update().where(where).values(extremes_stale=True))
+
+    def refresh_stale_extremes(self) -> int:
+        """
+        Recompute the min/max of numeric dimensions flagged by removals.
+
+        Returns:
+            int: Number of dimensions recomputed
+        """
+        t = self.table
+        stale = db.session.execute(
+            db.select(t.c.dimension).where(t.c.extremes_stale == True)
+        ).scalars().all()
+        for dimension in stale:
+            where = (t.c.dimension == dimension) & (t.c.key == '')
+            # Clear the flag first, so a removal committed during the scan flags it again
+            db.session.execute(t.update().where(where).values(extremes_stale=False))
+            column = NUMERIC_DIMENSIONS[dimension]
+            value_min, value_max = db.session.query(
+                db.func.min(column), db.func.max(column)
+            ).filter(Farmer.is_active == True, column.isnot(None)).first()
+            db.session.execute(t.update().where(where).values(
+                value_min=value_min, value_max=value_max
+            ))
+        if stale:
+            db.session.commit()
+        return len(stale)
+
+    def rebuild(self) -> int:
+        """
+        Recompute all statistics from the farmers table.
+
+        Returns:
+            int: Number of statistic rows written
+        """
+        active = Farmer.is_active == True
+        rows = []
+
+        total = db.session.query(db.func.count(Farmer.id)).filter(active).scalar()
+        verified = db.session.query(db.func.count(Farmer.id)).filter(
+            active, Farmer.verification_status == 'verified'
+        ).scalar()
+        rows.append({'dimension': 'total', 'key': '', 'count': total})
+        rows.append({'dimension': 'verified', 'key': '', 'count': verified})
+
+        for dimension, column in (('province', Farmer.province), ('crop', Farmer.primary_crop)):
+            grouped = db.session.query(column, db.func.count(Farmer.id)).filter(
+                active, column.isnot(None)
+            ).group_by(column).all()
+            rows.extend(
+                {'dimension': dimension, 'key': key, 'count': count}
+                for key, count in grouped
+            )
+
+        for dimension, column in NUMERIC_DIMENSIONS.items():
+            count, value_sum, value_min, value_max = db.session.query(
+                db.func.count(column), db.func.sum(column),
+                db.func.min(column), db.func.max(column)
+            ).filter(active, column.isnot(None)).first()
+            rows.append({
+                'dimension': dimension, 'key': '', 'count': count,
+                'value_sum': float(value_sum or 0.0),
+                'value_min': value_min, 'value_max': value_max
+            })
+
+        now = datetime.utcnow()
+        for row in rows:
+            row.setdefault('value_sum', 0.0)
+            row.setdefault('value_min', None)
+            row.setdefault('value_max', None)
+            row['updated_at'] = now
+
+        db.session.execute(self.table.delete())
+        db.session.execute(self.table.insert(), rows)
+        db.session.commit()
+
+        logger.info(f"Rebuilt farmer statistics ({len(rows)} rows, {total} active farmers)")
+        return len(rows)
+
+    def _load(self) -> Dict[str, Dict[str, FarmerStatistic]]:
+        stats: Dict[str, Dict[str, FarmerStatistic]] = {}
+        for row in FarmerStatistic.query.all():
+            stats.setdefault(row.dimension, {})[row.key] = row
+        return stats
+
+    def get_active_count(self) -> Optional[int]:
+        """Return the maintained active-farmer count, if statistics exist."""
+        row = FarmerStatistic.query.filter_by(dimension='total', key='').first()
+        return row.count if row else None
+
+    def get_statistics(self) -> Dict:
+        """
+        Read the statistics in the ``/api/farmers/statistics`` response shape.
+
+        The table is built on first use if it has never been populated.
+        """
+        if self.refresh_stale_extremes():
+            db.session.expire_all()
+        stats = self._load()
+        if 'total' not in stats:
+            self.rebuild()
+            stats = self._load()
+
+        def scalar(dimension):
+            row = stats.get(dimension, {}).get('')
+            return row.count if row else 0
+
+        def numeric(dimension):
+            row = stats.get(dimension, {}).get('')
+            if not row or row.count <= 0:
+                return 0, 0.0, 0, 0
+            return row.count, row.value_sum, row.value_min or 0, row.value_max or 0
+
+        total_farmers = scalar('total')
+        total_verified = scalar('verified')
+        exp_count, exp_sum, exp_min, exp_max = numeric('experience')
+        land_count, land_sum, land_min, land_max = numeric('land')
+
+        return {
+            'totals': {
+                'total_farmers': total_farmers,
+                'verified_farmers': total_verified,
+                'verification_rate': round((total_verified / total_farmers * 100) if total_farmers > 0 else 0, 2)
+            },
+            'geographic_distribution': {
+                key: row.count for key, row in stats.get('province', {}).items() if row.count > 0
+            },
+            'crop_distribution': {
+                key: row.count for key, row in stats.get('crop', {}).items() if row.count > 0
+            },
+            'experience_statistics': {
+                'average_years': round(exp_sum / exp_count, 2) if exp_count else 0,
+                'min_years': int(exp_min),
+                'max_years': int(exp_max)
+            },
+            'land_statistics': {
+                'average_hectares': round(land_sum / land_count, 2) if land_count else 0,
+                'total_hectares': round(land_sum, 2),
+                'min_hectares': land_min,
+                'max_hectares': land_max
+            }
+        }
+
+
+farmer_statistics = FarmerStatisticsService()
+
+
+def _current_values(target: Farmer) -> Dict:
+    return {field: getattr(target, field) for field in TRACKED_FIELDS}
+
+
+def _previous_values(target: Farmer) -> Dict:
+    state = inspect(target)
+    values = {}
+    for field in TRACKED_FIELDS:
+        history = state.attrs[field].history
+        if history.deleted:
+            values[field] = history.deleted[0]
+        else:
+            values[field] = getattr(target, field)
+    return values
+
+
+def _after_farmer_insert(mapper, connection, target):
+    farmer_statistics.apply(connection, farmer_contributions(_current_values(target)), 1)
+
+
+def _after_farmer_update(mapper, connection, target):
+    old = Counter(farmer_contributions(_previous_values(target)))
+    new = Counter(farmer_contributions(_current_values(target)))
+    removed = list((old - new).elements())
+    added = list((new - old).elements())
+    if removed:
+        farmer_statistics.apply(connection, removed, -1)
+    if added:
+        farmer_statistics.apply(connection, added, 1)
+
+
+def _after_farmer_delete(mapper, connection, target):
+    farmer_statistics.apply(connection, farmer_contributions(_previous_values(target)), -1)
+
+
+def _track_previous_value(target, value, oldvalue, initiator):
+    """No-op set listener; registering it with active_history loads old values."""
+    return value
+
+
+_LISTENERS = (
+    ('after_insert', _after_farmer_insert),
+    ('after_update', _after_farmer_update),
+    ('after_delete', _after_farmer_delete),
+)
+
+
+def register_statistics_listeners():
+    """Keep farmer statistics in sync with Farmer writes."""
+    for identifier, listener in _LISTENERS:
+        if not event.contains(Farmer, identifier, listener):
+            event.listen(Farmer, identifier, listener)
+
+    for field in TRACKED_FIELDS:
+        attribute = getattr(Farmer, field)
+        if not event.contains(attribute, 'set', _track_previous_value):
+            event.listen(attribute, 'set', _track_previous_value,
+                         retval=True, active_history=True)
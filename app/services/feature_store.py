@@ -0,0 +1,359 @@
+"""
+Farmer feature store for Talazo AgriFinance Platform.
+
+Scoring, risk assessment and model training used to derive the same farmer
+features (latest soil measurements, credit performance, location risk, ...)
+in separate code paths. Features are now defined once in a registry and
+materialized per farmer and date into ``farmer_features``:
+
+- ``feature_registry`` holds the feature definitions, grouped by source.
+  Each group computes its features for a batch of farmers as of a date with
+  one or two set-based queries.
+- ``FeatureStore.materialize`` runs all groups over the active farmers in
+  keyset batches (run daily, e.g. ``flask materialize-features``).
+- ``FeatureStore.online`` serves the latest materialized values from an
+  in-process array indexed by farmer id (O(1) per lookup). It is reloaded
+  after a local materialization; once older than ``max_age`` seconds it is
+  reloaded on a background thread while requests keep reading the old
+  array (see ``TTLCache``).
+
+The soil features use the same SQL expressions (including defaults for
+missing measurements) as the yield model's training extraction, so
+training and serving see identical inputs.
+"""
+
+import logging
+from collections import OrderedDict
+from datetime import date, datetime, time as dt_time, timedelta
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+from flask import current_app
+
+from app.core.extensions import db
+from app.models import Farmer, SoilSample, CreditHistory, FarmerFeature
+from app.models.credit_history import PaymentStatus
+from app.services.ml_trainer import FEATURE_DEFAULTS, YIELD_FEATURES
+from app.services.risk_assessment import PROVINCE_WEATHER_RISKS, CROP_MARKET_RISKS
+from app.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+RECENT_CREDIT_DAYS = 365
+
+FeatureValues = Dict[int, Dict[str, Optional[float]]]
+
+
+def soil_feature_columns() -> List:
+    """SQL expressions for the yield model's soil inputs, with defaults for missing values."""
+    columns = []
+    for feature in YIELD_FEATURES:
+        column = getattr(SoilSample, feature)
+        if feature in FEATURE_DEFAULTS:
+            column = db.func.coalesce(column, FEATURE_DEFAULTS[feature])
+        columns.append(column)
+    return columns
+
+
+class FeatureGroup:
+    """Features from one source, computed together for a batch of farmers."""
+
+    def __init__(self, source: str, features: Dict[str, str], compute: Callable):
+        self.source = source
+        self.features = features
+        self.compute = compute
+
+
+class FeatureRegistry:
+    """Registry of feature definitions (name, description, source)."""
+
+    def __init__(self):
+        self.groups: List[FeatureGroup] = []
+        self.definitions: 'OrderedDict[str, Dict]' = OrderedDict()
+
+    def group(self, source: str, features: Dict[str, str]):
+        """
+        Register a function computing ``features`` from ``source``.
+
+        The function takes (farmer_ids, as_of) and returns
+        {farmer_id: {feature: value}}; ``as_of`` is the end of the day.
+        """
+        def decorator(compute):
+            for name, description in features.items():
+                if name in self.definitions:
+                    raise ValueError(f"Feature already defined: {name}")
+                self.definitions[name] = {'name': name, 'source': source, 'description': description}
+            self.groups.append(FeatureGroup(source, features, compute))
+            return compute
+        return decorator
+
+    def names(self) -> List[str]:
+        return list(self.definitions)
+
+    def describe(self) -> List[Dict]:
+        return list(self.definitions.values())
+
+
+feature_registry = FeatureRegistry()
+
+
+@feature_registry.group('farmers', {
+    'farm_size_hectares': 'Total land area (ha)',
+    'farming_experience_years': 'Years of farming experience',
+    'crop_diversity': 'Number of crops grown (primary plus secondary)',
+    'crop_market_risk': 'Market risk of the primary crop (0-100)',
+    'province_weather_risk': 'Weather risk of the province (0-100)',
+    'weather_risk': 'Gridded climate risk for the farm location, else the province risk (0-100)',
+})
+def _farmer_features(farmer_ids: Sequence[int], as_of: datetime) -> FeatureValues:
+    from app.services.climate_data import get_climate_dataset
+
+    rows = db.session.query(
+        Farmer.id, Farmer.total_land_area, Farmer.farming_experience_years,
+        Farmer.primary_crop, Farmer.secondary_crops, Farmer.province,
+        Farmer.location_lat, Farmer.location_lng
+    ).filter(Farmer.id.in_(farmer_ids)).all()
+
+    climate = get_climate_dataset()
+    grid_risk = {}
+    located = [row for row in rows if row.location_lat is not None and row.location_lng is not None]
+    if climate is not None and located:
+        risks = climate.sample(
+            'weather_risk', [row.location_lat for row in located], [row.location_lng for row in located]
+        )
+        grid_risk = {row.id: float(risk) for row, risk in zip(located, risks) if not np.isnan(risk)}
+
+    values = {}
+    for row in rows:
+        secondary = [crop for crop in (row.secondary_crops or '').split(',') if crop.strip()]
+        province_risk = float(PROVINCE_WEATHER_RISKS.get((row.province or '').lower(), 40))
+        values[row.id] = {
+            'farm_size_hectares': row.total_land_area,
+            'farming_experience_years': row.farming_experience_years,
+            'crop_diversity': float(len(secondary) + (1 if row.primary_crop else 0)),
+            'crop_market_risk': float(CROP_MARKET_RISKS.get((row.primary_crop or '').lower(), 45)),
+            'province_weather_risk': province_risk,
+            'weather_risk': grid_risk.get(row.id, province_risk),
+        }
+    return values
+
+
+@feature_registry.group('soil_samples', dict(
+    [(feature, f'Latest soil sample {feature.replace("_", " ")}') for feature in YIELD_FEATURES] + [
+        ('soil_health_score', 'Latest soil sample financial index score (0-100)'),
+        ('soil_sample_count', 'Soil samples collected'),
+        ('has_soil_sample', '1 if any soil sample was collected'),
+    ]
+))
+def _soil_features(farmer_ids: Sequence[int], as_of: datetime) -> FeatureValues:
+    ranked = db.select(
+        SoilSample.farmer_id.label('farmer_id'),
+        *[column.label(feature) for feature, column in zip(YIELD_FEATURES, soil_feature_columns())],
+        SoilSample.financial_index_score.label('soil_health_score'),
+        db.func.row_number().over(
+            partition_by=SoilSample.farmer_id,
+            order_by=(SoilSample.collection_date.desc(), SoilSample.id.desc())
+        ).label('rank'),
+        db.func.count().over(partition_by=SoilSample.farmer_id).label('sample_count')
+    ).where(
+        SoilSample.farmer_id.in_(farmer_ids),
+        SoilSample.collection_date <= as_of
+    ).subquery()
+
+    values = {
+        farmer_id: {'soil_sample_count': 0.0, 'has_soil_sample': 0.0} for farmer_id in farmer_ids
+    }
+    for row in db.session.execute(db.select(ranked).where(ranked.c.rank == 1)).mappings():
+        features = {feature: row[feature] for feature in YIELD_FEATURES}
+        features.update({
+            'soil_health_score': row['soil_health_score'],
+            'soil_sample_count': float(row['sample_count']),
+            'has_soil_sample': 1.0
+        })
+        values[row['farmer_id']] = features
+    return values
+
+
+@feature_registry.group('credit_history', {
+    'credit_records': 'Credit history entries',
+    'credit_defaults': 'Defaulted credit history entries',
+    'credit_outstanding': 'Remaining balance on active, unsettled credit',
+    'credit_performance_score': 'Credit risk score, recent year weighted 70% (0-100, 60 without history)',
+})
+def _credit_features(farmer_ids: Sequence[int], as_of: datetime) -> FeatureValues:
+    records: Dict[int, List[CreditHistory]] = {farmer_id: [] for farmer_id in farmer_ids}
+    for entry in CreditHistory.query.filter(
+        CreditHistory.farmer_id.in_(farmer_ids),
+        CreditHistory.loan_date <= as_of.date()
+    ):
+        records[entry.farmer_id].append(entry)
+
+    recent_since = as_of.date() - timedelta(days=RECENT_CREDIT_DAYS)
+    values = {}
+    for farmer_id, entries in records.items():
+        if entries:
+            scores = [entry.calculate_risk_score() for entry in entries]
+            recent = [score for entry, score in zip(entries, scores) if entry.loan_date >= recent_since]
+            performance = float(np.mean(scores))
+            if recent:
+                performance = 0.7 * float(np.mean(recent)) + 0.3 * performance
+        else:
+            performance = 60.0
+        values[farmer_id] = {
+            'credit_records': float(len(entries)),
+            'credit_defaults': float(sum(1 for e in entries if e.payment_status == PaymentStatus.DEFAULTED)),
+            'credit_outstanding': float(sum(
+                e.remaining_balance or 0 for e in entries if e.is_active and not e.is_settled
+            )),
+            'credit_performance_score': performance
+        }
+    return values
+
+
+class FeatureStore:
+    """Materialize and serve farmer features."""
+
+    def __init__(self, registry: FeatureRegistry = feature_registry, max_age: float = 300.0,
+                 stale_age: float = 3600.0):
+        self.registry = registry
+        self.max_age = max_age
+        self.table = FarmerFeature.__table__
+        # One online array per database engine
+        self._online = TTLCache(ttl=max_age, stale_ttl=stale_age)
+
+    # Materialization
+
+    def compute(self, farmer_ids: Sequence[int], as_of: Optional[date] = None) -> FeatureValues:
+        """Compute every registered feature for farmers as of the end of a date."""
+        as_of_end = datetime.combine(as_of or date.today(), dt_time.max)
+        values: FeatureValues = {farmer_id: {} for farmer_id in farmer_ids}
+        for group in self.registry.groups:
+            for farmer_id, features in group.compute(farmer_ids, as_of_end).items():
+                values[farmer_id].update(features)
+        return values
+
+    def materialize(self, as_of: Optional[date] = None, batch_size: int = 1000,
+                    farmer_ids: Optional[Sequence[int]] = None) -> int:
+        """
+        Write the features of active farmers (or ``farmer_ids``) as of a date.
+
+        Existing rows for the same farmers and date are replaced.
+
+        Returns:
+            int: Number of farmers materialized
+        """
+        as_of = as_of or date.today()
+        t = self.table
+        names = self.registry.names()
+        now = datetime.utcnow()
+
+        materialized = 0
+        last_id = 0
+        while True:
+            query = db.session.query(Farmer.id).filter(Farmer.is_active == True, Farmer.id > last_id)
+            if farmer_ids is not None:
+                query = query.filter(Farmer.id.in_(farmer_ids))
+            ids = [row[0] for row in query.order_by(Farmer.id).limit(batch_size)]
+            if not ids:
+                break
+
+            values = self.compute(ids, as_of)
+            db.session.execute(t.delete().where(t.c.farmer_id.in_(ids), t.c.as_of_date == as_of))
+            db.session.execute(t.insert(), [
+                {
+                    'farmer_id': farmer_id, 'as_of_date': as_of, 'name': name,
+                    'value': None if values[farmer_id].get(name) is None else float(values[farmer_id][name]),
+                    'computed_at': now
+                }
+                for farmer_id in ids for name in names
+            ])
+            db.session.commit()
+
+            materialized += len(ids)
+            last_id = ids[-1]
+
+        self.invalidate()
+        logger.info(f"Materialized {len(names)} features for {materialized} farmers as of {as_of}")
+        return materialized
+
+    # Online serving
+
+    def invalidate(self):
+        self._online.invalidate()
+
+    def _load_online(self):
+        """Latest materialized row of every farmer, as a dense array."""
+        t = self.table
+        latest = db.select(
+            t.c.farmer_id, db.func.max(t.c.as_of_date).label('as_of_date')
+        ).group_by(t.c.farmer_id).subquery()
+        rows = db.session.execute(
+            db.select(t.c.farmer_id, t.c.name, t.c.value, t.c.as_of_date, t.c.computed_at).join(
+                latest, db.and_(latest.c.farmer_id == t.c.farmer_id, latest.c.as_of_date == t.c.as_of_date)
+            )
+        ).all()
+
+        names = self.registry.names()
+        column = {name: i for i, name in enumerate(names)}
+        farmer_ids = sorted({row.farmer_id for row in rows})
+        index = {farmer_id: i for i, farmer_id in enumerate(farmer_ids)}
+        matrix = np.full((len(farmer_ids), len(names)), np.nan)
+        as_of = {}
+        computed_at = {}
+        for row in rows:
+            if row.name in column and row.value is not None:
+                matrix[index[row.farmer_id], column[row.name]] = row.value
+            as_of[row.farmer_id] = row.as_of_date
+            if row.computed_at is not None:
+                computed_at[row.farmer_id] = max(row.computed_at, computed_at.get(row.farmer_id, row.computed_at))
+        return {
+            'names': names, 'column': column, 'index': index, 'matrix': matrix,
+            'as_of': as_of, 'computed_at': computed_at
+        }
+
+    def _online_store(self):
+        app = current_app._get_current_object()
+
+        def load():
+            # May run on the cache's refresh thread
+            with app.app_context():
+                return self._load_online()
+
+        return self._online.get_or_compute(db.engine, load)
+
+    def online(self, farmer_id: int) -> Optional[Dict[str, Optional[float]]]:
+        """Latest materialized features of one farmer, or None if never materialized."""
+        online = self._online_store()
+        row = online['index'].get(farmer_id)
+        if row is None:
+            return None
+        values = online['matrix'][row]
+        features = {name: (None if np.isnan(values[i]) else float(values[i])) for i, name in enumerate(online['names'])}
+        features['as_of_date'] = online['as_of'][farmer_id].isoformat()
+        computed_at = online['computed_at'].get(farmer_id)
+        features['computed_at'] = computed_at.isoformat() if computed_at else None
+        return features
+
+    def online_matrix(self, farmer_ids: Sequence[int], names: Sequence[str]) -> np.ndarray:
+        """
+        Latest features for many farmers as a (farmers, features) array.
+
+        Farmers without materialized features get NaN rows.
+        """
+        online = self._online_store()
+        unknown = [name for name in names if name not in online['column']]
+        if unknown:
+            raise ValueError(f"Unknown features: {', '.join(unknown)}")
+        rows = np.array([online['index'].get(farmer_id, -1) for farmer_id in farmer_ids], dtype=np.int64)
+        columns = [online['column'][name] for name in names]
+        result = online['matrix'][np.clip(rows, 0, None)][:, columns] if len(online['index']) else \
+            np.full((len(rows), len(columns)), np.nan)
+        result[rows < 0] = np.nan
+        return result
+
+    def materialized_farmer_ids(self) -> List[int]:
+        """Farmers present in the online store."""
+        return sorted(self._online_store()['index'])
+
+
+feature_store = FeatureStore()
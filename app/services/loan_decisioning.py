@@ -0,0 +1,325 @@
+"""
+Bulk loan decisioning pipeline for Talazo AgriFinance Platform.
+
+Picks up SUBMITTED loan applications in id-ordered batches, joins each batch
+to the farmer's precomputed viability score (the latest soil sample's
+``financial_index_score``, written by the scoring service) and experience,
+computes DTI, LTV and affordability ratios as NumPy arrays, applies the
+eligibility policy to the whole batch at once and writes the decisions back
+with a single executemany UPDATE per batch. The UPDATE bypasses mapper
+events, so the pipeline moves the decided applications' portfolio exposure
+cube contributions and invalidates the repayment schedule book itself.
+
+The point scheme mirrors ``LoanApplication.get_eligibility_assessment`` so
+automated and per-application assessments agree.
+"""
+
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import bindparam
+
+from app.core.extensions import db
+from app.models import Farmer, SoilSample, LoanApplication
+from app.models.loan_application import ApplicationStatus
+from app.services.portfolio_exposure import portfolio_exposure
+from app.services.repayment_schedule import mark_schedule_book_stale
+
+logger = logging.getLogger(__name__)
+
+AUTO_REVIEWER = 'auto-decisioning'
+
+
+class LoanDecisioningPipeline:
+    """Decide SUBMITTED loan applications in vectorized batches."""
+
+    def __init__(self, batch_size: int = 500):
+        self.batch_size = batch_size
+
+        # Decision policy (score is the 0-100 eligibility points total)
+        self.policy = {
+            'approve_min_score': 50,        # Same cut-off as get_eligibility_assessment
+            'reject_max_score': 30,         # Below this, reject without manual review
+            'max_affordability_ratio': 0.4, # Monthly instalment / net monthly income
+            'interest_rate_tiers': [        # (min viability score, annual rate %)
+                (80, 8.0),
+                (65, 12.0),
+                (0, 15.0)
+            ]
+        }
+
+    def _fetch_batch(self, after_id: int):
+        """Load the next batch of SUBMITTED applications joined to farmer data."""
+        latest_score = db.select(SoilSample.financial_index_score).where(
+            SoilSample.farmer_id == LoanApplication.farmer_id,
+            SoilSample.financial_index_score.isnot(None)
+        ).order_by(
+            SoilSample.collection_date.desc()
+        ).limit(1).correlate(LoanApplication).scalar_subquery()
+
+        return db.session.query(
+            LoanApplication.id,
+            LoanApplication.requested_amount,
+            LoanApplication.requested_term_months,
+            LoanApplication.monthly_income,
+            LoanApplication.other_income,
+            LoanApplication.monthly_expenses,
+            LoanApplication.existing_debt,
+            LoanApplication.collateral_value,
+            LoanApplication.soil_score,
+            LoanApplication.credit_score,
+            Farmer.farming_experience_years,
+            latest_score.label('viability_score'),
+            # Previous state, for moving exposure cube contributions
+            LoanApplication.risk_assessment,
+            LoanApplication.approved_amount,
+            Farmer.district,
+            Farmer.province,
+            Farmer.primary_crop
+        ).outerjoin(
+            Farmer, Farmer.id == LoanApplication.farmer_id
+        ).filter(
+            LoanApplication.status == ApplicationStatus.SUBMITTED,
+            LoanApplication.id > after_id
+        ).order_by(
+            LoanApplication.id
+        ).limit(self.batch_size).all()
+
+    @staticmethod
+    def _column(rows, index: int) -> np.ndarray:
+        """Extract one column as float64, with NaN for NULL."""
+        return np.array([np.nan if row[index] is None else row[index] for row in rows],
+                        dtype=np.float64)
+
+    def compute_ratios(self, columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """
+        Compute DTI, LTV and affordability ratios for a batch.
+
+        Matches the per-application ``calculate_*_ratio`` methods: ratios are
+        0 when their denominator is missing or not positive. ``has_net_income``
+        marks the rows whose affordability ratio is meaningful.
+        """
+        requested = np.nan_to_num(columns['requested_amount'])
+        term = np.nan_to_num(columns['requested_term_months'])
+        income = np.nan_to_num(columns['monthly_income']) + np.nan_to_num(columns['other_income'])
+        net_income = income - np.nan_to_num(columns['monthly_expenses'])
+        debt = np.nan_to_num(columns['existing_debt'])
+        collateral = np.nan_to_num(columns['collateral_value'])
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            dti = np.where(income > 0, debt / income, 0.0)
+            ltv = np.where(collateral > 0, requested / collateral, 0.0)
+            has_payment = (net_income > 0) & (term > 0)
+            monthly_payment = np.where(term > 0, requested / term, 0.0)
+            affordability = np.where(has_payment, monthly_payment / net_income, 0.0)
+
+        return {
+            'debt_to_income': np.round(dti, 4),
+            'loan_to_value': np.round(ltv, 4),
+            'affordability': np.round(affordability, 4),
+            'has_net_income': net_income > 0
+        }
+
+    def score(self, columns: Dict[str, np.ndarray], ratios: Dict[str, np.ndarray]) -> np.ndarray:
+        """Eligibility points for a batch, as in get_eligibility_assessment."""
+        soil = np.nan_to_num(columns['soil_score'])
+        credit = np.nan_to_num(columns['credit_score'])
+        experience = np.nan_to_num(columns['farming_experience_years'])
+        dti = ratios['debt_to_income']
+        ltv = ratios['loan_to_value']
+
+        points = np.select([soil >= 80, soil >= 60, soil >= 40], [30, 20, 10], 0)
+        points += np.select([credit >= 700, credit >= 600, credit >= 500], [25, 15, 10], 0)
+        points += np.select([dti <= 0.3, dti <= 0.5], [20, 10], 0)
+        points += np.select([ltv <= 0.7, ltv <= 0.9], [15, 8], 0)
+        points += np.select([experience >= 5, experience >= 2], [10, 5], 0)
+        return points
+
+    def decide(self, columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """
+        Apply the decision policy to a batch.
+
+        Returns:
+            dict: Arrays of ratios, score, decision codes (approve/reject/review),
+            viability score and approved interest rate
+        """
+        # Fall back to the viability score where no soil score was recorded
+        viability = columns['viability_score']
+        columns['soil_score'] = np.where(np.isnan(columns['soil_score']), viability,
+                                         columns['soil_score'])
+
+        ratios = self.compute_ratios(columns)
+        points = self.score(columns, ratios)
+
+        # No net income means no repayment capacity, not a 0 affordability ratio
+        affordable = ratios['has_net_income'] & \
+            (ratios['affordability'] <= self.policy['max_affordability_ratio'])
+        approve = (points >= self.policy['approve_min_score']) & affordable
+        reject = ~approve & (points < self.policy['reject_max_score'])
+        decision = np.where(approve, 'approve', np.where(reject, 'reject', 'review'))
+
+        viability_filled = np.nan_to_num(viability)
+        tiers = self.policy['interest_rate_tiers']
+        rate = np.select([viability_filled >= floor for floor, _ in tiers],
+                         [rate for _, rate in tiers], tiers[-1][1])
+
+        return dict(ratios, score=points, decision=decision, viability=viability, rate=rate)
+
+    def _build_updates(self, rows, columns, result, decided_at) -> List[Dict]:
+        updates = []
+        for i, row in enumerate(rows):
+            decision = result['decision'][i]
+            viability = None if np.isnan(result['viability'][i]) else float(result['viability'][i])
+            soil_score = None if np.isnan(columns['soil_score'][i]) else float(columns['soil_score'][i])
+            update = {
+                'b_id': row.id,
+                'b_soil_score': soil_score,
+                'b_viability_score': viability,
+                'b_risk_assessment': _risk_band(viability),
+                'b_review_date': decided_at,
+                'b_reviewed_by': AUTO_REVIEWER,
+                'b_reviewer_notes': (
+                    f"Automated score {int(result['score'][i])}/100; "
+                    f"DTI {result['debt_to_income'][i]:.2f}, "
+                    f"LTV {result['loan_to_value'][i]:.2f}, "
+                    + (f"affordability {result['affordability'][i]:.2f}"
+                       if result['has_net_income'][i] else "no net monthly income")
+                ),
+                'b_decision_date': None,
+                'b_approved_amount': None,
+                'b_approved_term_months': None,
+                'b_approved_interest_rate': None,
+                'b_rejection_reason': None
+            }
+            if decision == 'approve':
+                update.update({
+                    'b_status': ApplicationStatus.APPROVED,
+                    'b_decision_date': decided_at,
+                    'b_approved_amount': row.requested_amount,
+                    'b_approved_term_months': row.requested_term_months,
+                    'b_approved_interest_rate': float(result['rate'][i])
+                })
+            elif decision == 'reject':
+                update.update({
+                    'b_status': ApplicationStatus.REJECTED,
+                    'b_decision_date': decided_at,
+                    'b_rejection_reason': 'Eligibility score below automated threshold'
+                })
+            else:
+                update['b_status'] = ApplicationStatus.UNDER_REVIEW
+            updates.append(update)
+        return updates
+
+    def _write_decisions(self, rows, updates: List[Dict]) -> int:
+        """Write a batch of decisions with one executemany UPDATE."""
+        t = LoanApplication.__table__
+        statement = t.update().where(
+            t.c.id == bindparam('b_id'),
+            # Skip rows someone else moved on since the batch was read
+            t.c.status == ApplicationStatus.SUBMITTED
+        ).values(
+            status=bindparam('b_status'),
+            soil_score=bindparam('b_soil_score'),
+            viability_score=bindparam('b_viability_score'),
+            risk_assessment=bindparam('b_risk_assessment'),
+            review_date=bindparam('b_review_date'),
+            decision_date=bindparam('b_decision_date'),
+            reviewed_by=bindparam('b_reviewed_by'),
+            reviewer_notes=bindparam('b_reviewer_notes'),
+            approved_amount=bindparam('b_approved_amount'),
+            approved_term_months=bindparam('b_approved_term_months'),
+            approved_interest_rate=bindparam('b_approved_interest_rate'),
+            rejection_reason=bindparam('b_rejection_reason'),
+            updated_at=bindparam('b_review_date')
+        )
+        written = db.session.execute(statement, updates).rowcount
+        self._update_exposure(rows, updates)
+        if any(update['b_status'] == ApplicationStatus.APPROVED for update in updates):
+            mark_schedule_book_stale(db.session)
+        return written
+
+    def _update_exposure(self, rows, updates: List[Dict]):
+        """Move decided applications between exposure cube cells."""
+        decided_at = updates[0]['b_review_date']
+        # Only rows this run actually wrote; the status guard may have skipped some
+        written_ids = set(db.session.scalars(
+            db.select(LoanApplication.id).where(
+                LoanApplication.id.in_([update['b_id'] for update in updates]),
+                LoanApplication.reviewed_by == AUTO_REVIEWER,
+                LoanApplication.review_date == decided_at
+            )
+        ))
+
+        transitions = []
+        for row, update in zip(rows, updates):
+            if row.id not in written_ids:
+                continue
+            dims = {'district': row.district, 'province': row.province,
+                    'primary_crop': row.primary_crop}
+            old = {'status': ApplicationStatus.SUBMITTED, 'risk_assessment': row.risk_assessment,
+                   'requested_amount': row.requested_amount, 'approved_amount': row.approved_amount}
+            new = {'status': update['b_status'], 'risk_assessment': update['b_risk_assessment'],
+                   'requested_amount': row.requested_amount,
+                   'approved_amount': update['b_approved_amount']}
+            transitions.append((dims, old, new))
+
+        portfolio_exposure.apply_loan_transitions(db.session.connection(), transitions)
+
+    def run(self, max_batches: Optional[int] = None, dry_run: bool = False) -> Dict:
+        """
+        Decide all SUBMITTED applications.
+
+        Args:
+            max_batches (int, optional): Stop after this many batches
+            dry_run (bool): Compute decisions without writing them
+
+        Returns:
+            dict: Counts of processed, approved, rejected and referred applications
+        """
+        summary = {'processed': 0, 'approved': 0, 'rejected': 0, 'under_review': 0,
+                   'written': 0, 'batches': 0, 'dry_run': dry_run}
+        after_id = 0
+
+        while max_batches is None or summary['batches'] < max_batches:
+            rows = self._fetch_batch(after_id)
+            if not rows:
+                break
+
+            columns = {
+                name: self._column(rows, index)
+                for index, name in enumerate((
+                    'id', 'requested_amount', 'requested_term_months', 'monthly_income',
+                    'other_income', 'monthly_expenses', 'existing_debt', 'collateral_value',
+                    'soil_score', 'credit_score', 'farming_experience_years', 'viability_score'
+                ))
+            }
+            result = self.decide(columns)
+
+            summary['processed'] += len(rows)
+            summary['approved'] += int(np.sum(result['decision'] == 'approve'))
+            summary['rejected'] += int(np.sum(result['decision'] == 'reject'))
+            summary['under_review'] += int(np.sum(result['decision'] == 'review'))
+            summary['batches'] += 1
+
+            if not dry_run:
+                updates = self._build_updates(rows, columns, result, datetime.utcnow())
+                summary['written'] += self._write_decisions(rows, updates)
+                db.session.commit()
+
+            after_id = rows[-1].id
+
+        logger.info(f"Loan decisioning run: {summary}")
+        return summary
+
+
+def _risk_band(viability: Optional[float]) -> Optional[str]:
+    """Map a viability score to the LOW/MEDIUM/HIGH risk_assessment band."""
+    if viability is None:
+        return None
+    if viability >= 65:
+        return 'LOW'
+    if viability >= 50:
+        return 'MEDIUM'
+    return 'HIGH'
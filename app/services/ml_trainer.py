@@ -7,54 +7,129 @@ import os
 import numpy as np
 import pandas as pd
 from sklearn.ensemble import RandomForestRegressor
-from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error, r2_score
-import joblib
-from datetime import datetime
+from datetime import datetime, timedelta
 import logging
 
+from flask import has_app_context
+
+from app.services.model_registry import get_model_registry
+
 logger = logging.getLogger(__name__)
 
+YIELD_MODEL_NAME = 'yield_prediction'
+
+YIELD_FEATURES = [
+    'ph_level', 'nitrogen_level', 'phosphorus_level',
+    'potassium_level', 'organic_matter', 'moisture_content'
+]
+
+# Values used for optional soil measurements that were not recorded
+# (centre of the training distribution)
+FEATURE_DEFAULTS = {
+    'organic_matter': 3.5,
+    'moisture_content': 25.0
+}
+
+# The model predicts tons/ha; SoilSample.yield_prediction is kg/ha
+KG_PER_TON = 1000.0
+
+# Fewer database rows than this and training falls back to synthetic data
+MIN_TRAINING_ROWS = 200
+
+# Share of rows held out to evaluate a trained model
+TEST_SIZE = 0.2
+
+# Incremental updates re-read samples created this long before the watermark
+INCREMENT_LOOKBACK = timedelta(hours=1)
+
+# An incremental update is activated unless its held-out MSE is this much worse
+ACCEPT_TOLERANCE = 0.01
+
+
+def holdout_start(rows, test_size=TEST_SIZE):
+    """Index of the first held-out row when the last ``test_size`` share is held out."""
+    return rows - max(1, int(round(rows * test_size)))
+
 
 class MLModelTrainer:
     """Train and manage machine learning models for the platform."""
     
-    def __init__(self):
-        self.models_dir = os.path.join(os.path.dirname(__file__), '../../models')
+    def __init__(self, models_dir=None):
+        self.models_dir = models_dir or os.path.join(os.path.dirname(__file__), '../../models')
         os.makedirs(self.models_dir, exist_ok=True)
+        self.registry = get_model_registry(self.models_dir)
     
-    def train_yield_prediction_model(self, data=None):
+    def training_snapshot(self, refresh=False):
+        """
+        Current database training snapshot (extracted if out of date).
+        
+        Returns:
+            TrainingSnapshot or None if the database has no usable rows
+        """
+        from app.services.training_data import TrainingDataExtractor
+        
+        extractor = TrainingDataExtractor(os.path.join(self.models_dir, 'training_data'))
+        return extractor.snapshot(refresh=refresh)
+    
+    def _training_arrays(self, data):
+        """Features and target arrays from a snapshot or DataFrame, plus a source label."""
+        from app.services.training_data import TrainingSnapshot
+        
+        if isinstance(data, TrainingSnapshot):
+            # float32 memory-mapped arrays are used by the forest without copying
+            return data.X, data.y, f'snapshot:{data.version}'
+        
+        # Plain arrays: the feature order is recorded in the registry metadata
+        X = data[YIELD_FEATURES].to_numpy(dtype=np.float64)
+        y = data['yield_tons_per_hectare'].to_numpy(dtype=np.float64)
+        return X, y, 'dataframe'
+    
+    def train_yield_prediction_model(self, data=None, source='auto', tune_budget=None):
         """
         Train the crop yield prediction model.
         
         Args:
-            data (pd.DataFrame, optional): Training data. If None, generates synthetic data.
+            data (pd.DataFrame or TrainingSnapshot, optional): Training data
+            source (str): When no data is given: 'db' (database snapshot),
+                'synthetic', or 'auto' (database if it has enough rows)
+            tune_budget (float, optional): Seconds for a cross-validated
+                hyperparameter search; the fixed parameters are used if None
         """
         logger.info("Training yield prediction model...")
         
+        if data is None and (source == 'db' or (source == 'auto' and has_app_context())):
+            snapshot = self.training_snapshot()
+            if snapshot is not None and (source == 'db' or len(snapshot) >= MIN_TRAINING_ROWS):
+                data = snapshot
+            elif source == 'db':
+                raise ValueError("No database rows available for training")
+        
         if data is None:
             data = self._generate_synthetic_training_data()
         
-        # Prepare features and target
-        feature_columns = [
-            'ph_level', 'nitrogen_level', 'phosphorus_level', 
-            'potassium_level', 'organic_matter', 'moisture_content'
-        ]
+        feature_columns = YIELD_FEATURES
+        X, y, data_source = self._training_arrays(data)
+        manifest = getattr(data, 'manifest', {})
+        watermark = manifest['source'].get('max_created_at') if manifest else None
         
-        X = data[feature_columns]
-        y = data['yield_tons_per_hectare']
+        # Hold out the last rows (snapshots are ordered by sample id, so the
+        # newest samples); slices of a memory-mapped snapshot are views, so
+        # the forest is fitted on the mapped file without a copy
+        split = holdout_start(len(y))
+        X_train, X_test, y_train, y_test = X[:split], X[split:], y[:split], y[split:]
         
-        # Split data
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=0.2, random_state=42
-        )
+        # Train model, with searched parameters when tuning
+        params = {'n_estimators': 100, 'max_depth': 10}
+        tuning = None
+        if tune_budget is not None:
+            from app.services.model_tuning import HyperparameterSearch
+            
+            tuning = HyperparameterSearch(time_budget=tune_budget).run(X_train, y_train)
+            if tuning['best_params']:
+                params = tuning['best_params']
         
-        # Train model
-        model = RandomForestRegressor(
-            n_estimators=100,
-            max_depth=10,
-            random_state=42
-        )
+        model = RandomForestRegressor(random_state=42, **params)
         
         model.fit(X_train, y_train)
         
@@ -65,33 +140,176 @@ class MLModelTrainer:
         
         logger.info(f"Model performance - MSE: {mse:.4f}, R²: {r2:.4f}")
         
-        # Save model
-        model_path = os.path.join(self.models_dir, 'yield_prediction_model.pkl')
-        joblib.dump(model, model_path)
+        # Binned training inputs and held-out predictions, the baseline for drift checks
+        from app.services.drift_monitor import reference_histograms
+        
+        # Rows inside the lookback window that the next increment must skip
+        seen_near_watermark = []
+        if watermark:
+            from app.services.training_data import sample_ids_near
+            
+            seen_near_watermark = sample_ids_near(
+                data.sample_ids, datetime.fromisoformat(watermark), INCREMENT_LOOKBACK
+            )
         
-        # Save model metadata
+        # Register as a new version; earlier versions stay available for rollback
         metadata = {
             'model_type': 'RandomForestRegressor',
             'features': feature_columns,
+            'target': manifest.get('target', 'synthetic_yield_tons_per_hectare'),
+            'target_limitation': manifest.get('target_limitation', 'Synthetic target from a soil response formula'),
+            'params': model.get_params(),
             'performance': {'mse': mse, 'r2': r2},
-            'trained_at': datetime.utcnow().isoformat(),
-            'model_path': model_path
+            'training_samples': len(X_train),
+            'training_data': data_source,
+            'watermark': watermark,
+            'watermark_sample_ids': seen_near_watermark,
+            'lineage': [{'training_data': data_source, 'rows': len(X), 'watermark': watermark}],
+            'reference_histograms': reference_histograms(X, y_pred),
+            'trained_at': datetime.utcnow().isoformat()
         }
+        if tuning is not None:
+            metadata['tuning'] = tuning
+        version = self.registry.register(YIELD_MODEL_NAME, model, metadata)
         
-        metadata_path = os.path.join(self.models_dir, 'yield_model_metadata.json')
-        import json
-        with open(metadata_path, 'w') as f:
-            json.dump(metadata, f, indent=2)
+        logger.info(f"Model registered as {YIELD_MODEL_NAME} {version}")
+        return model
+    
+    def _base_holdout(self, extractor, parent):
+        """Held-out rows of the full snapshot the parent's lineage starts from, or None."""
+        from app.services.training_data import MANIFEST_FILE, TrainingSnapshot
+        
+        source = (parent.get('lineage') or [{}])[0].get('training_data', '')
+        if not source.startswith('snapshot:'):
+            return None
+        directory = os.path.join(extractor.root, source.split(':', 1)[1])
+        if not os.path.exists(os.path.join(directory, MANIFEST_FILE)):
+            return None
+        snapshot = TrainingSnapshot(directory)
+        split = holdout_start(len(snapshot))
+        return snapshot.X[split:], snapshot.y[split:]
+    
+    def train_yield_prediction_incremental(self, trees_per_increment=None, lookback=INCREMENT_LOOKBACK):
+        """
+        Add trees trained on soil samples created since the active model's watermark.
+        
+        The active version is continued with ``warm_start``: its trees are
+        kept and new trees are fitted on the new rows (the newest 20% are
+        held out). Rows are read from ``lookback`` before the watermark, so
+        samples committed after it with an earlier ``created_at`` are not
+        missed; the rows of that window the parent already trained on
+        (``watermark_sample_ids``) are skipped. A forest averages
+        its trees equally, so unless ``trees_per_increment`` is given the
+        number of new trees is proportional to the new rows' share of all
+        training rows.
+        
+        The update and its parent are compared on held-out rows from both
+        the increment and the snapshot the base model was trained on. The
+        update is always registered, but only activated if it is not worse
+        than the parent (within ``ACCEPT_TOLERANCE``). Without an active
+        model carrying a watermark, a full database training is run instead.
+        
+        Returns:
+            RandomForestRegressor or None if there were no new rows
+        """
+        from app.services.drift_monitor import merge_histograms, reference_histograms
+        from app.services.training_data import TrainingDataExtractor, sample_ids_near
+        
+        active = self.registry.active_version(YIELD_MODEL_NAME)
+        parent = self.registry.metadata(YIELD_MODEL_NAME, active) if active else {}
+        if not parent.get('watermark'):
+            logger.info("No watermarked yield model to continue; running full training")
+            return self.train_yield_prediction_model(source='db')
+        
+        extractor = TrainingDataExtractor(os.path.join(self.models_dir, 'training_data'))
+        created_after = datetime.fromisoformat(parent['watermark']) - lookback
+        increment = extractor.increment(created_after, exclude_ids=parent.get('watermark_sample_ids'))
+        if increment is None or len(increment) < 2:
+            logger.info(f"No new training rows since {parent['watermark']}")
+            return None
+        
+        split = holdout_start(len(increment))
+        new_holdout = len(increment) - split
+        X_train, y_train = increment.X[:split], increment.y[:split]
+        X_test, y_test = increment.X[split:], increment.y[split:]
+        base_holdout = self._base_holdout(extractor, parent)
+        if base_holdout is not None:
+            X_test = np.concatenate([base_holdout[0], X_test])
+            y_test = np.concatenate([base_holdout[1], y_test])
+        else:
+            logger.warning("Base training snapshot unavailable; evaluating the update on new rows only")
+        
+        model = self.registry.load_copy(YIELD_MODEL_NAME, active)
+        parent_mse = mean_squared_error(y_test, model.predict(X_test))
+        if trees_per_increment is None:
+            parent_rows = sum(entry.get('rows', 0) for entry in parent.get('lineage', [])) or len(increment)
+            trees_per_increment = max(1, round(len(model.estimators_) * len(increment) / parent_rows))
+        model.set_params(warm_start=True, n_estimators=len(model.estimators_) + trees_per_increment)
+        model.fit(X_train, y_train)
+        model.set_params(warm_start=False)
+        
+        y_pred = model.predict(X_test)
+        mse = mean_squared_error(y_test, y_pred)
+        r2 = r2_score(y_test, y_pred)
+        accepted = mse <= parent_mse * (1 + ACCEPT_TOLERANCE)
+        logger.info(f"Incremental update - held-out MSE: {parent_mse:.4f} -> {mse:.4f}")
+        
+        # The lookback may re-read only older rows; the watermark never moves back
+        latest = increment.manifest['source'].get('max_created_at')
+        watermark = max(parent['watermark'], latest, key=datetime.fromisoformat) if latest else parent['watermark']
+        data_source = f'increment:{increment.version}'
+        seen_near_watermark = sample_ids_near(
+            np.concatenate([increment.sample_ids, parent.get('watermark_sample_ids', [])]),
+            datetime.fromisoformat(watermark), lookback
+        )
+        metadata = {
+            'model_type': 'RandomForestRegressor',
+            'features': YIELD_FEATURES,
+            'target': parent.get('target'),
+            'target_limitation': parent.get('target_limitation'),
+            'params': model.get_params(),
+            'performance': {'mse': mse, 'r2': r2, 'parent_mse': parent_mse},
+            'holdout_rows': {
+                'base': len(base_holdout[1]) if base_holdout is not None else 0,
+                'new': new_holdout
+            },
+            'accepted': accepted,
+            'training_samples': len(X_train),
+            'training_data': data_source,
+            'watermark': watermark,
+            'watermark_sample_ids': seen_near_watermark,
+            'parent_version': active,
+            'lineage': parent.get('lineage', []) + [{
+                'training_data': data_source,
+                'rows': len(increment),
+                'trees_added': trees_per_increment,
+                'created_after': created_after.isoformat(),
+                'lookback_seconds': lookback.total_seconds(),
+                'watermark': watermark,
+                'parent_version': active
+            }],
+            'reference_histograms': merge_histograms(
+                parent.get('reference_histograms'), reference_histograms(increment.X, y_pred[-new_holdout:])
+            ),
+            'trained_at': datetime.utcnow().isoformat()
+        }
+        version = self.registry.register(YIELD_MODEL_NAME, model, metadata, activate=accepted)
         
-        logger.info(f"Model saved to {model_path}")
+        if accepted:
+            logger.info(f"Incremental model registered as {YIELD_MODEL_NAME} {version} ({len(model.estimators_)} trees)")
+        else:
+            logger.warning(
+                f"Incremental model {YIELD_MODEL_NAME} {version} is worse than {active} on held-out rows "
+                f"({mse:.4f} > {parent_mse:.4f}); registered but not activated"
+            )
         return model
     
-    def train_all_models(self):
+    def train_all_models(self, source='auto', tune_budget=None):
         """Train all ML models."""
         models = {}
         
         # Train yield prediction model
-        models['yield_prediction'] = self.train_yield_prediction_model()
+        models['yield_prediction'] = self.train_yield_prediction_model(source=source, tune_budget=tune_budget)
         
         logger.info("All models trained successfully")
         return models
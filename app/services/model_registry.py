@@ -0,0 +1,342 @@
+"""
+Versioned ML model registry for Talazo AgriFinance Platform.
+
+Each registered model gets its own version directory instead of
+overwriting a single pickle::
+
+    <root>/<name>/v0001/model.joblib     uncompressed joblib artifact
+    <root>/<name>/v0001/compiled.joblib  packed node arrays (tree ensembles only)
+    <root>/<name>/v0001/metadata.json    features, metrics, sha256 checksums
+    <root>/<name>/ACTIVE                 active version pointer
+    <root>/<name>/history.json           activation history (for rollback)
+
+Artifacts are loaded lazily. scikit-learn trees copy their node arrays
+while unpickling, so every worker holds its own copy of ``model.joblib``.
+Tree ensembles are therefore also stored in their ``compile_forest`` form,
+which is nothing but plain NumPy arrays: ``get_compiled`` loads it with
+``joblib.load(mmap_mode='r')`` so the arrays are mapped from the file and
+shared by all workers through the page cache. ``get`` re-reads the pointer
+at most every ``check_interval`` seconds, so activating or rolling back a
+version takes effect in running workers without a restart.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import joblib
+
+from app.services.compiled_forest import compile_forest
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_FILE = 'model.joblib'
+COMPILED_FILE = 'compiled.joblib'
+METADATA_FILE = 'metadata.json'
+ACTIVE_FILE = 'ACTIVE'
+HISTORY_FILE = 'history.json'
+
+VERSION_PATTERN = re.compile(r'^v(\d+)$')
+
+
+class ModelRegistryError(Exception):
+    """Raised for unknown versions or artifacts that fail verification."""
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_atomic(path: str, text: str):
+    """Replace ``path`` in one step so readers never see a partial file."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    with os.fdopen(fd, 'w') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+class ModelRegistry:
+    """Versioned model artifacts with an active pointer and lazy, shared loading."""
+
+    def __init__(self, root: str, mmap_mode: Optional[str] = 'r', check_interval: float = 5.0):
+        self.root = os.path.abspath(root)
+        self.mmap_mode = mmap_mode
+        self.check_interval = check_interval
+        self._models: Dict[tuple, Any] = {}
+        self._compiled: Dict[tuple, Any] = {}
+        self._active: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    # Paths
+
+    def _model_dir(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def _version_dir(self, name: str, version: str) -> str:
+        return os.path.join(self.root, name, version)
+
+    # Registration
+
+    def versions(self, name: str) -> List[str]:
+        """Registered versions of a model, oldest first."""
+        model_dir = self._model_dir(name)
+        if not os.path.isdir(model_dir):
+            return []
+        found = [entry for entry in os.listdir(model_dir) if VERSION_PATTERN.match(entry)]
+        return sorted(found, key=lambda version: int(VERSION_PATTERN.match(version).group(1)))
+
+    def register(self, name: str, model: Any, metadata: Optional[Dict] = None, activate: bool = True) -> str:
+        """
+        Store a new version of a model.
+
+        Args:
+            name (str): Model name, e.g. 'yield_prediction'
+            model: Fitted estimator
+            metadata (dict, optional): Features, metrics, training details
+            activate (bool): Make the new version active
+
+        Returns:
+            str: The new version, e.g. 'v0003'
+        """
+        os.makedirs(self._model_dir(name), exist_ok=True)
+        with self._lock:
+            existing = self.versions(name)
+            number = int(VERSION_PATTERN.match(existing[-1]).group(1)) + 1 if existing else 1
+            version = f'v{number:04d}'
+            version_dir = self._version_dir(name, version)
+            os.makedirs(version_dir)
+
+        artifact_path = os.path.join(version_dir, ARTIFACT_FILE)
+        joblib.dump(model, artifact_path)
+        compiled_path = os.path.join(version_dir, COMPILED_FILE)
+        try:
+            # Uncompressed, so the node arrays can be memory-mapped on load
+            joblib.dump(compile_forest(model), compiled_path)
+            compiled = COMPILED_FILE
+        except ValueError:
+            compiled = None
+
+        metadata = dict(metadata or {})
+        metadata.update({
+            'name': name,
+            'version': version,
+            'artifact': ARTIFACT_FILE,
+            'compiled_artifact': compiled,
+            'sha256': _sha256(artifact_path),
+            'compiled_sha256': _sha256(compiled_path) if compiled else None,
+            'size_bytes': os.path.getsize(artifact_path),
+            'registered_at': datetime.utcnow().isoformat()
+        })
+        _write_atomic(os.path.join(version_dir, METADATA_FILE), json.dumps(metadata, indent=2, default=str))
+
+        logger.info(f"Registered model {name} {version}")
+        if activate:
+            self.activate(name, version)
+        return version
+
+    def metadata(self, name: str, version: Optional[str] = None) -> Dict:
+        """Metadata of a version (default: the active one)."""
+        version = version or self.active_version(name)
+        if version is None:
+            raise ModelRegistryError(f"Model {name} has no active version")
+        path = os.path.join(self._version_dir(name, version), METADATA_FILE)
+        if not os.path.exists(path):
+            raise ModelRegistryError(f"Unknown version {version} of model {name}")
+        with open(path) as f:
+            return json.load(f)
+
+    def update_metadata(self, name: str, version: str, **fields) -> Dict:
+        """Merge fields into a version's metadata (the artifact is unchanged)."""
+        metadata = self.metadata(name, version)
+        metadata.update(fields)
+        _write_atomic(
+            os.path.join(self._version_dir(name, version), METADATA_FILE),
+            json.dumps(metadata, indent=2, default=str)
+        )
+        return metadata
+
+    def verify(self, name: str, version: str) -> bool:
+        """Check a version's artifacts against their recorded checksums."""
+        metadata = self.metadata(name, version)
+        version_dir = self._version_dir(name, version)
+        path = os.path.join(version_dir, metadata.get('artifact', ARTIFACT_FILE))
+        if not (os.path.exists(path) and _sha256(path) == metadata.get('sha256')):
+            return False
+        # Versions registered before compiled checksums were recorded carry none
+        if metadata.get('compiled_artifact') and metadata.get('compiled_sha256'):
+            path = os.path.join(version_dir, metadata['compiled_artifact'])
+            return os.path.exists(path) and _sha256(path) == metadata['compiled_sha256']
+        return True
+
+    # Active pointer
+
+    def active_version(self, name: str) -> Optional[str]:
+        path = os.path.join(self._model_dir(name), ACTIVE_FILE)
+        try:
+            with open(path) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def history(self, name: str) -> List[Dict]:
+        """Activation history, oldest first."""
+        path = os.path.join(self._model_dir(name), HISTORY_FILE)
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+
+    def activate(self, name: str, version: str) -> str:
+        """
+        Point ``name`` at ``version`` after verifying its checksum.
+
+        Raises:
+            ModelRegistryError: Unknown version or checksum mismatch
+        """
+        if version not in self.versions(name):
+            raise ModelRegistryError(f"Unknown version {version} of model {name}")
+        if not self.verify(name, version):
+            raise ModelRegistryError(f"Checksum mismatch for model {name} {version}")
+
+        with self._lock:
+            history = self.history(name)
+            history.append({'version': version, 'activated_at': datetime.utcnow().isoformat()})
+            _write_atomic(os.path.join(self._model_dir(name), HISTORY_FILE), json.dumps(history, indent=2))
+            _write_atomic(os.path.join(self._model_dir(name), ACTIVE_FILE), version)
+            self._active.pop(name, None)
+
+        logger.info(f"Activated model {name} {version}")
+        return version
+
+    def rollback(self, name: str) -> str:
+        """
+        Re-activate the version that was active before the current one.
+
+        Raises:
+            ModelRegistryError: No earlier version to roll back to
+        """
+        current = self.active_version(name)
+        for entry in reversed(self.history(name)):
+            if entry['version'] != current and entry['version'] in self.versions(name):
+                return self.activate(name, entry['version'])
+        raise ModelRegistryError(f"No earlier version of model {name} to roll back to")
+
+    # Loading
+
+    def load(self, name: str, version: str) -> Any:
+        """Load (once per process) a specific version."""
+        key = (name, version)
+        model = self._models.get(key)
+        if model is None:
+            with self._lock:
+                model = self._models.get(key)
+                if model is None:
+                    path = os.path.join(self._version_dir(name, version), ARTIFACT_FILE)
+                    if not os.path.exists(path):
+                        raise ModelRegistryError(f"Unknown version {version} of model {name}")
+                    model = joblib.load(path, mmap_mode=self.mmap_mode)
+                    self._models[key] = model
+                    logger.info(f"Loaded model {name} {version}")
+        return model
+
+    def load_compiled(self, name: str, version: str) -> Optional[Any]:
+        """
+        Load (once per process) the compiled form of a version, memory-mapped.
+
+        Returns:
+            CompiledForest, or None if the version has no compiled artifact
+        """
+        key = (name, version)
+        if key not in self._compiled:
+            with self._lock:
+                if key not in self._compiled:
+                    path = os.path.join(self._version_dir(name, version), COMPILED_FILE)
+                    compiled = joblib.load(path, mmap_mode=self.mmap_mode) if os.path.exists(path) else None
+                    self._compiled[key] = compiled
+        return self._compiled[key]
+
+    def load_copy(self, name: str, version: str) -> Any:
+        """A private, writable copy of a version (e.g. to continue training it)."""
+        path = os.path.join(self._version_dir(name, version), ARTIFACT_FILE)
+        if not os.path.exists(path):
+            raise ModelRegistryError(f"Unknown version {version} of model {name}")
+        return joblib.load(path)
+
+    def get(self, name: str) -> Optional[Any]:
+        """
+        The active version of a model, or None if nothing is registered.
+
+        The pointer is re-read at most every ``check_interval`` seconds;
+        versions that are no longer active are dropped from memory.
+        """
+        version = self._current_version(name)
+        return self.load(name, version) if version is not None else None
+
+    def get_compiled(self, name: str) -> Optional[Any]:
+        """The memory-mapped compiled form of the active version, or None."""
+        version = self._current_version(name)
+        return self.load_compiled(name, version) if version is not None else None
+
+    def _current_version(self, name: str) -> Optional[str]:
+        now = time.monotonic()
+        cached = self._active.get(name)
+        if cached is None or now - cached[1] > self.check_interval:
+            version = self.active_version(name)
+            if version is None:
+                return None
+            if cached is not None and cached[0] != version:
+                with self._lock:
+                    self._models.pop((name, cached[0]), None)
+                    self._compiled.pop((name, cached[0]), None)
+            cached = (version, now)
+            self._active[name] = cached
+        return cached[0]
+
+    def active(self, name: str) -> Optional[Dict]:
+        """The active model with its version and metadata, or None."""
+        model = self.get(name)
+        if model is None:
+            return None
+        version = self._active[name][0]
+        return {'version': version, 'model': model, 'metadata': self.metadata(name, version)}
+
+    def invalidate(self, name: Optional[str] = None):
+        """Forget loaded models so the next ``get`` re-reads the pointer."""
+        with self._lock:
+            if name is None:
+                self._models.clear()
+                self._compiled.clear()
+                self._active.clear()
+            else:
+                self._models = {key: model for key, model in self._models.items() if key[0] != name}
+                self._compiled = {key: model for key, model in self._compiled.items() if key[0] != name}
+                self._active.pop(name, None)
+
+
+_registries: Dict[str, ModelRegistry] = {}
+_registries_lock = threading.Lock()
+
+
+def get_model_registry(root: Optional[str] = None) -> ModelRegistry:
+    """Process-wide registry for ``root`` (default: ``ML_MODEL_PATH``)."""
+    if root is None:
+        from flask import current_app
+        root = current_app.config['ML_MODEL_PATH']
+    root = os.path.abspath(root)
+    registry = _registries.get(root)
+    if registry is None:
+        with _registries_lock:
+            registry = _registries.setdefault(root, ModelRegistry(root))
+    return registry
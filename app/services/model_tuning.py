@@ -0,0 +1,149 @@
+"""
+Hyperparameter search for Talazo AgriFinance Platform models.
+
+Runs k-fold cross-validation over a parameter grid with trials spread
+across cores by joblib. Folds are evaluated in rounds: round ``k`` fits
+fold ``k`` for every configuration still in the race, then the worse half
+(by mean validation MSE so far) is dropped. Poor configurations therefore
+stop after one or two folds, and the full k folds are only spent on the
+leaders. When the time budget runs out, outstanding trials are cancelled
+and the configuration with the most folds and lowest error so far wins.
+
+Every trial's timings and metrics are returned so they can be stored with
+the model version in the registry.
+"""
+
+import itertools
+import logging
+import math
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import mean_squared_error, r2_score
+from sklearn.model_selection import KFold
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARAM_GRID = {
+    'n_estimators': [50, 100, 200],
+    'max_depth': [6, 10, None],
+    'min_samples_leaf': [1, 5]
+}
+
+
+def _run_trial(X, y, train_index, test_index, params: Dict, random_state: int, config: int) -> Dict:
+    """Fit and score one configuration on one fold (runs in a worker)."""
+    started = time.perf_counter()
+    model = RandomForestRegressor(random_state=random_state, n_jobs=1, **params)
+    model.fit(X[train_index], y[train_index])
+    fitted = time.perf_counter()
+    predictions = model.predict(X[test_index])
+    scored = time.perf_counter()
+    return {
+        'config': config,
+        'mse': float(mean_squared_error(y[test_index], predictions)),
+        'r2': float(r2_score(y[test_index], predictions)),
+        'fit_seconds': round(fitted - started, 4),
+        'predict_seconds': round(scored - fitted, 4)
+    }
+
+
+class HyperparameterSearch:
+    """Parallel k-fold grid search with fold-wise halving and a time budget."""
+
+    def __init__(self, param_grid: Optional[Dict[str, List]] = None, cv: int = 5,
+                 time_budget: Optional[float] = None, n_jobs: int = -1, random_state: int = 42):
+        self.param_grid = param_grid or DEFAULT_PARAM_GRID
+        self.cv = cv
+        self.time_budget = time_budget
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+
+    def _out_of_time(self, started: float) -> bool:
+        return self.time_budget is not None and time.perf_counter() - started >= self.time_budget
+
+    def candidates(self) -> List[Dict[str, Any]]:
+        names = sorted(self.param_grid)
+        return [dict(zip(names, values)) for values in itertools.product(*(self.param_grid[n] for n in names))]
+
+    def run(self, X, y) -> Dict:
+        """
+        Search the grid on ``X``/``y``.
+
+        Returns:
+            dict: best_params, per-configuration results, per-trial records
+            and search timings
+        """
+        started = time.perf_counter()
+        folds = list(KFold(n_splits=self.cv, shuffle=True, random_state=self.random_state).split(X))
+        configs = self.candidates()
+        results = [
+            {'config': i, 'params': params, 'fold_mse': [], 'fold_r2': [], 'status': 'running'}
+            for i, params in enumerate(configs)
+        ]
+        trials = []
+        alive = list(range(len(configs)))
+        stopped_by_budget = False
+
+        with Parallel(n_jobs=self.n_jobs, return_as='generator_unordered') as parallel:
+            for fold, (train_index, test_index) in enumerate(folds):
+                if self._out_of_time(started):
+                    stopped_by_budget = True
+                    break
+
+                outcomes = parallel(
+                    delayed(_run_trial)(X, y, train_index, test_index, configs[i], self.random_state, i)
+                    for i in alive
+                )
+                finished = []
+                for outcome in outcomes:
+                    i = outcome.pop('config')
+                    results[i]['fold_mse'].append(outcome['mse'])
+                    results[i]['fold_r2'].append(outcome['r2'])
+                    trials.append(dict(outcome, config=i, fold=fold, params=configs[i]))
+                    finished.append(i)
+                    if self._out_of_time(started):
+                        # Abandon the rest of the round; pending trials are cancelled
+                        outcomes.close()
+                        break
+                if len(finished) < len(alive):
+                    stopped_by_budget = True
+                    break
+
+                # Keep the better half for the next fold
+                if fold < len(folds) - 1 and len(alive) > 1:
+                    ranked = sorted(alive, key=lambda i: np.mean(results[i]['fold_mse']))
+                    survivors = ranked[:math.ceil(len(ranked) / 2)]
+                    for i in ranked[len(survivors):]:
+                        results[i]['status'] = f'pruned_after_fold_{fold}'
+                    alive = survivors
+
+        for result in results:
+            result['folds_completed'] = len(result['fold_mse'])
+            result['mean_mse'] = float(np.mean(result['fold_mse'])) if result['fold_mse'] else None
+            result['mean_r2'] = float(np.mean(result['fold_r2'])) if result['fold_r2'] else None
+            if result['status'] == 'running':
+                result['status'] = 'stopped_by_budget' if stopped_by_budget else 'completed'
+
+        # Prefer configurations that got furthest, then the lowest error
+        scored = [result for result in results if result['mean_mse'] is not None]
+        best = min(scored, key=lambda r: (-r['folds_completed'], r['mean_mse'])) if scored else None
+
+        elapsed = time.perf_counter() - started
+        logger.info(
+            f"Hyperparameter search: {len(trials)} trials over {len(configs)} configurations "
+            f"in {elapsed:.1f}s, best {best['params'] if best else None}"
+        )
+        return {
+            'best_params': best['params'] if best else None,
+            'best_mean_mse': best['mean_mse'] if best else None,
+            'cv_folds': self.cv,
+            'time_budget_seconds': self.time_budget,
+            'elapsed_seconds': round(elapsed, 2),
+            'stopped_by_budget': stopped_by_budget,
+            'configurations': results,
+            'trials': trials
+        }
@@ -0,0 +1,132 @@
+"""
+Application and policy number generation for Talazo AgriFinance Platform.
+
+Numbers keep their human-readable shape, a prefix plus the creation date,
+followed by a zero-padded counter:
+
+    LA{YYYYMMDD}{counter:010d}    loan applications
+    IP{YYYYMM}{counter:010d}      insurance policies
+
+The counter is global, not per period: the date only records when the number
+was issued. It never repeats, so numbers are unique without collision
+retries, and new numbers sort after older ones and append to the unique
+index. ``COUNTER_WIDTH`` digits hold every value the counter can reach, so
+the padding never overflows and numbers keep a fixed length.
+
+- On PostgreSQL the counter comes from a sequence whose increment is
+  ``NUMBER_BLOCK_SIZE``. Each worker process takes one ``nextval`` per
+  block and hands the block out from memory. Sequences are
+  non-transactional, so rolled-back numbers are skipped, never reused.
+- Elsewhere (SQLite) the counter is a ``number_sequences`` row incremented
+  in the inserting transaction; the database serializes writers.
+"""
+
+import threading
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from sqlalchemy import event
+
+from app.core.extensions import db
+from app.models import LoanApplication, InsurancePolicy, NumberSequence
+from app.models.number_sequence import (
+    NUMBER_BLOCK_SIZE, COUNTER_MAX, COUNTER_WIDTH, application_number_seq, policy_number_seq
+)
+
+# kind: (prefix, date format, sequence)
+NUMBER_FORMATS = {
+    'loan_application': ('LA', '%Y%m%d', application_number_seq),
+    'insurance_policy': ('IP', '%Y%m', policy_number_seq)
+}
+
+
+class NumberAllocator:
+    """Allocate monotonic counters and format them as numbers."""
+
+    def __init__(self):
+        self._blocks: Dict[str, Tuple[int, int]] = {}
+        self._lock = threading.Lock()
+
+    def _from_sequence(self, connection, kind: str, count: int) -> List[int]:
+        sequence = NUMBER_FORMATS[kind][2]
+        values = []
+        with self._lock:
+            while len(values) < count:
+                start, end = self._blocks.get(kind, (0, 0))
+                if start >= end:
+                    start = connection.execute(sequence.next_value()).scalar()
+                    end = start + NUMBER_BLOCK_SIZE
+                take = min(count - len(values), end - start)
+                values.extend(range(start, start + take))
+                self._blocks[kind] = (start + take, end)
+        return values
+
+    def _from_counter(self, connection, kind: str, count: int) -> List[int]:
+        t = NumberSequence.__table__
+        result = connection.execute(
+            t.update().where(t.c.name == kind).values(value=t.c.value + count)
+        )
+        if result.rowcount == 0:
+            connection.execute(t.insert().values(name=kind, value=count))
+        end = connection.execute(db.select(t.c.value).where(t.c.name == kind)).scalar()
+        return list(range(end - count + 1, end + 1))
+
+    def allocate(self, connection, kind: str, count: int = 1) -> List[int]:
+        """Reserve ``count`` increasing counter values for ``kind``."""
+        if connection.dialect.supports_sequences:
+            values = self._from_sequence(connection, kind, count)
+        else:
+            values = self._from_counter(connection, kind, count)
+        if values and values[-1] > COUNTER_MAX:
+            raise OverflowError(f"{kind} number counter exhausted ({COUNTER_WIDTH} digits)")
+        return values
+
+    def next_numbers(self, kind: str, count: int = 1, connection=None) -> List[str]:
+        """
+        Generate ``count`` formatted numbers, e.g. for bulk intake.
+
+        Args:
+            kind (str): ``loan_application`` or ``insurance_policy``
+            count (int): Numbers to generate
+            connection: Connection to allocate on (defaults to the session's)
+
+        Returns:
+            list: Numbers in increasing order
+        """
+        prefix, date_format, _ = NUMBER_FORMATS[kind]
+        connection = connection if connection is not None else db.session.connection()
+        stamp = datetime.now().strftime(date_format)
+        return [
+            f"{prefix}{stamp}{value:0{COUNTER_WIDTH}d}"
+            for value in self.allocate(connection, kind, count)
+        ]
+
+    def next_number(self, kind: str, connection=None) -> str:
+        """Generate one formatted number."""
+        return self.next_numbers(kind, 1, connection)[0]
+
+
+number_allocator = NumberAllocator()
+
+
+def _assign_application_number(mapper, connection, target):
+    if not target.application_number:
+        target.application_number = number_allocator.next_number('loan_application', connection)
+
+
+def _assign_policy_number(mapper, connection, target):
+    if not target.policy_number:
+        target.policy_number = number_allocator.next_number('insurance_policy', connection)
+
+
+_LISTENERS = (
+    (LoanApplication, _assign_application_number),
+    (InsurancePolicy, _assign_policy_number),
+)
+
+
+def register_numbering_listeners():
+    """Number loan applications and policies inserted without one."""
+    for model, listener in _LISTENERS:
+        if not event.contains(model, 'before_insert', listener):
+            event.listen(model, 'before_insert', listener)
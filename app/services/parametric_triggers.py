@@ -0,0 +1,332 @@
+"""
+Parametric trigger engine for weather-index insurance.
+
+Active WEATHER_INDEX policies are indexed by ``weather_station_id``. Each
+station's policies are parsed once into flat NumPy arrays (one element per
+trigger: policy, metric, operator, threshold, payout percent). When a station
+observation arrives, only that station's arrays are evaluated, and every
+trigger is tested in one vectorized comparison.
+
+Trigger JSON format
+-------------------
+``trigger_conditions`` is a list (or a single object) of conditions::
+
+    [{"metric": "rainfall_mm", "operator": "<", "threshold": 50, "payout_percent": 25},
+     {"metric": "rainfall_mm", "operator": "<", "threshold": 20, "payout_percent": 60}]
+
+``payout_schedule`` optionally supplies payout percentages by condition
+position, as a list (``[25, 60]``) or an object (``{"0": 25, "1": 60}``);
+a condition's own ``payout_percent`` takes precedence. When several
+conditions fire, the highest tier pays. The payout is that percentage of
+the coverage, limited to the coverage not yet claimed.
+
+Station entries are dropped when a transaction writing a policy at the
+station commits, and reloaded on the next observation (or after ``max_age``
+seconds, so other worker processes pick up changes too). Dropping them at
+flush time would let an observation evaluated before the commit reload and
+cache the old rows again.
+"""
+
+import json
+import logging
+import threading
+import time
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from app.core.extensions import db
+from app.models import InsurancePolicy
+from app.models.insurance_policy import InsuranceType, PolicyStatus
+
+logger = logging.getLogger(__name__)
+
+OPERATORS = ('<', '<=', '>', '>=')
+
+
+def _load_json(value):
+    if not value:
+        return None
+    if isinstance(value, (list, dict)):
+        return value
+    try:
+        return json.loads(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_triggers(trigger_conditions, payout_schedule=None) -> List[Dict]:
+    """
+    Parse a policy's trigger JSON into a list of normalized conditions.
+
+    Malformed conditions are skipped.
+
+    Returns:
+        list: Dicts with metric, operator, threshold and payout_percent
+    """
+    conditions = _load_json(trigger_conditions)
+    if isinstance(conditions, dict):
+        conditions = [conditions]
+    if not isinstance(conditions, list):
+        return []
+
+    schedule = _load_json(payout_schedule)
+
+    parsed = []
+    for position, condition in enumerate(conditions):
+        if not isinstance(condition, dict):
+            continue
+        payout = condition.get('payout_percent')
+        if payout is None and isinstance(schedule, list) and position < len(schedule):
+            payout = schedule[position]
+        elif payout is None and isinstance(schedule, dict):
+            payout = schedule.get(str(position))
+        try:
+            metric = str(condition['metric'])
+            operator = condition.get('operator', '<')
+            threshold = float(condition['threshold'])
+            payout = float(payout if payout is not None else 100)
+        except (KeyError, TypeError, ValueError):
+            continue
+        if operator not in OPERATORS:
+            continue
+        parsed.append({
+            'metric': metric, 'operator': operator,
+            'threshold': threshold, 'payout_percent': payout
+        })
+    return parsed
+
+
+def evaluate_conditions(conditions: List[Dict], metrics: Dict[str, float]):
+    """
+    Split conditions into met and failed for one set of observed metrics.
+
+    Conditions whose metric was not observed are neither met nor failed.
+    """
+    met, failed = [], []
+    for condition in conditions:
+        value = metrics.get(condition['metric'])
+        if value is None:
+            continue
+        comparisons = {
+            '<': value < condition['threshold'],
+            '<=': value <= condition['threshold'],
+            '>': value > condition['threshold'],
+            '>=': value >= condition['threshold']
+        }
+        (met if comparisons[condition['operator']] else failed).append(condition)
+    return met, failed
+
+
+class StationTriggers:
+    """Compact trigger arrays for the active policies at one station."""
+
+    def __init__(self, policies: List[Dict]):
+        self.loaded_at = time.monotonic()
+        self.policy_ids = np.array([p['id'] for p in policies], dtype=np.int64)
+        self.farmer_ids = np.array([p['farmer_id'] for p in policies], dtype=np.int64)
+        self.policy_numbers = [p['policy_number'] for p in policies]
+        self.remaining_cover = np.array(
+            [max(p['coverage_amount'] - (p['total_claims_amount'] or 0), 0.0) for p in policies]
+        )
+        self.coverage = np.array([p['coverage_amount'] for p in policies], dtype=np.float64)
+        self.start = np.array([p['start_date'].toordinal() for p in policies], dtype=np.int64)
+        self.end = np.array([p['end_date'].toordinal() for p in policies], dtype=np.int64)
+
+        # One entry per trigger, grouped by metric
+        by_metric: Dict[str, List] = {}
+        for index, policy in enumerate(policies):
+            for condition in policy['conditions']:
+                by_metric.setdefault(condition['metric'], []).append((
+                    index, OPERATORS.index(condition['operator']),
+                    condition['threshold'], condition['payout_percent']
+                ))
+        self.triggers = {
+            metric: {
+                'policy': np.array([e[0] for e in entries], dtype=np.int64),
+                'operator': np.array([e[1] for e in entries], dtype=np.int8),
+                'threshold': np.array([e[2] for e in entries], dtype=np.float64),
+                'payout_percent': np.array([e[3] for e in entries], dtype=np.float64)
+            }
+            for metric, entries in by_metric.items()
+        }
+
+    def __len__(self):
+        return len(self.policy_ids)
+
+    def evaluate(self, metrics: Dict[str, float], observed_on: date) -> List[Dict]:
+        """Return the payouts triggered by one observation."""
+        if not len(self):
+            return []
+
+        payout_percent = np.zeros(len(self))
+        for metric, value in metrics.items():
+            triggers = self.triggers.get(metric)
+            if triggers is None or value is None:
+                continue
+            threshold = triggers['threshold']
+            fired = np.choose(triggers['operator'], [
+                value < threshold, value <= threshold, value > threshold, value >= threshold
+            ])
+            np.maximum.at(payout_percent, triggers['policy'][fired], triggers['payout_percent'][fired])
+
+        day = observed_on.toordinal()
+        in_force = (self.start <= day) & (day <= self.end)
+        payout = np.minimum(self.coverage * payout_percent / 100, self.remaining_cover)
+        hit = np.flatnonzero(in_force & (payout > 0))
+
+        return [
+            {
+                'policy_id': int(self.policy_ids[i]),
+                'policy_number': self.policy_numbers[i],
+                'farmer_id': int(self.farmer_ids[i]),
+                'payout_percent': float(payout_percent[i]),
+                'payout_amount': round(float(payout[i]), 2)
+            }
+            for i in hit
+        ]
+
+
+class ParametricTriggerEngine:
+    """Station-indexed trigger evaluation for weather-index policies."""
+
+    def __init__(self, max_age: float = 300.0):
+        self.max_age = max_age
+        self._stations: Dict[str, StationTriggers] = {}
+        self._lock = threading.Lock()
+
+    def _load_station(self, station_id: str) -> StationTriggers:
+        rows = db.session.query(
+            InsurancePolicy.id,
+            InsurancePolicy.farmer_id,
+            InsurancePolicy.policy_number,
+            InsurancePolicy.coverage_amount,
+            InsurancePolicy.total_claims_amount,
+            InsurancePolicy.start_date,
+            InsurancePolicy.end_date,
+            InsurancePolicy.trigger_conditions,
+            InsurancePolicy.payout_schedule
+        ).filter(
+            InsurancePolicy.weather_station_id == station_id,
+            InsurancePolicy.insurance_type == InsuranceType.WEATHER_INDEX,
+            InsurancePolicy.status == PolicyStatus.ACTIVE
+        ).all()
+
+        policies = []
+        for row in rows:
+            conditions = parse_triggers(row.trigger_conditions, row.payout_schedule)
+            if conditions:
+                policies.append(dict(row._mapping, conditions=conditions))
+        return StationTriggers(policies)
+
+    def station(self, station_id: str) -> StationTriggers:
+        """Return a station's trigger arrays, loading them if needed."""
+        entry = self._stations.get(station_id)
+        if entry is None or time.monotonic() - entry.loaded_at > self.max_age:
+            entry = self._load_station(station_id)
+            with self._lock:
+                self._stations[station_id] = entry
+        return entry
+
+    def invalidate(self, station_ids: Optional[Iterable[str]] = None):
+        """Drop cached stations (all when ``station_ids`` is None)."""
+        with self._lock:
+            if station_ids is None:
+                self._stations.clear()
+            else:
+                for station_id in station_ids:
+                    self._stations.pop(station_id, None)
+
+    def evaluate_observation(self, station_id: str, metrics: Dict[str, float],
+                             observed_on: Optional[date] = None) -> List[Dict]:
+        """
+        Evaluate one station observation against the policies it affects.
+
+        Args:
+            station_id (str): Weather station that reported
+            metrics (dict): Observed values, e.g. {"rainfall_mm": 12.5}
+            observed_on (date): Observation date (default today)
+
+        Returns:
+            list: Triggered payouts, one per affected policy
+        """
+        payouts = self.station(station_id).evaluate(metrics, observed_on or date.today())
+        for payout in payouts:
+            payout['station_id'] = station_id
+        return payouts
+
+    def evaluate_event(self, observations: List[Dict]) -> Dict:
+        """
+        Evaluate a regional event made of many station observations.
+
+        Each observation has ``station_id``, ``metrics`` and optionally
+        ``observed_on`` (ISO date).
+
+        Raises:
+            ValueError: If an observation's metrics or date are malformed
+        """
+        payouts = []
+        for observation in observations:
+            metrics = observation.get('metrics') or {}
+            if not isinstance(metrics, dict):
+                raise ValueError("metrics must be an object of metric values")
+            observed_on = observation.get('observed_on')
+            if isinstance(observed_on, str):
+                observed_on = date.fromisoformat(observed_on)
+            elif observed_on is not None and not isinstance(observed_on, date):
+                raise ValueError("observed_on must be an ISO date string")
+            payouts.extend(self.evaluate_observation(
+                str(observation['station_id']), metrics, observed_on
+            ))
+        return {
+            'stations_evaluated': len({str(o['station_id']) for o in observations}),
+            'policies_triggered': len(payouts),
+            'total_payout': round(sum(p['payout_amount'] for p in payouts), 2),
+            'payouts': payouts,
+            'evaluated_at': datetime.utcnow().isoformat()
+        }
+
+
+trigger_engine = ParametricTriggerEngine()
+
+
+# Session key of the stations to drop once the transaction commits
+STALE_STATIONS = 'parametric_trigger_stations'
+
+
+def _after_policy_write(mapper, connection, target):
+    stations = {target.weather_station_id}
+    history = db.inspect(target).attrs.weather_station_id.history
+    stations.update(history.deleted or ())
+    object_session(target).info.setdefault(STALE_STATIONS, set()).update(
+        station for station in stations if station
+    )
+
+
+def _after_commit(session):
+    stations = session.info.pop(STALE_STATIONS, None)
+    if stations:
+        trigger_engine.invalidate(stations)
+
+
+def _after_rollback(session):
+    session.info.pop(STALE_STATIONS, None)
+
+
+_LISTENERS = (
+    (InsurancePolicy, 'after_insert', _after_policy_write),
+    (InsurancePolicy, 'after_update', _after_policy_write),
+    (InsurancePolicy, 'after_delete', _after_policy_write),
+    (Session, 'after_commit', _after_commit),
+    (Session, 'after_rollback', _after_rollback),
+)
+
+
+def register_trigger_listeners():
+    """Drop cached station triggers when policy writes at the station commit."""
+    for target, identifier, listener in _LISTENERS:
+        if not event.contains(target, identifier, listener):
+            event.listen(target, identifier, listener)
@@ -0,0 +1,272 @@
+"""
+Insurance policy expiry and premium-due scheduler.
+
+Each policy's upcoming time-based events are stored in
+``policy_schedule_events``, a persistent priority queue ordered by
+``fire_at``:
+
+- EXPIRY_REMINDER   30 days before ``end_date``    raise a POLICY_EXPIRING alert
+- EXPIRY            the day after ``end_date``     ACTIVE -> EXPIRED
+- PREMIUM_REMINDER  7 days before ``next_premium_due``   raise a PREMIUM_DUE alert
+- PREMIUM_OVERDUE   the day after ``next_premium_due``   payment_status -> overdue
+
+Policy mapper events keep a policy's pending events in line with its
+current dates and status, so scheduling is a few indexed inserts/deletes.
+``run_due`` pops only events that are due, earliest first, and
+``next_due`` tells a runner how long it can sleep. Nothing scans the
+policies table.
+"""
+
+import logging
+import time
+from datetime import date, datetime, time as dt_time, timedelta
+from typing import Dict, Optional, Set, Tuple
+
+from sqlalchemy import bindparam, event
+
+from app.core.extensions import db
+from app.models import InsurancePolicy, PolicyScheduleEvent
+from app.models.alert import AlertType
+from app.models.insurance_policy import PolicyStatus
+from app.models.policy_schedule import PolicyEventType
+from app.services.alerts import alert_service
+
+logger = logging.getLogger(__name__)
+
+EXPIRY_REMINDER_DAYS = 30
+PREMIUM_REMINDER_DAYS = 7
+
+SCHEDULE_FIELDS = ('status', 'end_date', 'next_premium_due', 'payment_status')
+
+ScheduledEvent = Tuple[PolicyEventType, datetime]
+
+
+def _at_midnight(day: date) -> datetime:
+    return datetime.combine(day, dt_time.min)
+
+
+def _status_name(value) -> Optional[str]:
+    if value is None:
+        return None
+    return value.name if isinstance(value, PolicyStatus) else str(value).upper()
+
+
+def desired_events(values: Dict) -> Set[ScheduledEvent]:
+    """Events a policy in the given state should have scheduled."""
+    events = set()
+    status = _status_name(values.get('status'))
+    end_date = values.get('end_date')
+    premium_due = values.get('next_premium_due')
+
+    if status == PolicyStatus.ACTIVE.name and end_date:
+        events.add((PolicyEventType.EXPIRY_REMINDER,
+                    _at_midnight(end_date - timedelta(days=EXPIRY_REMINDER_DAYS))))
+        events.add((PolicyEventType.EXPIRY, _at_midnight(end_date + timedelta(days=1))))
+
+    if status in (PolicyStatus.ACTIVE.name, PolicyStatus.PENDING.name) and premium_due \
+            and values.get('payment_status') != 'paid':
+        events.add((PolicyEventType.PREMIUM_REMINDER,
+                    _at_midnight(premium_due - timedelta(days=PREMIUM_REMINDER_DAYS))))
+        events.add((PolicyEventType.PREMIUM_OVERDUE, _at_midnight(premium_due + timedelta(days=1))))
+
+    return events
+
+
+class PolicyScheduler:
+    """Schedule and fire time-based insurance policy events."""
+
+    def __init__(self):
+        self.table = PolicyScheduleEvent.__table__
+
+    def schedule(self, connection, policy_id: int, values: Dict):
+        """
+        Bring a policy's pending events in line with its current state.
+
+        Events that already exist (pending or fired) are kept, so
+        rescheduling never fires an event twice.
+        """
+        t = self.table
+        wanted = desired_events(values)
+        existing = connection.execute(
+            db.select(t.c.id, t.c.event_type, t.c.fire_at, t.c.fired_at).where(t.c.policy_id == policy_id)
+        ).all()
+        present = {(row.event_type, row.fire_at) for row in existing}
+
+        stale_ids = [
+            row.id for row in existing
+            if row.fired_at is None and (row.event_type, row.fire_at) not in wanted
+        ]
+        if stale_ids:
+            connection.execute(t.delete().where(t.c.id.in_(stale_ids)))
+
+        missing = wanted - present
+        if missing:
+            connection.execute(t.insert(), [
+                {'policy_id': policy_id, 'event_type': event_type, 'fire_at': fire_at}
+                for event_type, fire_at in sorted(missing, key=lambda e: e[1])
+            ])
+
+    def unschedule(self, connection, policy_id: int):
+        """Remove all of a policy's events."""
+        connection.execute(self.table.delete().where(self.table.c.policy_id == policy_id))
+
+    def next_due(self) -> Optional[datetime]:
+        """Fire time of the earliest pending event (one index probe)."""
+        return db.session.query(db.func.min(PolicyScheduleEvent.fire_at)).filter(
+            PolicyScheduleEvent.fired_at.is_(None)
+        ).scalar()
+
+    def _fire(self, event_type: PolicyEventType, policy: Optional[InsurancePolicy], today: date) -> str:
+        """Apply one due event; returns its outcome."""
+        if policy is None:
+            return 'policy_missing'
+
+        connection = db.session.connection()
+
+        if event_type == PolicyEventType.EXPIRY_REMINDER:
+            if _status_name(policy.status) != PolicyStatus.ACTIVE.name:
+                return 'skipped'
+            alert_service.raise_alert(connection, AlertType.POLICY_EXPIRING, 'insurance_policy',
+                                      policy.id, policy.farmer_id)
+            return 'reminded'
+
+        if event_type == PolicyEventType.EXPIRY:
+            if _status_name(policy.status) != PolicyStatus.ACTIVE.name or policy.end_date >= today:
+                return 'skipped'
+            policy.status = PolicyStatus.EXPIRED
+            alert_service.resolve_alert(connection, AlertType.POLICY_EXPIRING, 'insurance_policy', policy.id)
+            return 'expired'
+
+        unpaid = policy.payment_status != 'paid' and policy.premium_balance() > 0
+
+        if event_type == PolicyEventType.PREMIUM_REMINDER:
+            if not unpaid:
+                return 'skipped'
+            alert_service.raise_alert(connection, AlertType.PREMIUM_DUE, 'insurance_policy',
+                                      policy.id, policy.farmer_id)
+            return 'reminded'
+
+        if event_type == PolicyEventType.PREMIUM_OVERDUE:
+            if not unpaid or not policy.next_premium_due or policy.next_premium_due >= today:
+                return 'skipped'
+            policy.payment_status = 'overdue'
+            alert_service.resolve_alert(connection, AlertType.PREMIUM_DUE, 'insurance_policy', policy.id)
+            alert_service.raise_alert(connection, AlertType.PREMIUM_OVERDUE, 'insurance_policy',
+                                      policy.id, policy.farmer_id)
+            return 'overdue'
+
+        return 'skipped'
+
+    def run_due(self, now: Optional[datetime] = None, batch_size: int = 500) -> Dict[str, int]:
+        """
+        Fire every event due at ``now``, earliest first.
+
+        Returns:
+            dict: Number of events per outcome
+        """
+        now = now or datetime.utcnow()
+        outcomes: Dict[str, int] = {}
+
+        t = self.table
+        while True:
+            due = db.session.execute(
+                db.select(t.c.id, t.c.policy_id, t.c.event_type).where(
+                    t.c.fired_at.is_(None),
+                    t.c.fire_at <= now
+                ).order_by(t.c.fire_at, t.c.id).limit(batch_size)
+            ).all()
+            if not due:
+                break
+
+            # Mark the batch fired first, so rescheduling triggered by the
+            # transitions below keeps these events instead of dropping them
+            db.session.execute(
+                t.update().where(t.c.id.in_([row.id for row in due])).values(fired_at=now)
+            )
+
+            policies = {
+                policy.id: policy for policy in InsurancePolicy.query.filter(
+                    InsurancePolicy.id.in_({row.policy_id for row in due})
+                )
+            }
+            results = []
+            for row in due:
+                outcome = self._fire(row.event_type, policies.get(row.policy_id), now.date())
+                results.append({'b_id': row.id, 'b_outcome': outcome})
+                outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+            db.session.execute(
+                t.update().where(t.c.id == bindparam('b_id')).values(outcome=bindparam('b_outcome')),
+                results
+            )
+            db.session.commit()
+
+        if outcomes:
+            logger.info(f"Policy scheduler fired events: {outcomes}")
+        return outcomes
+
+    def run_forever(self, max_sleep: float = 60.0):
+        """Fire events as they come due, sleeping until the next one."""
+        while True:
+            self.run_due()
+            next_due = self.next_due()
+            db.session.remove()
+            delay = max_sleep
+            if next_due is not None:
+                delay = min(max_sleep, max((next_due - datetime.utcnow()).total_seconds(), 0.0))
+            time.sleep(delay)
+
+    def rebuild(self, batch_size: int = 1000) -> int:
+        """
+        Schedule events for every policy (initial backfill or reconciliation).
+
+        Returns:
+            int: Number of policies scheduled
+        """
+        columns = [getattr(InsurancePolicy, field) for field in SCHEDULE_FIELDS]
+        query = db.session.query(InsurancePolicy.id, *columns).yield_per(batch_size)
+        rows = [(row[0], dict(zip(SCHEDULE_FIELDS, row[1:]))) for row in query]
+
+        connection = db.session.connection()
+        for policy_id, values in rows:
+            self.schedule(connection, policy_id, values)
+        db.session.commit()
+
+        logger.info(f"Scheduled events for {len(rows)} insurance policies")
+        return len(rows)
+
+
+policy_scheduler = PolicyScheduler()
+
+
+def _policy_values(target: InsurancePolicy) -> Dict:
+    return {field: getattr(target, field) for field in SCHEDULE_FIELDS}
+
+
+def _after_policy_write(mapper, connection, target):
+    policy_scheduler.schedule(connection, target.id, _policy_values(target))
+
+    # Settled or inactive policies no longer need their reminders
+    if target.payment_status == 'paid':
+        for alert_type in (AlertType.PREMIUM_DUE, AlertType.PREMIUM_OVERDUE):
+            alert_service.resolve_alert(connection, alert_type, 'insurance_policy', target.id)
+    if _status_name(target.status) != PolicyStatus.ACTIVE.name:
+        alert_service.resolve_alert(connection, AlertType.POLICY_EXPIRING, 'insurance_policy', target.id)
+
+
+def _before_policy_delete(mapper, connection, target):
+    policy_scheduler.unschedule(connection, target.id)
+
+
+_LISTENERS = (
+    ('after_insert', _after_policy_write),
+    ('after_update', _after_policy_write),
+    ('before_delete', _before_policy_delete),
+)
+
+
+def register_scheduler_listeners():
+    """Keep scheduled policy events in line with policy writes."""
+    for identifier, listener in _LISTENERS:
+        if not event.contains(InsurancePolicy, identifier, listener):
+            event.listen(InsurancePolicy, identifier, listener)
@@ -0,0 +1,410 @@
+"""
+Portfolio exposure cube for Talazo AgriFinance Platform.
+
+Exposure totals (count, requested, approved, disbursed and outstanding
+amounts) are kept in ``portfolio_exposures``, one row per cell of
+
+    source × district × province × primary_crop × risk_level × status
+
+so report slices are a GROUP BY over a small table instead of over joined
+loan, credit and farmer tables.
+
+- Loan application and credit history mapper events move each row's
+  contribution between cells as it changes. Cells seen for the first time
+  are created by the same upsert that adjusts existing ones.
+- Farmer events move all of a farmer's contributions when their district,
+  province or primary crop changes.
+- ``rebuild`` recomputes the cube from scratch for reconciliation (e.g.
+  after bulk updates that bypass the ORM).
+
+Risk bands are the application's ``risk_assessment`` for loan applications,
+and the entry's ``CreditHistory.risk_score`` (>= 70 LOW, >= 50 MEDIUM, else
+HIGH) for credit history.
+
+Outstanding amounts are the credit history entries' recorded balances. A
+loan application's balance amortizes with time, which no write signals, so
+disbursed applications count towards ``disbursed_amount`` and their
+scheduled balances are read from the repayment schedule book.
+"""
+
+import logging
+import weakref
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event, inspect
+
+from app.core.extensions import db
+from app.models import Farmer, CreditHistory, LoanApplication, PortfolioExposure
+from app.models.credit_history import PaymentStatus
+from app.models.loan_application import ApplicationStatus
+from app.models.portfolio_exposure import DIMENSIONS, MEASURES
+from app.utils.upsert import upsert
+
+logger = logging.getLogger(__name__)
+
+SOURCE_LOAN_APPLICATION = 'loan_application'
+SOURCE_CREDIT_HISTORY = 'credit_history'
+
+FARMER_DIMENSION_FIELDS = ('district', 'province', 'primary_crop')
+LOAN_FIELDS = ('farmer_id', 'status', 'risk_assessment', 'requested_amount', 'approved_amount')
+CREDIT_FIELDS = (
+    'farmer_id', 'payment_status', 'days_late', 'loan_amount', 'amount_paid',
+    'remaining_balance', 'is_settled'
+)
+
+Cell = Tuple[str, str, str, str, str, str]
+Measures = Tuple[int, float, float, float, float]
+
+
+def _enum_name(value, enum_cls) -> str:
+    """Name of an Enum column value that may be a member, its name or its value."""
+    if value is None:
+        return ''
+    if isinstance(value, enum_cls):
+        return value.name
+    for member in enum_cls:
+        if value in (member.name, member.value):
+            return member.name
+    return str(value)
+
+
+def _dimension(value) -> str:
+    return value if value is not None else ''
+
+
+def loan_cell(values: Dict, dims: Dict) -> Tuple[Cell, Measures]:
+    """Cube cell and measures for a loan application in the given state."""
+    status = _enum_name(values.get('status'), ApplicationStatus)
+    approved = 0.0
+    disbursed = 0.0
+    if status in (ApplicationStatus.APPROVED.name, ApplicationStatus.DISBURSED.name):
+        approved = values.get('approved_amount') or 0.0
+    if status == ApplicationStatus.DISBURSED.name:
+        disbursed = approved
+
+    cell = (
+        SOURCE_LOAN_APPLICATION,
+        _dimension(dims.get('district')),
+        _dimension(dims.get('province')),
+        _dimension(dims.get('primary_crop')),
+        _dimension(values.get('risk_assessment')),
+        status
+    )
+    return cell, (1, values.get('requested_amount') or 0.0, approved, disbursed, 0.0)
+
+
+def credit_risk_band(values: Dict) -> str:
+    """LOW/MEDIUM/HIGH band of a credit entry's risk score (higher is better)."""
+    status = _enum_name(values.get('payment_status'), PaymentStatus)
+    score = CreditHistory.risk_score(
+        PaymentStatus[status] if status in PaymentStatus.__members__ else None,
+        values.get('days_late'),
+        values.get('loan_amount'),
+        values.get('amount_paid')
+    )
+    if score >= 70:
+        return 'LOW'
+    if score >= 50:
+        return 'MEDIUM'
+    return 'HIGH'
+
+
+def credit_cell(values: Dict, dims: Dict) -> Tuple[Cell, Measures]:
+    """Cube cell and measures for a credit history entry in the given state."""
+    amount = values.get('loan_amount') or 0.0
+    if values.get('is_settled'):
+        outstanding = 0.0
+    elif values.get('remaining_balance') is not None:
+        outstanding = values['remaining_balance']
+    else:
+        outstanding = max(amount - (values.get('amount_paid') or 0.0), 0.0)
+
+    cell = (
+        SOURCE_CREDIT_HISTORY,
+        _dimension(dims.get('district')),
+        _dimension(dims.get('province')),
+        _dimension(dims.get('primary_crop')),
+        credit_risk_band(values),
+        _enum_name(values.get('payment_status'), PaymentStatus)
+    )
+    return cell, (1, amount, amount, amount, outstanding)
+
+
+def accumulate(deltas: Dict[Cell, List[float]], cell: Cell, measures: Measures, sign: int):
+    """Add (sign=1) or remove (sign=-1) one row's measures from ``deltas``."""
+    totals = deltas.setdefault(cell, [0] + [0.0] * (len(MEASURES) - 1))
+    for i, value in enumerate(measures):
+        totals[i] += sign * value
+
+
+class PortfolioExposureService:
+    """Maintain and slice the portfolio exposure cube."""
+
+    def __init__(self):
+        self.table = PortfolioExposure.__table__
+        # Engines whose cube is known to be built
+        self._initialized = weakref.WeakSet()
+
+    def _is_initialized(self, connection) -> bool:
+        """Whether the cube was built; only the positive answer is cached."""
+        if connection.engine in self._initialized:
+            return True
+        t = self.table
+        initialized = connection.execute(
+            db.select(t.c.id).where(t.c.source == '')
+        ).first() is not None
+        if initialized:
+            self._initialized.add(connection.engine)
+        return initialized
+
+    def apply(self, connection, deltas: Dict[Cell, List[float]]):
+        """
+        Add per-cell deltas to the cube.
+
+        Measures are adjusted with relative UPDATEs so concurrent writers do
+        not overwrite each other; a cell seen for the first time is created
+        by the same upsert.
+        """
+        # Until the first rebuild there is no baseline to adjust
+        if not deltas or not self._is_initialized(connection):
+            return
+
+        t = self.table
+        now = datetime.utcnow()
+        for cell, measures in deltas.items():
+            if not any(measures):
+                continue
+
+            updates = {name: t.c[name] + value for name, value in zip(MEASURES, measures)}
+            updates['updated_at'] = now
+            if measures[0] > 0:
+                upsert(connection, t, dict(zip(DIMENSIONS, cell), **dict(zip(MEASURES, measures)),
+                                           updated_at=now),
+                       index_elements=list(DIMENSIONS), set_=updates)
+            else:
+                # Rows only leave cells that already exist
+                where = db.and_(*(t.c[name] == value for name, value in zip(DIMENSIONS, cell)))
+                connection.execute(t.update().where(where).values(**updates))
+
+    def apply_loan_transitions(self, connection, transitions: Iterable[Tuple[Dict, Dict, Dict]]):
+        """
+        Move loan applications between cells after a bulk status change.
+
+        Args:
+            transitions: (farmer dimensions, old values, new values) per application
+        """
+        deltas: Dict[Cell, List[float]] = {}
+        for dims, old, new in transitions:
+            accumulate(deltas, *loan_cell(old, dims), -1)
+            accumulate(deltas, *loan_cell(new, dims), 1)
+        self.apply(connection, deltas)
+
+    def rebuild(self, batch_size: int = 1000) -> int:
+        """
+        Recompute the cube from loan applications and credit history.
+
+        Returns:
+            int: Number of cube cells written
+        """
+        deltas: Dict[Cell, List[float]] = {}
+        farmer_columns = [getattr(Farmer, field) for field in FARMER_DIMENSION_FIELDS]
+
+        for source_model, fields, cell_for in (
+            (LoanApplication, LOAN_FIELDS, loan_cell),
+            (CreditHistory, CREDIT_FIELDS, credit_cell)
+        ):
+            query = db.session.query(
+                *[getattr(source_model, field) for field in fields], *farmer_columns
+            ).outerjoin(Farmer, Farmer.id == source_model.farmer_id).yield_per(batch_size)
+
+            for row in query:
+                values = dict(zip(fields, row[:len(fields)]))
+                dims = dict(zip(FARMER_DIMENSION_FIELDS, row[len(fields):]))
+                accumulate(deltas, *cell_for(values, dims), 1)
+
+        now = datetime.utcnow()
+        rows = [
+            dict(zip(DIMENSIONS, cell), **dict(zip(MEASURES, measures)), updated_at=now)
+            for cell, measures in deltas.items()
+        ]
+        # Marker row: the cube has a baseline that events can adjust
+        rows.append(dict(zip(DIMENSIONS, ('',) * len(DIMENSIONS)),
+                         **dict(zip(MEASURES, [0] + [0.0] * (len(MEASURES) - 1))), updated_at=now))
+
+        db.session.execute(self.table.delete())
+        db.session.execute(self.table.insert(), rows)
+        db.session.commit()
+
+        logger.info(f"Rebuilt portfolio exposure cube ({len(rows) - 1} cells)")
+        return len(rows) - 1
+
+    def slice(self, group_by: Optional[List[str]] = None, filters: Optional[Dict[str, str]] = None) -> List[Dict]:
+        """
+        Aggregate the cube over the requested dimensions.
+
+        The cube is built on first use if it has never been populated.
+
+        Args:
+            group_by (list): Dimension names to group by (empty for grand totals)
+            filters (dict): Exact-match dimension filters
+
+        Returns:
+            list: One dict per group with the dimensions and summed measures
+        """
+        group_by = group_by or []
+        filters = filters or {}
+        unknown = [name for name in list(group_by) + list(filters) if name not in DIMENSIONS]
+        if unknown:
+            raise ValueError(f"Unknown exposure dimensions: {', '.join(unknown)}")
+
+        if not self._is_initialized(db.session.connection()):
+            self.rebuild()
+
+        t = self.table
+        group_columns = [t.c[name] for name in group_by]
+        query = db.select(
+            *group_columns,
+            *(db.func.coalesce(db.func.sum(t.c[name]), 0).label(name) for name in MEASURES)
+        ).where(t.c.source != '', t.c.count > 0)
+        for name, value in filters.items():
+            query = query.where(t.c[name] == value)
+        if group_columns:
+            query = query.group_by(*group_columns).order_by(*group_columns)
+
+        return [
+            {
+                **{name: row._mapping[name] for name in group_by},
+                'count': int(row.count),
+                'requested_amount': round(float(row.requested_amount), 2),
+                'approved_amount': round(float(row.approved_amount), 2),
+                'disbursed_amount': round(float(row.disbursed_amount), 2),
+                'outstanding_amount': round(float(row.outstanding_amount), 2)
+            }
+            for row in db.session.execute(query)
+        ]
+
+
+portfolio_exposure = PortfolioExposureService()
+
+
+def _farmer_dimensions(connection, farmer_id: int) -> Dict:
+    row = connection.execute(
+        db.select(Farmer.district, Farmer.province, Farmer.primary_crop).where(Farmer.id == farmer_id)
+    ).first()
+    return dict(zip(FARMER_DIMENSION_FIELDS, row)) if row else {}
+
+
+def _current_values(target, fields) -> Dict:
+    return {field: getattr(target, field) for field in fields}
+
+
+def _previous_values(target, fields) -> Dict:
+    state = inspect(target)
+    values = {}
+    for field in fields:
+        history = state.attrs[field].history
+        values[field] = history.deleted[0] if history.deleted else getattr(target, field)
+    return values
+
+
+def _row_change(connection, target, fields, cell_for, old_sign: int, new_sign: int):
+    old = _previous_values(target, fields) if old_sign else None
+    new = _current_values(target, fields) if new_sign else None
+    # Updates that leave every tracked field alone don't move the row
+    if old is not None and old == new:
+        return
+
+    dims = {}
+    deltas: Dict[Cell, List[float]] = {}
+    for values, sign in ((old, old_sign), (new, new_sign)):
+        if values is None:
+            continue
+        farmer_id = values['farmer_id']
+        if farmer_id not in dims:
+            dims[farmer_id] = _farmer_dimensions(connection, farmer_id)
+        accumulate(deltas, *cell_for(values, dims[farmer_id]), sign)
+    portfolio_exposure.apply(connection, deltas)
+
+
+def _after_loan_insert(mapper, connection, target):
+    _row_change(connection, target, LOAN_FIELDS, loan_cell, 0, 1)
+
+
+def _after_loan_update(mapper, connection, target):
+    _row_change(connection, target, LOAN_FIELDS, loan_cell, -1, 1)
+
+
+def _after_loan_delete(mapper, connection, target):
+    _row_change(connection, target, LOAN_FIELDS, loan_cell, -1, 0)
+
+
+def _after_credit_insert(mapper, connection, target):
+    _row_change(connection, target, CREDIT_FIELDS, credit_cell, 0, 1)
+
+
+def _after_credit_update(mapper, connection, target):
+    _row_change(connection, target, CREDIT_FIELDS, credit_cell, -1, 1)
+
+
+def _after_credit_delete(mapper, connection, target):
+    _row_change(connection, target, CREDIT_FIELDS, credit_cell, -1, 0)
+
+
+def _after_farmer_update(mapper, connection, target):
+    old_dims = _previous_values(target, FARMER_DIMENSION_FIELDS)
+    new_dims = _current_values(target, FARMER_DIMENSION_FIELDS)
+    if old_dims == new_dims:
+        return
+
+    deltas: Dict[Cell, List[float]] = {}
+    for source_model, fields, cell_for in (
+        (LoanApplication, LOAN_FIELDS, loan_cell),
+        (CreditHistory, CREDIT_FIELDS, credit_cell)
+    ):
+        rows = connection.execute(
+            db.select(*[getattr(source_model, field) for field in fields]).where(
+                source_model.farmer_id == target.id
+            )
+        )
+        for row in rows:
+            values = dict(zip(fields, row))
+            accumulate(deltas, *cell_for(values, old_dims), -1)
+            accumulate(deltas, *cell_for(values, new_dims), 1)
+    portfolio_exposure.apply(connection, deltas)
+
+
+def _track_previous_value(target, value, oldvalue, initiator):
+    """No-op set listener; registering it with active_history loads old values."""
+    return value
+
+
+_LISTENERS = (
+    (LoanApplication, 'after_insert', _after_loan_insert),
+    (LoanApplication, 'after_update', _after_loan_update),
+    (LoanApplication, 'after_delete', _after_loan_delete),
+    (CreditHistory, 'after_insert', _after_credit_insert),
+    (CreditHistory, 'after_update', _after_credit_update),
+    (CreditHistory, 'after_delete', _after_credit_delete),
+    (Farmer, 'after_update', _after_farmer_update),
+)
+
+_TRACKED_ATTRIBUTES = (
+    (LoanApplication, LOAN_FIELDS),
+    (CreditHistory, CREDIT_FIELDS),
+    (Farmer, FARMER_DIMENSION_FIELDS),
+)
+
+
+def register_exposure_listeners():
+    """Keep the exposure cube in sync with loan, credit and farmer writes."""
+    for model, identifier, listener in _LISTENERS:
+        if not event.contains(model, identifier, listener):
+            event.listen(model, identifier, listener)
+
+    for model, fields in _TRACKED_ATTRIBUTES:
+        for field in fields:
+            attribute = getattr(model, field)
+            if not event.contains(attribute, 'set', _track_previous_value):
+                event.listen(attribute, 'set', _track_previous_value,
+                             retval=True, active_history=True)
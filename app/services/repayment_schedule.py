@@ -0,0 +1,452 @@
+"""
+Vectorized repayment schedule engine for Talazo AgriFinance Platform.
+
+Amortization schedules for the whole loan book are computed at once with
+NumPy broadcasting: loans are rows, repayment periods are columns. The
+results are kept in a ``RepaymentScheduleBook`` of per-loan period arrays
+plus each loan's start month, covering only loans still repaying. Portfolio
+cashflow forecasts and outstanding balances map periods onto the requested
+calendar months with array operations instead of per-loan Python loops.
+
+The book is persisted under the instance folder and invalidated when a
+transaction approving, disbursing or changing a repaying loan application
+commits; the next read rebuilds it.
+
+Loans come from two sources:
+
+- approved or disbursed ``LoanApplication`` rows (approved amount, rate and
+  term, starting at disbursement or decision date)
+- active, unsettled ``CreditHistory`` entries (loan amount, interest rate and
+  term, starting at the loan date)
+"""
+
+import logging
+import os
+from datetime import date, datetime
+from typing import Dict, Optional
+
+import numpy as np
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+
+from app.core.extensions import db
+from app.models import LoanApplication, CreditHistory
+from app.models.loan_application import ApplicationStatus
+
+logger = logging.getLogger(__name__)
+
+# Repayments per year for each supported frequency; all divide 12 so every
+# period lands on a calendar month
+PERIODS_PER_YEAR = {
+    'monthly': 12,
+    'quarterly': 4,
+    'semi_annual': 2,
+    'annual': 1
+}
+
+SOURCE_LOAN_APPLICATION = 0
+SOURCE_CREDIT_HISTORY = 1
+SOURCE_NAMES = {
+    SOURCE_LOAN_APPLICATION: 'loan_application',
+    SOURCE_CREDIT_HISTORY: 'credit_history'
+}
+
+BOOK_FILENAME = 'repayment_schedules.npz'
+
+
+def month_index(value) -> int:
+    """Months since year 0 for a date or datetime."""
+    return value.year * 12 + value.month - 1
+
+
+def month_start(index: int) -> date:
+    """First day of the month with the given ``month_index``."""
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def period_count(term_months, periods_per_year=12) -> np.ndarray:
+    """Number of repayment periods for each loan term (at least one)."""
+    term_months = np.asarray(term_months, dtype=np.float64)
+    return np.maximum(np.ceil(term_months * np.asarray(periods_per_year) / 12), 1).astype(np.int64)
+
+
+def amortize(principal, annual_rate, term_months, periods_per_year=12) -> Dict[str, np.ndarray]:
+    """
+    Compute level-payment amortization schedules for many loans at once.
+
+    Args:
+        principal (array-like): Loan principals
+        annual_rate (array-like): Annual interest rates in percent
+        term_months (array-like): Loan terms in months
+        periods_per_year (array-like or int): Repayments per year
+
+    Returns:
+        dict: ``n_periods`` (n,), ``installment`` (n,) and (n, max_periods)
+        matrices ``payment``, ``interest``, ``principal`` and ``balance``
+        (balance after each period). Periods past a loan's term are zero.
+    """
+    principal = np.asarray(principal, dtype=np.float64)
+    annual_rate = np.nan_to_num(np.asarray(annual_rate, dtype=np.float64))
+    periods_per_year = np.broadcast_to(
+        np.asarray(periods_per_year, dtype=np.float64), principal.shape
+    )
+
+    n_periods = period_count(term_months, periods_per_year)
+    max_periods = int(n_periods.max()) if n_periods.size else 0
+
+    r = (annual_rate / 100 / periods_per_year)[:, None]
+    p = principal[:, None]
+    n = n_periods[:, None]
+    k = np.arange(1, max_periods + 1)[None, :]
+    active = k <= n
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        growth = (1 + r) ** k
+        installment = np.where(r > 0, p * r / (1 - (1 + r) ** -n), p / n)
+        balance = np.where(r > 0, p * growth - installment * (growth - 1) / r, p - installment * k)
+
+    # The final period clears the loan exactly, whatever the rounding
+    balance = np.where(k < n, np.maximum(balance, 0.0), 0.0)
+    opening = np.hstack([p, balance[:, :-1]])
+    interest = np.where(active, opening * r, 0.0)
+    principal_paid = np.where(active, opening - balance, 0.0)
+
+    return {
+        'n_periods': n_periods,
+        'installment': installment[:, 0],
+        'payment': interest + principal_paid,
+        'interest': interest,
+        'principal': principal_paid,
+        'balance': balance
+    }
+
+
+class RepaymentScheduleBook:
+    """
+    Per-loan repayment schedules, one array row per loan.
+
+    Column ``k - 1`` of the period matrices is a loan's ``k``-th repayment,
+    due in calendar month ``start_month + k * step``; ``balance`` holds the
+    outstanding principal after it. Matrices are loans x longest term, so
+    their size does not grow with the age of the book, and calendar months
+    are resolved when a range is read.
+    """
+
+    FIELDS = ('sources', 'loan_ids', 'farmer_ids', 'principal', 'start_month',
+              'n_periods', 'payments', 'interest', 'balance')
+
+    def __init__(self, sources, loan_ids, farmer_ids, principal, start_month, n_periods,
+                 payments, interest, balance, step: int = 1, built_at: Optional[datetime] = None):
+        self.sources = sources
+        self.loan_ids = loan_ids
+        self.farmer_ids = farmer_ids
+        self.principal = principal
+        self.start_month = start_month
+        self.n_periods = n_periods
+        self.payments = payments
+        self.interest = interest
+        self.balance = balance
+        self.step = step
+        self.built_at = built_at or datetime.utcnow()
+
+    def __len__(self):
+        return len(self.loan_ids)
+
+    @property
+    def horizon(self) -> int:
+        """Months from the earliest loan start to the last scheduled repayment."""
+        if not len(self):
+            return 0
+        return int((self.start_month + self.n_periods * self.step).max() - self.start_month.min()) + 1
+
+    def _mask(self, source: Optional[str]) -> np.ndarray:
+        if source is None:
+            return np.ones(len(self), dtype=bool)
+        codes = [code for code, name in SOURCE_NAMES.items() if name == source]
+        return self.sources == codes[0] if codes else np.zeros(len(self), dtype=bool)
+
+    def _balances(self, mask: np.ndarray, months: np.ndarray) -> np.ndarray:
+        """Outstanding principal of the masked loans at the end of each month (loans x months)."""
+        start = self.start_month[mask][:, None]
+        n = self.n_periods[mask][:, None]
+        elapsed = np.clip((months[None, :] - start) // self.step, 0, n)
+        after_period = np.take_along_axis(self.balance[mask], np.maximum(elapsed - 1, 0), axis=1) \
+            if self.balance.shape[1] else np.zeros(elapsed.shape)
+        balance = np.where(elapsed > 0, after_period, self.principal[mask][:, None])
+        return np.where(months[None, :] >= start, balance, 0.0)
+
+    def outstanding(self, as_of=None, source: Optional[str] = None) -> np.ndarray:
+        """Scheduled outstanding principal per loan at the end of ``as_of``'s month."""
+        month = np.array([month_index(as_of or date.today())])
+        return self._balances(self._mask(source), month)[:, 0]
+
+    def project_cashflows(self, start=None, months: int = 12, source: Optional[str] = None) -> Dict:
+        """
+        Expected book-wide repayments for the months from ``start``.
+
+        Returns:
+            dict: Per-month totals (payment, interest, principal, outstanding)
+            and the horizon totals
+        """
+        first = month_index(start or date.today())
+        mask = self._mask(source)
+
+        # Month of each scheduled period relative to ``first``
+        k = np.arange(1, self.payments.shape[1] + 1)[None, :]
+        columns = self.start_month[mask][:, None] + k * self.step - first
+        due = (k <= self.n_periods[mask][:, None]) & (columns >= 0) & (columns < months)
+
+        def monthly_totals(matrix):
+            return np.bincount(columns[due], weights=matrix[mask][due], minlength=months)
+
+        payments = monthly_totals(self.payments)
+        interest = monthly_totals(self.interest)
+        outstanding = self._balances(mask, first + np.arange(months)).sum(axis=0)
+
+        return {
+            'months': [
+                {
+                    'month': month_start(first + i).isoformat(),
+                    'expected_payment': round(float(payments[i]), 2),
+                    'expected_interest': round(float(interest[i]), 2),
+                    'expected_principal': round(float(payments[i] - interest[i]), 2),
+                    'scheduled_outstanding': round(float(outstanding[i]), 2)
+                }
+                for i in range(months)
+            ],
+            'totals': {
+                'expected_payment': round(float(payments.sum()), 2),
+                'expected_interest': round(float(interest.sum()), 2),
+                'expected_principal': round(float(payments.sum() - interest.sum()), 2)
+            },
+            'loan_count': int(mask.sum()),
+            'built_at': self.built_at.isoformat()
+        }
+
+    def save(self, path: str):
+        """Write the book to a compressed ``.npz`` file, replacing any previous one atomically."""
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(
+                f,
+                step=np.array(self.step),
+                built_at=np.array(self.built_at.isoformat()),
+                **{field: getattr(self, field) for field in self.FIELDS}
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'RepaymentScheduleBook':
+        """Read a book written by ``save``."""
+        with np.load(path) as data:
+            return cls(
+                step=int(data['step']),
+                built_at=datetime.fromisoformat(str(data['built_at'])),
+                **{field: data[field] for field in cls.FIELDS}
+            )
+
+
+class RepaymentScheduleEngine:
+    """Build repayment schedule books from loan applications and credit history."""
+
+    def __init__(self, default_frequency: str = 'monthly'):
+        self.default_frequency = default_frequency
+
+    def _loan_application_rows(self):
+        return db.session.query(
+            LoanApplication.id,
+            LoanApplication.farmer_id,
+            LoanApplication.approved_amount,
+            LoanApplication.approved_interest_rate,
+            LoanApplication.approved_term_months,
+            db.func.coalesce(
+                LoanApplication.disbursement_date,
+                LoanApplication.decision_date,
+                LoanApplication.created_at
+            )
+        ).filter(
+            LoanApplication.status.in_([ApplicationStatus.APPROVED, ApplicationStatus.DISBURSED]),
+            LoanApplication.approved_amount > 0,
+            LoanApplication.approved_term_months > 0
+        ).all()
+
+    def _credit_history_rows(self):
+        rows = db.session.query(
+            CreditHistory.id,
+            CreditHistory.farmer_id,
+            CreditHistory.loan_amount,
+            CreditHistory.interest_rate,
+            CreditHistory.loan_term_months,
+            CreditHistory.loan_date,
+            CreditHistory.due_date
+        ).filter(
+            CreditHistory.is_active == True,
+            CreditHistory.is_settled == False,
+            CreditHistory.loan_amount > 0
+        ).all()
+
+        # Derive missing terms from the due date
+        result = []
+        for loan_id, farmer_id, amount, rate, term, loan_date, due_date in rows:
+            if not term and due_date:
+                term = month_index(due_date) - month_index(loan_date)
+            if term and term > 0:
+                result.append((loan_id, farmer_id, amount, rate, term, loan_date))
+        return result
+
+    def build_book(self, as_of=None) -> RepaymentScheduleBook:
+        """
+        Compute schedules for every loan still repaying at ``as_of`` (default today).
+
+        Loans whose last repayment fell before ``as_of``'s month are left out.
+        """
+        rows = [(SOURCE_LOAN_APPLICATION,) + tuple(row) for row in self._loan_application_rows()]
+        rows += [(SOURCE_CREDIT_HISTORY,) + tuple(row) for row in self._credit_history_rows()]
+
+        periods_per_year = PERIODS_PER_YEAR[self.default_frequency]
+        step = 12 // periods_per_year
+
+        if rows:
+            term = np.array([row[5] for row in rows], dtype=np.float64)
+            start_month = np.array([month_index(row[6]) for row in rows], dtype=np.int64)
+            final_month = start_month + period_count(term, periods_per_year) * step
+            rows = [row for row, repaying in
+                    zip(rows, final_month >= month_index(as_of or date.today())) if repaying]
+
+        if not rows:
+            empty = np.zeros((0, 0))
+            return RepaymentScheduleBook(
+                np.zeros(0, dtype=np.int8), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64),
+                np.zeros(0), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64),
+                empty, empty, empty, step=step
+            )
+
+        sources = np.array([row[0] for row in rows], dtype=np.int8)
+        loan_ids = np.array([row[1] for row in rows], dtype=np.int64)
+        farmer_ids = np.array([row[2] for row in rows], dtype=np.int64)
+        principal = np.array([row[3] for row in rows], dtype=np.float64)
+        rate = np.array([np.nan if row[4] is None else row[4] for row in rows], dtype=np.float64)
+        term = np.array([row[5] for row in rows], dtype=np.float64)
+        start_month = np.array([month_index(row[6]) for row in rows], dtype=np.int64)
+
+        schedule = amortize(principal, rate, term, periods_per_year)
+        book = RepaymentScheduleBook(
+            sources, loan_ids, farmer_ids, principal, start_month, schedule['n_periods'],
+            schedule['payment'], schedule['interest'], schedule['balance'], step=step
+        )
+        logger.info(f"Built repayment schedules for {len(book)} loans of up to "
+                    f"{schedule['payment'].shape[1]} periods")
+        return book
+
+
+def _book_path() -> str:
+    return os.path.join(current_app.instance_path, BOOK_FILENAME)
+
+
+def _book_mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def rebuild_schedule_book() -> RepaymentScheduleBook:
+    """Recompute the schedule book, persist it and make it current."""
+    book = RepaymentScheduleEngine().build_book()
+    os.makedirs(current_app.instance_path, exist_ok=True)
+    path = _book_path()
+    book.save(path)
+    current_app.extensions['repayment_schedule_book'] = (book, _book_mtime(path))
+    return book
+
+
+def get_schedule_book() -> RepaymentScheduleBook:
+    """
+    Return the current schedule book, loading or building it on first use.
+
+    The book file is shared by all workers: a worker reloads its copy when
+    another one rebuilt the file, and rebuilds when it was invalidated.
+    """
+    path = _book_path()
+    mtime = _book_mtime(path)
+    if mtime is None:
+        return rebuild_schedule_book()
+
+    cached = current_app.extensions.get('repayment_schedule_book')
+    if cached is None or cached[1] != mtime:
+        cached = (RepaymentScheduleBook.load(path), mtime)
+        current_app.extensions['repayment_schedule_book'] = cached
+    return cached[0]
+
+
+def invalidate_schedule_book():
+    """Discard the schedule book so the next read rebuilds it."""
+    current_app.extensions.pop('repayment_schedule_book', None)
+    try:
+        os.remove(_book_path())
+    except FileNotFoundError:
+        pass
+
+
+# Loan application writes that change the book; the book is invalidated once
+# the transaction commits
+SCHEDULE_FIELDS = ('status', 'approved_amount', 'approved_interest_rate',
+                   'approved_term_months', 'disbursement_date', 'decision_date')
+STALE_FLAG = 'repayment_schedule_stale'
+
+_REPAYING_STATUSES = {
+    value
+    for status in (ApplicationStatus.APPROVED, ApplicationStatus.DISBURSED)
+    for value in (status, status.name, status.value)
+}
+
+
+def mark_schedule_book_stale(session):
+    """Invalidate the schedule book when ``session`` commits (for writes that bypass mapper events)."""
+    session.info[STALE_FLAG] = True
+
+
+def _changes_schedule(target: LoanApplication) -> bool:
+    state = inspect(target)
+    status = state.attrs.status.history
+    if any(value in _REPAYING_STATUSES for value in (*status.added, *status.deleted)):
+        return True
+    return target.status in _REPAYING_STATUSES and any(
+        state.attrs[field].history.has_changes() for field in SCHEDULE_FIELDS
+    )
+
+
+def _after_loan_write(mapper, connection, target):
+    if _changes_schedule(target):
+        mark_schedule_book_stale(object_session(target))
+
+
+def _after_loan_delete(mapper, connection, target):
+    if target.status in _REPAYING_STATUSES:
+        mark_schedule_book_stale(object_session(target))
+
+
+def _after_commit(session):
+    if session.info.pop(STALE_FLAG, False) and has_app_context():
+        invalidate_schedule_book()
+
+
+def _after_rollback(session):
+    session.info.pop(STALE_FLAG, None)
+
+
+_LISTENERS = (
+    (LoanApplication, 'after_insert', _after_loan_write),
+    (LoanApplication, 'after_update', _after_loan_write),
+    (LoanApplication, 'after_delete', _after_loan_delete),
+    (Session, 'after_commit', _after_commit),
+    (Session, 'after_rollback', _after_rollback),
+)
+
+
+def register_schedule_listeners():
+    """Invalidate the schedule book when approved or disbursed loans change."""
+    for target, identifier, listener in _LISTENERS:
+        if not event.contains(target, identifier, listener):
+            event.listen(target, identifier, listener)
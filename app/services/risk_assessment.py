@@ -5,15 +5,102 @@ Risk Assessment Engine for Talazo AgriFinance Platform.
 
 import logging
 from datetime import datetime, timedelta
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# Zimbabwe province weather risk mapping (simplified)
+PROVINCE_WEATHER_RISKS = {
+    'mashonaland central': 25,
+    'mashonaland east': 30,
+    'mashonaland west': 35,
+    'manicaland': 20,
+    'midlands': 45,
+    'masvingo': 50,
+    'matabeleland north': 60,
+    'matabeleland south': 65,
+    'bulawayo': 55,
+    'harare': 30
+}
+
+# Crop market risk mapping (simplified)
+CROP_MARKET_RISKS = {
+    'maize': 35,
+    'tobacco': 45,
+    'cotton': 50,
+    'wheat': 40,
+    'barley': 45,
+    'soybeans': 30,
+    'groundnuts': 35,
+    'sunflower': 40
+}
+
+
+def _lookup(values, table: Dict[str, float], default: float) -> np.ndarray:
+    """Map an array of names (case-insensitive) through ``table``, once per distinct name."""
+    names = np.array(['' if value is None else str(value).lower() for value in values], dtype=object)
+    if names.size == 0:
+        return np.zeros(0)
+    unique, inverse = np.unique(names, return_inverse=True)
+    mapped = np.array([table.get(name, default) for name in unique], dtype=np.float64)
+    return mapped[inverse]
+
+
+class RiskAssessmentBatch:
+    """
+    Vectorized risk assessment results for many farmers.
+
+    Scores are arrays; recommendation text is generated only when an
+    individual assessment or its recommendations are requested.
+    """
+
+    def __init__(self, engine: 'RiskAssessmentEngine', individual_risks: Dict[str, np.ndarray],
+                 overall_risk: np.ndarray, risk_level: np.ndarray, farmer_ids: Optional[np.ndarray] = None):
+        self.engine = engine
+        self.individual_risks = individual_risks
+        self.overall_risk = overall_risk
+        self.risk_level = risk_level
+        self.farmer_ids = farmer_ids
+        self.assessment_date = datetime.utcnow().isoformat()
+
+    def __len__(self):
+        return len(self.overall_risk)
+
+    def recommendations(self, index: int) -> List[str]:
+        """Recommendations for one farmer in the batch."""
+        scores = {factor: float(values[index]) for factor, values in self.individual_risks.items()}
+        return self.engine._generate_recommendations(scores, str(self.risk_level[index]))
+
+    def __getitem__(self, index: int) -> Dict[str, Any]:
+        """One farmer's assessment in the ``assess_overall_risk`` shape."""
+        result = {
+            'overall_risk_score': round(float(self.overall_risk[index]), 2),
+            'risk_level': str(self.risk_level[index]),
+            'individual_risks': {
+                factor: float(values[index]) for factor, values in self.individual_risks.items()
+            },
+            'risk_factors_weights': self.engine.risk_factors,
+            'assessment_date': self.assessment_date,
+            'recommendations': self.recommendations(index)
+        }
+        if self.farmer_ids is not None:
+            result['farmer_id'] = int(self.farmer_ids[index])
+        return result
+
+    def level_counts(self) -> Dict[str, int]:
+        """Number of farmers per risk level."""
+        levels, counts = np.unique(self.risk_level, return_counts=True)
+        return {str(level): int(count) for level, count in zip(levels, counts)}
+
 
 class RiskAssessmentEngine:
     """Engine for assessing various types of risks in agricultural finance."""
     
-    def __init__(self):
+    def __init__(self, climate=None):
+        # Gridded climate dataset; the configured one is used when not given
+        self.climate = climate
         self.risk_factors = {
             'weather': 0.25,
             'soil_health': 0.30,
@@ -75,26 +162,210 @@ class RiskAssessmentEngine:
                 'error': str(e)
             }
     
+    def _climate_dataset(self):
+        if self.climate is not None:
+            return self.climate
+        from app.services.climate_data import get_climate_dataset
+        return get_climate_dataset()
+    
+    def assess_many(self, columns: Dict[str, Any]) -> RiskAssessmentBatch:
+        """
+        Assess risk for many farmers at once from columnar inputs.
+        
+        Applies the same rules as ``assess_overall_risk`` to whole arrays.
+        
+        Args:
+            columns (dict): Equal-length sequences keyed by
+                province, farm_size_hectares, soil_score (NaN/None when there
+                is no soil sample), crop_type, credit_records, credit_defaults,
+                farming_experience_years and optionally farmer_id, latitude
+                and longitude (for the gridded climate risk layer), or
+                precomputed weather_base_risk / market_risk (feature store)
+                
+        Returns:
+            RiskAssessmentBatch: Score arrays with lazily generated recommendations
+        """
+        def numeric(name, default):
+            values = columns.get(name)
+            if values is None:
+                return None
+            return np.array([default if value is None else value for value in values], dtype=np.float64)
+        
+        provinces = columns.get('province')
+        size = len(provinces) if provinces is not None else len(next(iter(columns.values())))
+        
+        def column(name, default):
+            values = numeric(name, default)
+            return np.full(size, default, dtype=np.float64) if values is None else values
+        
+        # Weather: province base risk, reduced for larger farms
+        farm_size = column('farm_size_hectares', 1)
+        if columns.get('weather_base_risk') is not None:
+            weather = column('weather_base_risk', 40)
+        else:
+            weather = _lookup(provinces if provinces is not None else [None] * size,
+                              PROVINCE_WEATHER_RISKS, 40)
+        climate = self._climate_dataset() if columns.get('latitude') is not None else None
+        if climate is not None:
+            grid_risk = climate.sample('weather_risk', column('latitude', np.nan), column('longitude', np.nan))
+            weather = np.where(np.isnan(grid_risk), weather, grid_risk)
+        weather = weather - np.select([farm_size > 10, farm_size > 5], [5, 2], 0)
+        weather = np.clip(weather, 0, 100)
+        
+        # Soil: inverse of the soil score; high risk without soil data
+        soil_score = column('soil_score', np.nan)
+        soil = np.where(np.isnan(soil_score), 60, np.clip(100 - soil_score, 0, 100))
+        
+        # Market: crop base risk
+        crops = columns.get('crop_type')
+        if columns.get('market_risk') is not None:
+            market = column('market_risk', 45)
+        else:
+            market = _lookup(crops if crops is not None else [None] * size, CROP_MARKET_RISKS, 45)
+        
+        # Credit: default rate over recorded credit entries
+        records = column('credit_records', 0)
+        defaults = column('credit_defaults', 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            credit = np.where(records > 0, np.clip(defaults / records * 80 + 20, 0, 100), 50)
+        
+        # Experience
+        experience_years = column('farming_experience_years', 0)
+        experience = np.select(
+            [experience_years >= 10, experience_years >= 5, experience_years >= 2], [20, 35, 50], 70
+        ).astype(np.float64)
+        
+        individual_risks = {
+            'weather': weather,
+            'soil_health': soil,
+            'market': market,
+            'credit_history': credit,
+            'farming_experience': experience
+        }
+        overall_risk = sum(individual_risks[factor] * weight for factor, weight in self.risk_factors.items())
+        risk_level = np.select(
+            [overall_risk <= 25, overall_risk <= 50, overall_risk <= 75],
+            ['low', 'medium', 'high'], 'very_high'
+        )
+        
+        farmer_ids = columns.get('farmer_id')
+        return RiskAssessmentBatch(
+            self, individual_risks, overall_risk, risk_level,
+            np.asarray(farmer_ids) if farmer_ids is not None else None
+        )
+    
+    def load_farmer_columns(self, farmer_ids: Optional[List[int]] = None,
+                            use_feature_store: bool = True) -> Dict[str, list]:
+        """
+        Load ``assess_many`` inputs for active farmers with one query.
+        
+        Reads the feature store when every requested farmer has materialized
+        features, otherwise computes the inputs live.
+        
+        Args:
+            farmer_ids (list, optional): Restrict to these farmers
+            use_feature_store (bool): Prefer materialized features
+            
+        Returns:
+            dict: Columnar inputs keyed as ``assess_many`` expects
+        """
+        from app.core.extensions import db
+        from app.models import Farmer, SoilSample, CreditHistory
+        from app.models.credit_history import PaymentStatus
+        
+        if use_feature_store:
+            columns = self._load_feature_columns(farmer_ids)
+            if columns is not None:
+                return columns
+        
+        latest_score = db.select(SoilSample.financial_index_score).where(
+            SoilSample.farmer_id == Farmer.id
+        ).order_by(
+            SoilSample.collection_date.desc(), SoilSample.id.desc()
+        ).limit(1).correlate(Farmer).scalar_subquery()
+        has_sample = db.select(SoilSample.id).where(SoilSample.farmer_id == Farmer.id).exists()
+        
+        credit = db.select(
+            CreditHistory.farmer_id.label('farmer_id'),
+            db.func.count(CreditHistory.id).label('records'),
+            db.func.sum(db.case((CreditHistory.payment_status == PaymentStatus.DEFAULTED, 1), else_=0)).label('defaults')
+        ).group_by(CreditHistory.farmer_id).subquery()
+        
+        query = db.session.query(
+            Farmer.id, Farmer.province, Farmer.total_land_area, Farmer.primary_crop,
+            Farmer.farming_experience_years, Farmer.location_lat, Farmer.location_lng,
+            latest_score, has_sample,
+            credit.c.records, credit.c.defaults
+        ).outerjoin(credit, credit.c.farmer_id == Farmer.id).filter(Farmer.is_active == True)
+        if farmer_ids is not None:
+            query = query.filter(Farmer.id.in_(farmer_ids))
+        
+        rows = query.order_by(Farmer.id).all()
+        return {
+            'farmer_id': [row[0] for row in rows],
+            'province': [row[1] for row in rows],
+            'farm_size_hectares': [row[2] for row in rows],
+            'crop_type': [row[3] for row in rows],
+            'farming_experience_years': [row[4] for row in rows],
+            'latitude': [row[5] for row in rows],
+            'longitude': [row[6] for row in rows],
+            # A sample without a score counts as 50, as in _assess_soil_risk
+            'soil_score': [(50 if row[7] is None else row[7]) if row[8] else None for row in rows],
+            'credit_records': [row[9] or 0 for row in rows],
+            'credit_defaults': [row[10] or 0 for row in rows]
+        }
+    
+    def _load_feature_columns(self, farmer_ids: Optional[List[int]] = None) -> Optional[Dict[str, list]]:
+        """``assess_many`` inputs from the feature store, or None if any farmer is missing."""
+        from app.core.extensions import db
+        from app.models import Farmer
+        from app.services.feature_store import feature_store
+        
+        query = db.session.query(Farmer.id).filter(Farmer.is_active == True)
+        if farmer_ids is not None:
+            query = query.filter(Farmer.id.in_(farmer_ids))
+        ids = [row[0] for row in query.order_by(Farmer.id)]
+        
+        names = ['weather_risk', 'crop_market_risk', 'farm_size_hectares', 'farming_experience_years',
+                 'soil_health_score', 'has_soil_sample', 'credit_records', 'credit_defaults']
+        try:
+            matrix = feature_store.online_matrix(ids, names)
+        except Exception as e:
+            logger.warning(f"Feature store unavailable for risk assessment: {e}")
+            return None
+        # has_soil_sample is always materialized, so NaN means no features
+        if not ids or np.isnan(matrix[:, names.index('has_soil_sample')]).any():
+            return None
+        
+        def values(name):
+            return [None if np.isnan(value) else float(value) for value in matrix[:, names.index(name)]]
+        
+        has_sample = matrix[:, names.index('has_soil_sample')] > 0
+        return {
+            'farmer_id': ids,
+            'weather_base_risk': values('weather_risk'),
+            'market_risk': values('crop_market_risk'),
+            'farm_size_hectares': values('farm_size_hectares'),
+            'farming_experience_years': values('farming_experience_years'),
+            'soil_score': [(50 if score is None else score) if sampled else None
+                           for score, sampled in zip(values('soil_health_score'), has_sample)],
+            'credit_records': values('credit_records'),
+            'credit_defaults': values('credit_defaults')
+        }
+    
     def _assess_weather_risk(self, farmer_data: Dict[str, Any]) -> float:
         """Assess weather-related risks."""
         location = farmer_data.get('location', {})
         province = location.get('province', '').lower()
         
-        # Zimbabwe province weather risk mapping (simplified)
-        province_risks = {
-            'mashonaland central': 25,
-            'mashonaland east': 30,
-            'mashonaland west': 35,
-            'manicaland': 20,
-            'midlands': 45,
-            'masvingo': 50,
-            'matabeleland north': 60,
-            'matabeleland south': 65,
-            'bulawayo': 55,
-            'harare': 30
-        }
+        base_risk = PROVINCE_WEATHER_RISKS.get(province, 40)
         
-        base_risk = province_risks.get(province, 40)
+        # Prefer the gridded climate risk for the farm's own cell
+        climate = self._climate_dataset()
+        if climate is not None and location.get('lat') is not None and location.get('lng') is not None:
+            cell = climate.point(location['lat'], location['lng'])
+            if cell and cell['weather_risk'] is not None:
+                base_risk = cell['weather_risk']
         
         # Adjust based on farm size (larger farms may have better resilience)
         farm_size = farmer_data.get('farm_size_hectares', 1)
@@ -123,19 +394,7 @@ class RiskAssessmentEngine:
         """Assess market-related risks."""
         crop_type = farmer_data.get('crop_type', '').lower()
         
-        # Crop market risk mapping (simplified)
-        crop_risks = {
-            'maize': 35,
-            'tobacco': 45,
-            'cotton': 50,
-            'wheat': 40,
-            'barley': 45,
-            'soybeans': 30,
-            'groundnuts': 35,
-            'sunflower': 40
-        }
-        
-        base_risk = crop_risks.get(crop_type, 45)
+        base_risk = CROP_MARKET_RISKS.get(crop_type, 45)
         
         # Adjust based on farm diversification
         # (This would need more data about crop diversity)
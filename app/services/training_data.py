@@ -0,0 +1,288 @@
+"""
+Training data extraction for Talazo AgriFinance Platform models.
+
+Streams soil samples joined to their yield target and credit outcome from
+the database in chunks (``yield_per`` with ``stream_results``, i.e. a
+server-side cursor on PostgreSQL) and writes them straight into
+memory-mapped ``.npy`` files, so memory use is bounded by the chunk size
+rather than the table size. No DataFrames are built.
+
+The yield target is the farmer's most recent stated ``expected_yield``
+(kg/ha, converted to tons/ha) from a loan application form. It is what the
+farmer expected, not a measured harvest, so a model trained on it learns
+stated expectations; the manifest records this as ``target_limitation``.
+The outcome is 1 when the farmer has a defaulted credit record. Missing
+optional soil measurements are filled in SQL with the trainer's
+FEATURE_DEFAULTS, using the feature store's soil feature expressions.
+
+Each extraction is a versioned snapshot::
+
+    <root>/<name>/v0001/features.npy    float32 (rows, features)
+    <root>/<name>/v0001/target.npy      float32 (rows,)
+    <root>/<name>/v0001/outcome.npy     float32 (rows,)
+    <root>/<name>/v0001/sample_ids.npy  int64 (rows,)
+    <root>/<name>/v0001/manifest.json   features, row count, source watermark
+
+A new full snapshot is only written when the source changed since the
+latest one: samples added or edited, loan applications (the target)
+added, edited or deleted, or credit records (the outcome) changed.
+Increment snapshots hold only the samples created after a ``created_at``
+watermark, for incremental retraining. Samples already trained on can be
+excluded by id, so an increment may re-read a window before the watermark
+(for rows committed late) without repeating rows.
+"""
+
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from app.core.extensions import db
+from app.models import SoilSample, LoanApplication, CreditHistory
+from app.models.credit_history import PaymentStatus
+from app.services.feature_store import soil_feature_columns
+from app.services.ml_trainer import KG_PER_TON, YIELD_FEATURES
+from app.services.model_registry import VERSION_PATTERN
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = 'manifest.json'
+
+TARGET_LIMITATION = (
+    "Target is the expected_yield stated on the farmer's latest loan application, "
+    "not an observed harvest outcome"
+)
+
+
+def _isoformat(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def sample_ids_near(sample_ids: Iterable[int], watermark: datetime, window: timedelta) -> List[int]:
+    """
+    The given samples that were created within ``window`` before ``watermark``.
+
+    Stored with a model, they are the rows the next increment must skip
+    when it re-reads that window.
+    """
+    recent = db.session.execute(
+        db.select(SoilSample.id).where(
+            SoilSample.created_at > watermark - window, SoilSample.created_at <= watermark
+        )
+    ).scalars().all()
+    return [int(i) for i in np.intersect1d(recent, np.asarray(sample_ids, dtype=np.int64))]
+
+
+class TrainingSnapshot:
+    """A versioned training set, memory-mapped from its ``.npy`` files."""
+
+    def __init__(self, directory: str, mmap_mode: Optional[str] = 'r'):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST_FILE)) as f:
+            self.manifest = json.load(f)
+        self.version = self.manifest['version']
+        self.features = self.manifest['features']
+        self.X = np.load(os.path.join(directory, 'features.npy'), mmap_mode=mmap_mode)
+        self.y = np.load(os.path.join(directory, 'target.npy'), mmap_mode=mmap_mode)
+        self.outcome = np.load(os.path.join(directory, 'outcome.npy'), mmap_mode=mmap_mode)
+        self.sample_ids = np.load(os.path.join(directory, 'sample_ids.npy'), mmap_mode=mmap_mode)
+
+    def __len__(self):
+        return len(self.y)
+
+
+class TrainingDataExtractor:
+    """Chunked extraction of yield training data into versioned snapshots."""
+
+    def __init__(self, root: str, name: str = 'yield_prediction', chunk_size: int = 10000):
+        self.root = os.path.join(os.path.abspath(root), name)
+        self.name = name
+        self.chunk_size = chunk_size
+
+    def _query(self, max_id: int, created_after: Optional[datetime] = None,
+               created_until: Optional[datetime] = None, exclude_ids: Optional[List[int]] = None):
+        """Select statement producing one float row per usable sample."""
+        latest_yield = db.select(
+            LoanApplication.farmer_id.label('farmer_id'),
+            LoanApplication.expected_yield.label('expected_yield'),
+            db.func.row_number().over(
+                partition_by=LoanApplication.farmer_id,
+                order_by=(LoanApplication.created_at.desc(), LoanApplication.id.desc())
+            ).label('rank')
+        ).where(LoanApplication.expected_yield.isnot(None), LoanApplication.expected_yield > 0).subquery()
+
+        defaulted = db.select(CreditHistory.farmer_id.label('farmer_id')).where(
+            CreditHistory.payment_status == PaymentStatus.DEFAULTED
+        ).group_by(CreditHistory.farmer_id).subquery()
+
+        query = db.select(
+            SoilSample.id,
+            *soil_feature_columns(),
+            latest_yield.c.expected_yield / KG_PER_TON,
+            db.case((defaulted.c.farmer_id.isnot(None), 1.0), else_=0.0)
+        ).join(
+            latest_yield,
+            db.and_(latest_yield.c.farmer_id == SoilSample.farmer_id, latest_yield.c.rank == 1)
+        ).outerjoin(
+            defaulted, defaulted.c.farmer_id == SoilSample.farmer_id
+        ).where(
+            SoilSample.id <= max_id
+        )
+        if created_after is not None:
+            query = query.where(SoilSample.created_at > created_after)
+        if created_until is not None:
+            query = query.where(SoilSample.created_at <= created_until)
+        if exclude_ids:
+            query = query.where(SoilSample.id.notin_(exclude_ids))
+        return query.order_by(SoilSample.id)
+
+    def _versions(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            (entry for entry in os.listdir(self.root) if VERSION_PATTERN.match(entry)),
+            key=lambda version: int(VERSION_PATTERN.match(version).group(1))
+        )
+
+    def latest(self, kind: str = 'full') -> Optional[TrainingSnapshot]:
+        """The most recent snapshot of a kind ('full' or 'increment'), or None."""
+        for version in reversed(self._versions()):
+            directory = os.path.join(self.root, version)
+            if os.path.exists(os.path.join(directory, MANIFEST_FILE)):
+                snapshot = TrainingSnapshot(directory)
+                if snapshot.manifest.get('kind', 'full') == kind:
+                    return snapshot
+        return None
+
+    def _watermark(self) -> Dict:
+        """State of every source table; any change calls for a new full snapshot."""
+        max_id, count, max_created_at, max_updated_at = db.session.query(
+            db.func.max(SoilSample.id), db.func.count(SoilSample.id),
+            db.func.max(SoilSample.created_at), db.func.max(SoilSample.updated_at)
+        ).one()
+        loan_count, max_loan_updated_at = db.session.query(
+            db.func.count(LoanApplication.id), db.func.max(LoanApplication.updated_at)
+        ).one()
+        credit_count, max_credit_updated_at = db.session.query(
+            db.func.count(CreditHistory.id), db.func.max(CreditHistory.updated_at)
+        ).one()
+        return {
+            'max_sample_id': max_id or 0,
+            'sample_count': count,
+            'max_created_at': _isoformat(max_created_at),
+            'max_sample_updated_at': _isoformat(max_updated_at),
+            'loan_count': loan_count,
+            'max_loan_updated_at': _isoformat(max_loan_updated_at),
+            'credit_count': credit_count,
+            'max_credit_updated_at': _isoformat(max_credit_updated_at)
+        }
+
+    def snapshot(self, refresh: bool = False) -> Optional[TrainingSnapshot]:
+        """
+        Return a snapshot of the current training data, extracting one if needed.
+
+        Args:
+            refresh (bool): Extract even if the latest snapshot is current
+
+        Returns:
+            TrainingSnapshot or None if no usable rows exist
+        """
+        watermark = self._watermark()
+        latest = self.latest()
+        if latest is not None and not refresh and \
+                all(latest.manifest['source'].get(key) == value for key, value in watermark.items()):
+            return latest
+        return self.extract(watermark)
+
+    def increment(self, since: datetime, exclude_ids: Optional[List[int]] = None) -> Optional[TrainingSnapshot]:
+        """
+        Snapshot of only the samples created after ``since``.
+
+        Args:
+            since (datetime): Exclusive ``created_at`` lower bound
+            exclude_ids (list, optional): Samples already trained on
+
+        Returns:
+            TrainingSnapshot or None if no new usable rows exist
+        """
+        return self.extract(created_after=since, exclude_ids=exclude_ids)
+
+    def extract(self, watermark: Optional[Dict] = None, created_after: Optional[datetime] = None,
+                exclude_ids: Optional[List[int]] = None) -> Optional[TrainingSnapshot]:
+        """Stream the training rows (all, or created after a watermark) into a new snapshot version."""
+        watermark = watermark or self._watermark()
+        created_until = datetime.fromisoformat(watermark['max_created_at']) \
+            if watermark.get('max_created_at') else None
+        query = self._query(watermark['max_sample_id'], created_after, created_until, exclude_ids)
+        capacity = db.session.execute(
+            db.select(db.func.count()).select_from(query.order_by(None).subquery())
+        ).scalar()
+        if not capacity:
+            logger.info("No soil samples with a yield target; no training snapshot written")
+            return None
+
+        versions = self._versions()
+        number = int(VERSION_PATTERN.match(versions[-1]).group(1)) + 1 if versions else 1
+        version = f'v{number:04d}'
+        directory = os.path.join(self.root, version)
+        os.makedirs(directory, exist_ok=True)
+
+        n_features = len(YIELD_FEATURES)
+        shapes = {
+            'features': ((capacity, n_features), np.float32),
+            'target': ((capacity,), np.float32),
+            'outcome': ((capacity,), np.float32),
+            'sample_ids': ((capacity,), np.int64)
+        }
+        arrays = {
+            name: np.lib.format.open_memmap(
+                os.path.join(directory, f'{name}.npy'), mode='w+', dtype=dtype, shape=shape
+            )
+            for name, (shape, dtype) in shapes.items()
+        }
+
+        # Chunks go straight into the memory-mapped files
+        rows = 0
+        result = db.session.execute(
+            query.execution_options(yield_per=self.chunk_size, stream_results=True)
+        )
+        for chunk in result.partitions():
+            block = np.asarray(chunk, dtype=np.float64)[:capacity - rows]
+            end = rows + len(block)
+            arrays['sample_ids'][rows:end] = block[:, 0]
+            arrays['features'][rows:end] = block[:, 1:1 + n_features]
+            arrays['target'][rows:end] = block[:, 1 + n_features]
+            arrays['outcome'][rows:end] = block[:, 2 + n_features]
+            rows = end
+            if rows == capacity:
+                break
+        result.close()
+
+        for name, array in arrays.items():
+            array.flush()
+            if rows < capacity:
+                # Rows disappeared between counting and streaming
+                np.save(os.path.join(directory, f'{name}.npy'), np.array(array[:rows]))
+        del arrays
+
+        manifest = {
+            'name': self.name,
+            'version': version,
+            'kind': 'increment' if created_after is not None else 'full',
+            'created_after': created_after.isoformat() if created_after is not None else None,
+            'features': list(YIELD_FEATURES),
+            'target': 'expected_yield_tons_per_hectare',
+            'target_limitation': TARGET_LIMITATION,
+            'outcome': 'farmer_defaulted',
+            'rows': rows,
+            'source': watermark,
+            'created_at': datetime.utcnow().isoformat()
+        }
+        with open(os.path.join(directory, MANIFEST_FILE), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        logger.info(f"Extracted {rows} training rows into snapshot {version}")
+        return TrainingSnapshot(directory)
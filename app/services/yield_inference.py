@@ -0,0 +1,256 @@
+"""
+Yield prediction inference service for Talazo AgriFinance Platform.
+
+Serves the active ``yield_prediction`` model from the model registry.
+Concurrent ``predict`` calls are collected for up to ``max_wait`` seconds
+(or until ``max_batch`` requests are waiting) and run as a single
+``predict`` on a 2-D array; each caller gets its own row back. A
+RandomForest predict costs about the same for one row as for hundreds,
+so batching removes most of the per-request cost under load.
+
+Small batches are evaluated with the array-compiled form of the forest
+(see ``compiled_forest``), memory-mapped from the registry; large ones use
+the model's own ``predict``.
+
+Every served batch is counted by the drift monitor (``drift``), which
+periodically compares inputs and predictions with the training data.
+
+``predict_for_farmer`` reads a farmer's latest soil features from the
+feature store. ``backfill`` fills ``SoilSample.yield_prediction`` (kg/ha)
+for stored samples in large batches.
+"""
+
+import logging
+import queue
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import bindparam
+
+from app.core.extensions import db
+from app.models import SoilSample
+from app.services.compiled_forest import compile_forest
+from app.services.drift_monitor import DriftMonitor
+from app.services.ml_trainer import FEATURE_DEFAULTS, KG_PER_TON, YIELD_FEATURES, YIELD_MODEL_NAME
+from app.services.model_registry import ModelRegistryError, get_model_registry
+
+logger = logging.getLogger(__name__)
+
+# Above this many rows the model's own predict is faster than the compiled walk
+COMPILED_MAX_ROWS = 256
+
+
+def feature_matrix(rows: Sequence) -> np.ndarray:
+    """
+    Build the model's 2-D feature array from dicts or objects with the soil fields.
+
+    Missing optional measurements are filled from FEATURE_DEFAULTS.
+    """
+    matrix = np.empty((len(rows), len(YIELD_FEATURES)), dtype=np.float64)
+    for i, row in enumerate(rows):
+        for j, feature in enumerate(YIELD_FEATURES):
+            value = row.get(feature) if isinstance(row, dict) else getattr(row, feature, None)
+            if value is None:
+                value = FEATURE_DEFAULTS.get(feature, np.nan)
+            matrix[i, j] = value
+    return matrix
+
+
+class _Request:
+    __slots__ = ('features', 'done', 'result', 'error')
+
+    def __init__(self, features: np.ndarray):
+        self.features = features
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class YieldInferenceService:
+    """Micro-batched predictions from the active yield model."""
+
+    def __init__(self, registry=None, max_wait: float = 0.005, max_batch: int = 256,
+                 timeout: float = 5.0):
+        self.registry = registry
+        self.max_wait = max_wait
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self._queue: 'queue.Queue[_Request]' = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._compiled = (None, None)
+        self.drift = DriftMonitor()
+        self.batches = 0
+        self.rows = 0
+
+    def _registry(self):
+        if self.registry is None:
+            self.registry = get_model_registry()
+        return self.registry
+
+    def model(self):
+        """The active yield model; raises ModelRegistryError if none is registered."""
+        model = self._registry().get(YIELD_MODEL_NAME)
+        if model is None:
+            raise ModelRegistryError(f"No active {YIELD_MODEL_NAME} model")
+        return model
+
+    def compiled(self, model):
+        """
+        Array-compiled form of ``model`` (None if it is not a tree ensemble).
+
+        Uses the registry's memory-mapped compiled artifact, shared by all
+        workers; versions registered without one are compiled in-process.
+        """
+        compiled = self._registry().get_compiled(YIELD_MODEL_NAME)
+        if compiled is not None:
+            return compiled
+        source, compiled = self._compiled
+        if source is not model:
+            try:
+                compiled = compile_forest(model)
+            except ValueError:
+                compiled = None
+            self._compiled = (model, compiled)
+        return compiled
+
+    def predict_many(self, rows: Sequence) -> np.ndarray:
+        """Predict yields (tons/ha) for many rows in one call."""
+        matrix = rows if isinstance(rows, np.ndarray) else feature_matrix(rows)
+        if not len(matrix):
+            return np.zeros(0)
+        model = self.model()
+        compiled = self.compiled(model) if len(matrix) <= COMPILED_MAX_ROWS else None
+        if compiled is not None:
+            predictions = compiled.predict(matrix)
+        else:
+            predictions = np.asarray(model.predict(matrix), dtype=np.float64)
+        self._monitor(matrix, predictions)
+        return predictions
+    
+    def _monitor(self, matrix: np.ndarray, predictions: np.ndarray):
+        """Count served rows for drift monitoring; run the periodic check when due."""
+        try:
+            self.drift.observe(matrix, predictions)
+            if self.drift.due():
+                self.drift.check(self._registry())
+        except Exception as e:
+            logger.error(f"Drift monitoring failed: {e}")
+
+    def predict(self, row) -> float:
+        """
+        Predict the yield (tons/ha) for one sample, batched with concurrent callers.
+
+        Args:
+            row: Dict or object with the soil feature fields
+        """
+        # Resolve the registry here: the worker thread has no app context
+        self._registry()
+        request = _Request(feature_matrix([row])[0])
+        self._ensure_worker()
+        self._queue.put(request)
+        if not request.done.wait(self.timeout):
+            raise TimeoutError('Yield prediction timed out')
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def predict_for_farmer(self, farmer_id: int) -> Optional[float]:
+        """
+        Predict the yield (tons/ha) from a farmer's latest soil features in the feature store.
+
+        Returns:
+            float or None if the farmer has no materialized soil sample
+        """
+        from app.services.feature_store import feature_store
+        features = feature_store.online(farmer_id)
+        if not features or not features.get('has_soil_sample'):
+            return None
+        return self.predict(features)
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            with self._lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._worker = threading.Thread(
+                        target=self._run, name='yield-inference', daemon=True
+                    )
+                    self._worker.start()
+
+    def _collect(self) -> List[_Request]:
+        """Block for one request, then gather more until max_wait or max_batch."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                predictions = self.predict_many(np.vstack([request.features for request in batch]))
+                for request, prediction in zip(batch, predictions):
+                    request.result = float(prediction)
+            except Exception as e:
+                logger.error(f"Yield prediction batch failed: {e}")
+                for request in batch:
+                    request.error = e
+            finally:
+                self.batches += 1
+                self.rows += len(batch)
+                for request in batch:
+                    request.done.set()
+
+    def backfill(self, batch_size: int = 5000, only_missing: bool = True) -> int:
+        """
+        Fill ``SoilSample.yield_prediction`` (kg/ha) for stored samples.
+
+        Args:
+            batch_size (int): Samples predicted and written per batch
+            only_missing (bool): Skip samples that already have a prediction
+
+        Returns:
+            int: Number of samples updated
+        """
+        model = self.model()
+        columns = [getattr(SoilSample, feature) for feature in YIELD_FEATURES]
+        table = SoilSample.__table__
+        update = table.update().where(table.c.id == bindparam('b_id')).values(
+            yield_prediction=bindparam('b_yield')
+        )
+
+        updated = 0
+        last_id = 0
+        while True:
+            query = db.session.query(SoilSample.id, *columns).filter(SoilSample.id > last_id)
+            if only_missing:
+                query = query.filter(SoilSample.yield_prediction.is_(None))
+            rows = query.order_by(SoilSample.id).limit(batch_size).all()
+            if not rows:
+                break
+
+            matrix = feature_matrix([dict(zip(YIELD_FEATURES, row[1:])) for row in rows])
+            predictions = np.asarray(model.predict(matrix)) * KG_PER_TON
+            db.session.execute(update, [
+                {'b_id': row[0], 'b_yield': round(float(prediction), 1)}
+                for row, prediction in zip(rows, predictions)
+            ])
+            db.session.commit()
+
+            updated += len(rows)
+            last_id = rows[-1][0]
+
+        logger.info(f"Backfilled yield predictions for {updated} soil samples")
+        return updated
+
+
+yield_inference = YieldInferenceService()
@@ -0,0 +1,109 @@
+"""
+In-process caching utilities for Talazo AgriFinance Platform.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _Entry:
+    __slots__ = ('value', 'computed_at')
+
+    def __init__(self, value: Any, computed_at: float):
+        self.value = value
+        self.computed_at = computed_at
+
+
+class TTLCache:
+    """
+    Thread-safe TTL cache with single-flight loading and stale-while-revalidate.
+
+    - Within ``ttl`` seconds of computation a value is served as-is.
+    - Up to ``stale_ttl`` seconds after that it is still served, while one
+      background thread recomputes it.
+    - Older or missing values are computed in the caller's thread; concurrent
+      callers for the same key wait for that one computation instead of
+      repeating it.
+    """
+
+    def __init__(self, ttl: float = 30.0, stale_ttl: float = 300.0):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries: Dict[Hashable, _Entry] = {}
+        self._locks: Dict[Hashable, threading.Lock] = {}
+        self._refreshing: set = set()
+        self._guard = threading.Lock()
+
+    def _key_lock(self, key: Hashable) -> threading.Lock:
+        with self._guard:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = threading.Lock()
+            return lock
+
+    def _age(self, entry: Optional[_Entry]) -> float:
+        return time.monotonic() - entry.computed_at if entry else float('inf')
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        Return the cached value for ``key``, computing it when necessary.
+
+        Args:
+            key: Cache key
+            compute (callable): Zero-argument function producing the value.
+                It may run on a background thread, so it must not rely on
+                thread-local state such as a Flask app context it did not
+                push itself.
+
+        Returns:
+            The cached or freshly computed value
+        """
+        entry = self._entries.get(key)
+        age = self._age(entry)
+
+        if age <= self.ttl:
+            return entry.value
+
+        if age <= self.ttl + self.stale_ttl:
+            self._refresh_in_background(key, compute)
+            return entry.value
+
+        with self._key_lock(key):
+            # Another caller may have finished while we waited for the lock
+            entry = self._entries.get(key)
+            if self._age(entry) <= self.ttl:
+                return entry.value
+            return self._store(key, compute())
+
+    def _store(self, key: Hashable, value: Any) -> Any:
+        self._entries[key] = _Entry(value, time.monotonic())
+        return value
+
+    def _refresh_in_background(self, key: Hashable, compute: Callable[[], Any]):
+        with self._guard:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                with self._key_lock(key):
+                    self._store(key, compute())
+            except Exception as e:
+                logger.error(f"Background refresh of cache key {key!r} failed: {e}")
+            finally:
+                with self._guard:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, name=f'cache-refresh-{key}', daemon=True).start()
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """Drop one key, or every key when ``key`` is None."""
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
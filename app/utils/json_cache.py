@@ -0,0 +1,76 @@
+"""
+Process-wide cache of parsed JSON text columns.
+
+Several models store JSON documents in Text columns. Parsing them on every
+access shows up in list endpoints, so parsed values are memoized per
+(table, row id, column, updated_at): an update bumps ``updated_at`` and
+naturally misses the old entry, which then ages out of the LRU.
+
+Cached values are shared between callers and must be treated as read-only.
+"""
+
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable
+
+from sqlalchemy import inspect
+
+
+class ParsedJSONCache:
+    """Thread-safe LRU of decoded JSON values."""
+
+    def __init__(self, maxsize: int = 20000):
+        self.maxsize = maxsize
+        self._entries: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def decode(text, default=None):
+        """Decode JSON text, returning ``default`` for empty or invalid input."""
+        if not text:
+            return default
+        try:
+            return json.loads(text)
+        except (TypeError, ValueError):
+            return default
+
+    def get(self, instance, column: str, default=None):
+        """
+        Parsed value of ``instance.<column>``, decoded at most once per version.
+
+        Rows without an id or ``updated_at`` (not yet flushed), and columns
+        with unflushed changes, are decoded without caching.
+        """
+        text = getattr(instance, column)
+        row_id = getattr(instance, 'id', None)
+        updated_at = getattr(instance, 'updated_at', None)
+        if row_id is None or updated_at is None or \
+                inspect(instance).attrs[column].history.has_changes():
+            return self.decode(text, default)
+
+        key = (instance.__tablename__, row_id, column, updated_at)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                value = self._entries[key]
+                return default if value is None else value
+
+        value = self.decode(text)
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = value
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return default if value is None else value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+
+json_cache = ParsedJSONCache()
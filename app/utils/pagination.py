@@ -0,0 +1,181 @@
+"""
+Keyset (cursor) pagination helpers for Talazo AgriFinance Platform.
+
+Listings are ordered by ``(created_at, id)`` and each page continues from the
+last row of the previous one, so fetching page 1,000 costs the same as page 1.
+Cursors are opaque to clients: a URL-safe base64 encoding of the last row's
+sort key.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import text, tuple_
+
+
+# Accepted values of the ``count`` query parameter
+COUNT_MODES = ('none', 'estimate', 'exact')
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a client supplies a cursor that cannot be decoded."""
+
+
+def encode_cursor(created_at: Optional[datetime], row_id: int) -> str:
+    """
+    Encode a row's sort key into an opaque cursor string.
+
+    Args:
+        created_at (datetime): Row creation timestamp
+        row_id (int): Row primary key
+
+    Returns:
+        str: Opaque cursor
+    """
+    payload = json.dumps([created_at.isoformat() if created_at else None, row_id],
+                         separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], int]:
+    """
+    Decode a cursor produced by :func:`encode_cursor`.
+
+    Args:
+        cursor (str): Opaque cursor
+
+    Returns:
+        tuple: (created_at, row_id)
+
+    Raises:
+        InvalidCursorError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return (datetime.fromisoformat(created_at) if created_at else None), int(row_id)
+    except (ValueError, TypeError, UnicodeError) as e:
+        raise InvalidCursorError(f"Invalid pagination cursor: {cursor}") from e
+
+
+def encode_rank_cursor(rank: int, row_id: int) -> str:
+    """Encode the (rank, id) sort key of a ranked search result into a cursor."""
+    payload = json.dumps([rank, row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_rank_cursor(cursor: str) -> Tuple[int, int]:
+    """
+    Decode a cursor produced by :func:`encode_rank_cursor`.
+
+    Raises:
+        InvalidCursorError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        rank, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return int(rank), int(row_id)
+    except (ValueError, TypeError, UnicodeError) as e:
+        raise InvalidCursorError(f"Invalid pagination cursor: {cursor}") from e
+
+
+def keyset_paginate(query, model, cursor: Optional[str] = None,
+                    per_page: int = 20, descending: bool = True) -> Dict[str, Any]:
+    """
+    Fetch one page of ``query`` ordered by ``(created_at, id)``.
+
+    One extra row is fetched to learn whether a further page exists, so no
+    COUNT(*) is needed.
+
+    Args:
+        query: SQLAlchemy query over ``model``
+        model: Mapped class with ``created_at`` and ``id`` columns
+        cursor (str, optional): Cursor returned with the previous page
+        per_page (int): Page size
+        descending (bool): Newest first when True
+
+    Returns:
+        dict: ``items``, ``next_cursor`` and ``has_next``
+    """
+    sort_key = tuple_(model.created_at, model.id)
+
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        if descending:
+            query = query.filter(sort_key < tuple_(created_at, row_id))
+        else:
+            query = query.filter(sort_key > tuple_(created_at, row_id))
+
+    if descending:
+        query = query.order_by(model.created_at.desc(), model.id.desc())
+    else:
+        query = query.order_by(model.created_at.asc(), model.id.asc())
+
+    rows = query.limit(per_page + 1).all()
+    has_next = len(rows) > per_page
+    items = rows[:per_page]
+
+    next_cursor = None
+    if has_next and items:
+        last = items[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+
+    return {
+        'items': items,
+        'next_cursor': next_cursor,
+        'has_next': has_next
+    }
+
+
+def estimate_row_count(session, table_name: str) -> Optional[int]:
+    """
+    Return the planner's row estimate for a table without scanning it.
+
+    PostgreSQL keeps this in ``pg_class.reltuples`` (refreshed by ANALYZE);
+    other backends have no cheap equivalent, in which case None is returned.
+
+    Args:
+        session: SQLAlchemy session
+        table_name (str): Table to estimate
+
+    Returns:
+        int or None: Estimated number of rows
+    """
+    if session.get_bind().dialect.name != 'postgresql':
+        return None
+
+    estimate = session.execute(
+        text("SELECT reltuples::bigint FROM pg_class WHERE relname = :name"),
+        {'name': table_name}
+    ).scalar()
+
+    if estimate is None or estimate < 0:
+        return None
+    return int(estimate)
+
+
+def resolve_total(query, session, table_name: str, count_mode: str) -> Optional[int]:
+    """
+    Resolve the ``total`` shown alongside a page according to ``count_mode``.
+
+    Args:
+        query: Filtered SQLAlchemy query (used only for exact counts)
+        session: SQLAlchemy session
+        table_name (str): Underlying table name for estimates
+        count_mode (str): ``none``, ``estimate`` or ``exact``
+
+    Returns:
+        int or None: Total rows, or None when not requested
+
+    Raises:
+        ValueError: If ``count_mode`` is not one of COUNT_MODES
+    """
+    if count_mode == 'exact':
+        return query.order_by(None).count()
+    if count_mode == 'estimate':
+        return estimate_row_count(session, table_name)
+    if count_mode == 'none':
+        return None
+    raise ValueError(f"Unknown count mode: {count_mode}")
@@ -0,0 +1,51 @@
+"""
+Single-statement upserts for Talazo AgriFinance Platform.
+
+Materialized tables maintained from mapper events (farmer statistics, the
+exposure cube, alerts) create their rows on first use. Checking for a row
+and then inserting it races with concurrent writers on the table's unique
+constraint, so those rows are written with ``INSERT ... ON CONFLICT``
+instead. PostgreSQL and SQLite share the syntax.
+"""
+
+from typing import Dict, Optional, Sequence
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+_INSERTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert
+}
+
+
+def upsert(connection, table, values: Dict, index_elements: Sequence,
+           set_: Optional[Dict] = None, index_where=None):
+    """
+    Insert a row, or update (``set_``) / keep the existing one on conflict.
+
+    Args:
+        connection: SQLAlchemy connection (e.g. the flush connection in an event)
+        table: Target table
+        values (dict): Column values of the new row
+        index_elements: Columns of the unique constraint or index to arbitrate on
+        set_ (dict, optional): Column updates applied to the existing row;
+            without it the conflicting insert is skipped
+        index_where: Predicate of a partial unique index
+
+    Returns:
+        CursorResult of the statement
+    """
+    insert = _INSERTS.get(connection.dialect.name)
+    if insert is None:
+        raise NotImplementedError(f"Upsert is not supported on {connection.dialect.name}")
+
+    statement = insert(table).values(**values)
+    if set_:
+        statement = statement.on_conflict_do_update(
+            index_elements=index_elements, index_where=index_where, set_=set_
+        )
+    else:
+        statement = statement.on_conflict_do_nothing(
+            index_elements=index_elements, index_where=index_where
+        )
+    return connection.execute(statement)